@@ -2,41 +2,349 @@
 """
 分析 image/ 目录中的图片文件
 检测实际格式，生成转换计划报告
+
+每个图片根目录的扫描结果保存在缓存目录（scan 命名空间）中，按相对路径记录文件的
+大小、mtime_ns 和 inode；再次扫描时这三项都未变化的文件直接复用上次检测的格式，
+只有新增或修改过的文件才会打开读取文件头。
+
+sniff_image 读取数百字节的文件头，识别 WebP、PNG、JPEG、GIF、AVIF、HEIC、BMP、TIFF、ICO 和 SVG，
+并从容器头部解析像素尺寸（不解码图片），转换计划中的条目带有 width / height。
+
+使用方法:
+  python analyze_images.py                       # 扫描 ./image
+  python analyze_images.py image assets -r       # 多个根目录，递归扫描子目录
+  python analyze_images.py --no-cache
 """
 
+import argparse
+import hashlib
+import io
 import os
 import json
+import re
+import struct
 from pathlib import Path
 from collections import defaultdict
 
+from disk_cache import DiskCache
 
-def detect_format(file_path):
-    """通过 Magic Bytes 检测文件的实际格式"""
+# 扫描索引格式和 sniff_image 的检测规则变化时递增，旧索引整体失效
+SCAN_INDEX_VERSION = 3
+
+
+# 先读取的文件头长度：大多数格式的尺寸都在前几十字节
+HEADER_BYTES = 512
+# 文件头中找不到所需信息时继续读取的上限（SVG 根元素前的长注释、HEIF 的 meta 盒）
+MAX_SNIFF_BYTES = 64 * 1024
+
+# ISO BMFF（HEIF 容器）的品牌
+AVIF_BRANDS = {b'avif', b'avis'}
+HEIC_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'hevm', b'hevs', b'mif1', b'msf1'}
+
+# JPEG 中带尺寸的帧头（SOF0-SOF15，不含 DHT、JPG、DAC）
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# BMP 的 DIB 头长度（BITMAPCOREHEADER、BITMAPINFOHEADER 及其扩展版本）
+BMP_HEADER_SIZES = {12, 40, 52, 56, 108, 124}
+# 超过该值的宽高视为字段异常（不是 BMP）
+MAX_DIMENSION = 1 << 16
+
+SVG_PREFIXES = (b'<svg', b'<?xml', b'<!--', b'<!DOCTYPE svg')
+SVG_TAG_RE = re.compile(rb'<svg\b[^>]*>', re.IGNORECASE)
+SVG_LENGTH_RE = {
+    name: re.compile(rb'\s' + name + rb'\s*=\s*["\']\s*([0-9.]+)\s*(?:px)?\s*["\']')
+    for name in (b'width', b'height')
+}
+SVG_VIEWBOX_RE = re.compile(rb'\sviewBox\s*=\s*["\']\s*[-0-9.]+[\s,]+[-0-9.]+[\s,]+([0-9.]+)[\s,]+([0-9.]+)')
+
+
+def _png_size(h):
+    if h[12:16] == b'IHDR':
+        return struct.unpack('>II', h[16:24])
+    return None
+
+
+def _gif_size(h):
+    return struct.unpack('<HH', h[6:10])
+
+
+def _webp_size(h):
+    chunk = h[12:16]
+    if chunk == b'VP8 ' and h[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', h[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and h[20:21] == b'\x2f':
+        bits = int.from_bytes(h[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(h[24:27], 'little') + 1, int.from_bytes(h[27:30], 'little') + 1
+    return None
+
+
+def _jpeg_scan(f):
+    """从 SOI 之后逐段查找 SOF 帧头，按段长度跳过其余段（EXIF、缩略图等不读入）"""
+    f.seek(2)
+    while True:
+        prefix = f.read(2)
+        if len(prefix) < 2 or prefix[0] != 0xFF:
+            return None
+        marker = prefix[1]
+        while marker == 0xFF:  # 填充字节
+            byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+        if marker in (0x01, *range(0xD0, 0xD8)):  # 无长度的独立标记
+            continue
+        if marker in (0xD9, 0xDA):  # 图像结束 / 扫描数据开始
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(struct.unpack('>H', length)[0] - 2, io.SEEK_CUR)
+
+
+def _jpeg_size(h):
+    return _jpeg_scan(io.BytesIO(h))
+
+
+def _jpeg_rescan(f, h):
+    # SOF 段在 EXIF（可含缩略图）之后时，直接在文件中按段跳转
+    return _jpeg_scan(f)
+
+
+def _bmp_size(h):
+    if struct.unpack('<I', h[14:18])[0] == 12:  # OS/2 BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', h[18:22])
+    else:
+        width, height = struct.unpack('<ii', h[18:26])
+        width, height = abs(width), abs(height)
+    if not (0 < width <= MAX_DIMENSION and 0 < height <= MAX_DIMENSION):
+        return None
+    return width, height
+
+
+def _is_bmp(h):
+    """BM 开头的文本文件很常见：还要求 DIB 头长度合法且宽高合理"""
+    return (h.startswith(b'BM') and len(h) >= 26
+            and struct.unpack('<I', h[14:18])[0] in BMP_HEADER_SIZES
+            and _bmp_size(h) is not None)
+
+
+def _tiff_ifd_size(entries, endian):
+    """从 IFD 条目中取 ImageWidth / ImageLength"""
+    size = {}
+    for entry in range(0, len(entries) - 11, 12):
+        tag, kind = struct.unpack(endian + 'HH', entries[entry:entry + 4])
+        if tag in (256, 257):  # ImageWidth / ImageLength
+            fmt = endian + ('H' if kind == 3 else 'I')
+            size[tag] = struct.unpack(fmt, entries[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+    if 256 in size and 257 in size:
+        return size[256], size[257]
+    return None
+
+
+def _tiff_size(h):
+    endian = '<' if h[:2] == b'II' else '>'
+    offset = struct.unpack(endian + 'I', h[4:8])[0]
+    if offset + 2 > len(h):
+        return None
+    count = struct.unpack(endian + 'H', h[offset:offset + 2])[0]
+    return _tiff_ifd_size(h[offset + 2:offset + 2 + count * 12], endian)
+
+
+def _tiff_rescan(f, h):
+    # 第一个 IFD 可以在文件的任意位置（常见于文件末尾），跳转过去只读这一个 IFD
+    endian = '<' if h[:2] == b'II' else '>'
+    f.seek(struct.unpack(endian + 'I', h[4:8])[0])
+    count = struct.unpack(endian + 'H', f.read(2))[0]
+    return _tiff_ifd_size(f.read(count * 12), endian)
+
+
+def _ico_size(h):
+    count = struct.unpack('<H', h[4:6])[0]
+    sizes = [
+        (h[i] or 256, h[i + 1] or 256)
+        for i in range(6, min(6 + count * 16, len(h) - 1), 16)
+    ]
+    return max(sizes) if sizes else None
+
+
+def _bmff_brands(h):
+    """ftyp 盒中的主品牌和兼容品牌"""
+    box_size = struct.unpack('>I', h[:4])[0]
+    brands = {h[8:12]}
+    brands.update(h[i:i + 4] for i in range(16, min(box_size, len(h)) - 3, 4))
+    return brands
+
+
+def _is_avif(h):
+    return h[4:8] == b'ftyp' and bool(_bmff_brands(h) & AVIF_BRANDS)
+
+
+def _is_heic(h):
+    return h[4:8] == b'ftyp' and bool(_bmff_brands(h) & HEIC_BRANDS)
+
+
+def _heif_size(h):
+    """取 ispe（图像空间尺寸）属性中最大的一个（其余通常是缩略图或网格分块）"""
+    sizes = []
+    i = h.find(b'ispe')
+    while i != -1 and i + 16 <= len(h):
+        sizes.append(struct.unpack('>II', h[i + 8:i + 16]))
+        i = h.find(b'ispe', i + 4)
+    return max(sizes) if sizes else None
+
+
+def _heif_rescan(f, h):
+    # 分块较多的图片 meta 盒较长，ispe 属性可能在文件头之后
+    return _heif_size(h + f.read(MAX_SNIFF_BYTES - len(h)))
+
+
+def _svg_start(h):
+    return h[:1024].lstrip(b'\xef\xbb\xbf \t\r\n').startswith(SVG_PREFIXES)
+
+
+def _is_svg(h):
+    return _svg_start(h) and SVG_TAG_RE.search(h) is not None
+
+
+def _svg_size(h):
+    tag = SVG_TAG_RE.search(h).group(0)
+    width, height = (SVG_LENGTH_RE[name].search(tag) for name in (b'width', b'height'))
+    if width and height:
+        return round(float(width.group(1))), round(float(height.group(1)))
+    viewbox = SVG_VIEWBOX_RE.search(tag)
+    if viewbox:
+        return round(float(viewbox.group(1))), round(float(viewbox.group(2)))
+    return None
+
+
+# (格式, 文件头判断, 尺寸解析, 文件头中没有尺寸时在文件中继续查找)，按顺序匹配
+SNIFFERS = [
+    ('webp', lambda h: h.startswith(b'RIFF') and h[8:12] == b'WEBP', _webp_size, None),
+    ('png', lambda h: h.startswith(b'\x89PNG'), _png_size, None),
+    ('jpeg', lambda h: h.startswith(b'\xff\xd8\xff'), _jpeg_size, _jpeg_rescan),
+    ('gif', lambda h: h.startswith(b'GIF'), _gif_size, None),
+    ('avif', _is_avif, _heif_size, _heif_rescan),
+    ('heic', _is_heic, _heif_size, _heif_rescan),
+    ('bmp', _is_bmp, _bmp_size, None),
+    ('tiff', lambda h: h[:4] in (b'II*\x00', b'MM\x00*'), _tiff_size, _tiff_rescan),
+    ('ico', lambda h: h[:4] == b'\x00\x00\x01\x00', _ico_size, None),
+    ('svg', _is_svg, _svg_size, None),
+]
+
+
+def _parse(parse_size, *args):
+    try:
+        return parse_size(*args)
+    except (struct.error, IndexError, ValueError):
+        return None  # 文件头被截断或字段异常
+
+
+def sniff_image(file_path):
+    """读取文件头，返回 (格式, 宽, 高)
+
+    通常只读取 HEADER_BYTES；JPEG 的 SOF 段、TIFF 的 IFD 等不在文件头中时按偏移跳转读取，
+    SVG 根元素前有较长的声明或注释时再多读一些。尺寸从容器头部解析，不解码图片；
+    无法解析时宽高为 None。无法识别的文件格式为 'unknown'，读取失败时为 'error: ...'。
+    """
     try:
         with open(file_path, 'rb') as f:
-            header = f.read(12)
-
-        if header.startswith(b'RIFF') and b'WEBP' in header:
-            return 'webp'
-        elif header.startswith(b'\x89PNG'):
-            return 'png'
-        elif header.startswith(b'\xff\xd8\xff'):
-            return 'jpeg'
-        elif header.startswith(b'GIF'):
-            return 'gif'
-        else:
-            return 'unknown'
+            header = f.read(HEADER_BYTES)
+            if len(header) == HEADER_BYTES and _svg_start(header) and not SVG_TAG_RE.search(header):
+                header += f.read(MAX_SNIFF_BYTES - HEADER_BYTES)
+
+            for name, matches, parse_size, rescan in SNIFFERS:
+                if matches(header):
+                    size = _parse(parse_size, header)
+                    if size is None and rescan and len(header) == HEADER_BYTES:
+                        size = _parse(rescan, f, header)
+                    return (name, *size) if size else (name, None, None)
     except Exception as e:
-        return f'error: {str(e)}'
+        return f'error: {str(e)}', None, None
+    return 'unknown', None, None
 
 
-def analyze_images(image_dir='image'):
-    """分析图片目录，生成转换计划"""
+def detect_format(file_path):
+    """通过 Magic Bytes 检测文件的实际格式"""
+    return sniff_image(file_path)[0]
+
+
+class ScanIndex:
+    """单个图片根目录的持久化扫描索引: 相对路径 -> [大小, mtime_ns, inode, 格式, 宽, 高]"""
+
+    def __init__(self, root, cache_dir=None):
+        self.cache = DiskCache('scan', root=cache_dir)
+        self.key = hashlib.sha256(str(Path(root).resolve()).encode('utf-8')).hexdigest()
+        self.entries = {}
+        data = self.cache.get_bytes(self.key, '.json')
+        if data:
+            try:
+                index = json.loads(data)
+            except ValueError:
+                index = {}
+            if index.get('version') == SCAN_INDEX_VERSION:
+                self.entries = index.get('files', {})
+        # 本次扫描到的文件（保存时只保留这些，已删除的文件随之移出索引）
+        self.seen = {}
+        self.hits = 0
+        self.misses = 0
+
+    def sniff(self, rel_path, file_path, st):
+        """返回 (格式, 宽, 高)；大小、mtime_ns、inode 都未变化时不打开文件"""
+        signature = [st.st_size, st.st_mtime_ns, st.st_ino]
+        cached = self.entries.get(rel_path)
+        if cached and cached[:3] == signature:
+            self.hits += 1
+            result = tuple(cached[3:])
+        else:
+            self.misses += 1
+            result = sniff_image(file_path)
+        # 读取出错的文件不记录，下次重新检测
+        if not result[0].startswith('error'):
+            self.seen[rel_path] = signature + list(result)
+        return result
+
+    def save(self):
+        if self.seen == self.entries:
+            return
+        data = json.dumps({'version': SCAN_INDEX_VERSION, 'files': self.seen}, ensure_ascii=False)
+        self.cache.put_bytes(self.key, data.encode('utf-8'), '.json')
+
+
+def iter_image_files(root, recursive=False):
+    """按名称顺序产生 (相对路径, 路径, stat)，跳过以 . 开头的文件和目录"""
+    entries = sorted(os.scandir(root), key=lambda e: e.name)
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir():
+            if recursive:
+                for rel_path, file_path, st in iter_image_files(entry.path, recursive):
+                    yield f"{entry.name}/{rel_path}", file_path, st
+        elif entry.is_file():
+            yield entry.name, Path(entry.path), entry.stat()
 
-    image_path = Path(image_dir)
-    if not image_path.exists():
-        print(f"错误：目录 {image_dir} 不存在")
-        return None
+
+def analyze_images(image_dir='image', recursive=False, use_cache=True, cache_dir=None):
+    """分析图片目录，生成转换计划
+
+    image_dir 可以是多个根目录的列表；此时转换计划的每一项带有 root 字段。
+    """
+
+    image_dirs = [image_dir] if isinstance(image_dir, (str, os.PathLike)) else list(image_dir)
+    for directory in image_dirs:
+        if not Path(directory).exists():
+            print(f"错误：目录 {directory} 不存在")
+            return None
+    multiple_roots = len(image_dirs) > 1
 
     # 统计数据
     stats = {
@@ -51,34 +359,50 @@ def analyze_images(image_dir='image'):
     # 文件名冲突检测
     potential_conflicts = []
 
-    print(f"正在扫描 {image_dir} 目录...")
+    scan_hits = 0
+    scan_misses = 0
+
+    for directory in image_dirs:
+        image_path = Path(directory)
+        index = ScanIndex(image_path, cache_dir) if use_cache else None
+        # 多个根目录时每一项记录所属根目录
+        extra = {'root': str(image_path)} if multiple_roots else {}
+
+        print(f"正在扫描 {directory} 目录...")
 
-    # 扫描所有文件
-    for file_path in image_path.iterdir():
-        if file_path.is_file() and not file_path.name.startswith('.'):
+        # 扫描所有文件
+        for file_name, file_path, st in iter_image_files(image_path, recursive):
             stats['total_files'] += 1
 
-            actual_format = detect_format(file_path)
-            file_name = file_path.name
+            if index:
+                actual_format, width, height = index.sniff(file_name, file_path, st)
+            else:
+                actual_format, width, height = sniff_image(file_path)
             file_ext = file_path.suffix.lower()
+            # 从文件头解析出的像素尺寸（无法解析时不记录）
+            size = {'width': width, 'height': height} if width else {}
 
             # 分类处理
             if actual_format.startswith('error'):
                 stats['errors'].append({
                     'file': file_name,
-                    'error': actual_format
+                    'error': actual_format,
+                    **extra
                 })
             elif actual_format == 'unknown':
                 stats['unknown_format'].append({
                     'file': file_name,
-                    'extension': file_ext
+                    'extension': file_ext,
+                    **extra
                 })
             elif actual_format == 'webp':
                 if not file_ext:
                     # 无扩展名的 WebP
                     stats['webp_no_ext'].append({
                         'file': file_name,
-                        'new_name': f"{file_name}.png"
+                        'new_name': f"{file_name}.png",
+                        **size,
+                        **extra
                     })
 
                     # 检查是否会产生冲突
@@ -87,22 +411,32 @@ def analyze_images(image_dir='image'):
                         potential_conflicts.append({
                             'original': file_name,
                             'new_name': f"{file_name}.png",
-                            'conflict_with': f"{file_name}.png"
+                            'conflict_with': f"{file_name}.png",
+                            **extra
                         })
                 elif file_ext != '.webp':
                     # 有错误扩展名的 WebP（如 .png 但实际是 WebP）
                     stats['webp_wrong_ext'].append({
                         'file': file_name,
                         'extension': file_ext,
-                        'actual_format': 'webp'
+                        'actual_format': 'webp',
+                        **size,
+                        **extra
                     })
             else:
                 # 格式正确的文件
                 stats['correct_format'].append({
                     'file': file_name,
-                    'format': actual_format
+                    'format': actual_format,
+                    **size,
+                    **extra
                 })
 
+        if index:
+            index.save()
+            scan_hits += index.hits
+            scan_misses += index.misses
+
     # 生成报告
     print("\n" + "="*60)
     print("图片格式分析报告")
@@ -114,6 +448,10 @@ def analyze_images(image_dir='image'):
     print(f"\n格式正确的文件：{len(stats['correct_format'])} 个")
     print(f"未知格式文件：{len(stats['unknown_format'])} 个")
     print(f"错误文件：{len(stats['errors'])} 个")
+    scanned = scan_hits + scan_misses
+    hit_ratio = scan_hits / scanned if scanned else 0.0
+    if use_cache:
+        print(f"\n扫描缓存：命中 {scan_hits}/{scanned}（{hit_ratio:.0%}），重新检测 {scan_misses} 个文件")
 
     if potential_conflicts:
         print(f"\n⚠️  检测到 {len(potential_conflicts)} 个潜在的文件名冲突：")
@@ -149,7 +487,13 @@ def analyze_images(image_dir='image'):
         },
         'potential_conflicts': potential_conflicts,
         'unknown_format': stats['unknown_format'],
-        'errors': stats['errors']
+        'errors': stats['errors'],
+        'scan_cache': {
+            'enabled': use_cache,
+            'hits': scan_hits,
+            'misses': scan_misses,
+            'hit_ratio': hit_ratio
+        }
     }
 
     report_file = 'conversion_plan.json'
@@ -162,5 +506,18 @@ def analyze_images(image_dir='image'):
     return report
 
 
+def main():
+    parser = argparse.ArgumentParser(description='分析图片目录中文件的实际格式，生成转换计划')
+    parser.add_argument('image_dirs', nargs='*', default=['image'], help='图片根目录，可多个 (默认: image)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归扫描子目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用扫描缓存，重新检测所有文件')
+    parser.add_argument('--cache-dir', help='缓存目录 (默认: $MD2PDF_CACHE_DIR 或 ~/.cache/markdown-to-pdf)')
+    args = parser.parse_args()
+
+    image_dir = args.image_dirs[0] if len(args.image_dirs) == 1 else args.image_dirs
+    report = analyze_images(image_dir, args.recursive, not args.no_cache, args.cache_dir)
+    return 0 if report is not None else 1
+
+
 if __name__ == '__main__':
-    analyze_images()
+    exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+PDF 渲染后端
+
+- wkhtmltopdf（默认）: pdfkit 调用 wkhtmltopdf 子进程，HTML 通过管道传入
+- weasyprint: 进程内渲染，不启动子进程；需要 pip3 install weasyprint 以及系统的 pango 库
+  （缺少 pango 时导入会抛出 OSError，视为未安装）
+
+每个后端提供:
+- name / install_hint
+- in_process: 是否在本进程内渲染（True 时按章节并行渲染改用进程池，见 chapter_render）
+- is_available()
+- render(html, output_file): 把完整 HTML 文档渲染为 PDF 文件
+- render_file(html_file, output_file): 渲染磁盘上的 HTML 文件（渲染器直接读取，文档不必整体驻留内存）
+- cache_options(): 影响输出的配置，参与 PDF 缓存键和分片复用键
+"""
+
+import contextlib
+import functools
+import io
+
+PDFKIT_INSTALL_HINT = [
+    "提示: 请确保已安装 wkhtmltopdf",
+    "  macOS: brew install wkhtmltopdf",
+    "  Linux: sudo apt-get install wkhtmltopdf",
+]
+
+WEASYPRINT_INSTALL_HINT = [
+    "提示: 请确保已安装 WeasyPrint 及其系统依赖 (pango)",
+    "  pip3 install weasyprint",
+    "  macOS: brew install pango",
+    "  Linux: sudo apt-get install libpango-1.0-0 libpangoft2-1.0-0",
+]
+
+
+class PdfkitBackend:
+    """wkhtmltopdf 子进程渲染"""
+
+    name = 'wkhtmltopdf'
+    install_hint = PDFKIT_INSTALL_HINT
+    in_process = False
+
+    def __init__(self, options=None):
+        self.options = dict(options or {})
+
+    @staticmethod
+    def is_available():
+        try:
+            import pdfkit
+            pdfkit.configuration()
+        except (ImportError, OSError):
+            return False
+        return True
+
+    def cache_options(self):
+        return self.options
+
+    def render(self, html, output_file):
+        import pdfkit
+        pdfkit.from_string(html, output_file, options=self.options)
+
+    def render_file(self, html_file, output_file):
+        import pdfkit
+        pdfkit.from_file(str(html_file), output_file, options=self.options)
+
+
+class WeasyPrintBackend:
+    """WeasyPrint 进程内渲染
+
+    页面尺寸和边距取自 CSS 的 @page 规则；wkhtmltopdf 命令行参数中的
+    页边距在这里以等效的 @page 样式表传入，保持版面一致。
+    """
+
+    name = 'weasyprint'
+    install_hint = WEASYPRINT_INSTALL_HINT
+    in_process = True
+
+    def __init__(self, options=None):
+        self.options = dict(options or {})
+        self._stylesheet = None
+
+    def __getstate__(self):
+        # 传给工作进程时不带已解析的样式表，在工作进程中按需重建
+        return {'options': self.options, '_stylesheet': None}
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _module():
+        try:
+            # 缺少系统库时 WeasyPrint 会在导入时打印大段安装说明，这里只需要判断是否可用
+            with contextlib.redirect_stdout(io.StringIO()):
+                import weasyprint
+        except (ImportError, OSError):
+            return None
+        return weasyprint
+
+    @classmethod
+    def is_available(cls):
+        return cls._module() is not None
+
+    def cache_options(self):
+        return {'page-size': self.options.get('page-size'), **self._margins()}
+
+    def _margins(self):
+        return {
+            side: self.options.get(f'margin-{side}', '15mm')
+            for side in ('top', 'right', 'bottom', 'left')
+        }
+
+    def _page_css(self):
+        margins = self._margins()
+        size = self.options.get('page-size', 'A4')
+        page = (f"@page {{ size: {size}; margin: {margins['top']} {margins['right']} "
+                f"{margins['bottom']} {margins['left']}; }}\n")
+        # 与 wkhtmltopdf 一致：no-outline 时不生成书签，否则书签层级对应 outline-depth 3
+        if 'no-outline' in self.options:
+            return page + "h1, h2, h3, h4, h5, h6 { bookmark-level: none; }"
+        return page + "h4, h5, h6 { bookmark-level: none; }"
+
+    def _stylesheets(self):
+        if self._stylesheet is None:
+            self._stylesheet = self._module().CSS(string=self._page_css())
+        return [self._stylesheet]
+
+    def render(self, html, output_file):
+        # 图片均为 file:// 绝对路径，base_url 只影响其余相对链接
+        self._module().HTML(string=html, base_url='.').write_pdf(output_file, stylesheets=self._stylesheets())
+
+    def render_file(self, html_file, output_file):
+        self._module().HTML(filename=str(html_file)).write_pdf(output_file, stylesheets=self._stylesheets())
+
+
+BACKENDS = {
+    PdfkitBackend.name: PdfkitBackend,
+    WeasyPrintBackend.name: WeasyPrintBackend,
+}
+
+DEFAULT_BACKEND = PdfkitBackend.name
+
+
+def get_backend(name=None, options=None):
+    """按名称创建后端实例"""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的渲染后端: {name}（可选: {', '.join(BACKENDS)}）")
+    return BACKENDS[name](options)
+
+
+def available_backends():
+    """当前环境可用的后端名称"""
+    return [name for name, cls in BACKENDS.items() if cls.is_available()]
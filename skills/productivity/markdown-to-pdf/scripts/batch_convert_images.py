@@ -2,34 +2,211 @@
 """
 批量转换 WebP 图片为 PNG 格式
 根据 conversion_plan.json 执行转换
+
+PNG optimize=True 编码只用一个核，转换任务分给进程池（--workers，默认 CPU 核数）。
+结果按转换计划的顺序汇总，filename_mapping.json 和 conversion_errors.json
+与任务完成的先后无关，和串行转换的输出相同。
+
+编码档位（--profile）:
+  fast      PNG 低压缩级别、不做 optimize，速度最快，文件较大
+  balanced  PNG optimize=True（默认，与之前的行为相同）
+  small     按内容选择格式：截图、示意图和带透明通道的图片保持无损 PNG，
+            照片（颜色丰富）保存为 JPEG，文件名改为 .jpg 并写入映射表
+
+使用方法:
+  python batch_convert_images.py
+  python batch_convert_images.py --plan conversion_plan.json --image-dir image --workers 4
+  python batch_convert_images.py --profile small
 """
 
+import argparse
 import os
 import json
 import shutil
-from pathlib import Path
+import time
+from pathlib import Path, PurePosixPath
 from PIL import Image
 
+from image_derivatives import JPEG_QUALITY, has_alpha, is_photo
 
-def convert_webp_to_png(input_path, output_path):
-    """将 WebP 图片转换为 PNG 格式"""
+# 编码档位: PNG 压缩参数；photo_jpeg 为 True 时照片改存 JPEG
+IMAGE_PROFILES = {
+    'fast': {'optimize': False, 'compress_level': 1, 'photo_jpeg': False},
+    'balanced': {'optimize': True, 'compress_level': 9, 'photo_jpeg': False},
+    'small': {'optimize': True, 'compress_level': 9, 'photo_jpeg': True},
+}
+
+DEFAULT_IMAGE_PROFILE = 'balanced'
+
+
+def convert_image(input_path, output_path, profile=DEFAULT_IMAGE_PROFILE, allow_jpeg=True, jpeg_path=None):
+    """按编码档位转换图片，返回 (成功, 错误信息, 实际输出路径)
+
+    small 档位下照片保存为 JPEG，写入 jpeg_path（默认把输出路径的扩展名改为 .jpg）；
+    allow_jpeg=False（如 .jpg 文件名已被占用）时始终保存为 PNG。
+    """
+    settings = IMAGE_PROFILES[profile]
+    output_path = Path(output_path)
+    jpeg_path = Path(jpeg_path) if jpeg_path else output_path.with_suffix('.jpg')
     try:
         with Image.open(input_path) as img:
             # 处理 RGBA 模式
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 保持透明度
-                img.save(output_path, 'PNG', optimize=True)
-            else:
+            if img.mode not in ('RGBA', 'LA', 'P'):
                 # 转换为 RGB
-                rgb_img = img.convert('RGB')
-                rgb_img.save(output_path, 'PNG', optimize=True)
-        return True, None
+                img = img.convert('RGB')
+            if settings['photo_jpeg'] and allow_jpeg and not has_alpha(img) and is_photo(img):
+                output_path = jpeg_path
+                img.convert('RGB').save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            else:
+                # 保持透明度
+                img.save(output_path, 'PNG', optimize=settings['optimize'],
+                         compress_level=settings['compress_level'])
+        return True, None, output_path
     except Exception as e:
-        return False, str(e)
+        return False, str(e), None
 
 
-def batch_convert(plan_file='conversion_plan.json', image_dir='image'):
-    """批量转换图片"""
+def convert_webp_to_png(input_path, output_path):
+    """将 WebP 图片转换为 PNG 格式"""
+    success, error, _ = convert_image(input_path, output_path, 'balanced', allow_jpeg=False)
+    return success, error
+
+
+def _convert_task(task):
+    """在工作进程中转换一个文件，返回 (成功, 错误信息, 是否保存为 JPEG)
+
+    no_ext: 转换为新文件名后删除原文件；wrong_ext: 先写临时文件再替换原文件。
+    jpeg_path 为 None 时不允许保存为 JPEG；临时文件名由 _plan_tasks 预先占用。
+    """
+    kind, old_path, new_path, jpeg_path, profile, temp_paths = task
+    if kind == 'no_ext':
+        success, error, output = convert_image(old_path, new_path, profile, jpeg_path is not None)
+        if success:
+            # 删除原文件
+            old_path.unlink()
+        return success, error, success and output != new_path
+
+    # 写入临时文件（PNG 和 JPEG 各有一个预先占用的临时文件名）
+    temp_path, jpeg_temp = temp_paths
+    success, error, output = convert_image(old_path, temp_path, profile, jpeg_path is not None, jpeg_temp)
+    if not success:
+        # 清理临时文件
+        for path in temp_paths:
+            if path and path.exists():
+                path.unlink()
+        return success, error, False
+    if output != temp_path:
+        # 照片改存为 .jpg，删除原文件
+        shutil.move(str(output), str(jpeg_path))
+        if jpeg_path != old_path:
+            old_path.unlink()
+        return success, error, True
+    # 替换原文件
+    shutil.move(str(temp_path), str(old_path))
+    return success, error, False
+
+
+def _jpeg_name(name):
+    return PurePosixPath(name).with_suffix('.jpg').as_posix()
+
+
+def _mapping_key(item, name):
+    """filename_mapping 的键：单个图片目录时为文件名，多个根目录时为文件的绝对路径（避免同名文件冲突）"""
+    if 'root' not in item:
+        return name
+    return Path(os.path.abspath(Path(item['root']) / name)).as_posix()
+
+
+def _plan_tasks(plan, image_path, profile=DEFAULT_IMAGE_PROFILE):
+    """按转换计划的顺序生成任务 (类型, 原文件名, 新文件名, 工作进程参数)
+
+    文件名即 filename_mapping 的键和值（多个根目录时为绝对路径，见 _mapping_key）。
+    目标文件已存在，或已被前面的任务占用时参数为 None（跳过）；
+    small 档位下 .jpg 文件名同样预先占用，被占用时该文件只保存为 PNG。
+    wrong_ext 的临时文件名也预先占用，已存在时跳过该文件，不会覆盖其他文件。
+    这样跳过哪些文件、输出什么文件名都不取决于任务的完成顺序。
+    多个根目录的计划中每一项带有 root 字段，文件相对于该目录。
+    """
+    photo_jpeg = IMAGE_PROFILES[profile]['photo_jpeg']
+    tasks = []
+    claimed = set()
+
+    def is_free(path):
+        return path not in claimed and not path.exists()
+
+    def claim_jpeg(jpeg_path, own_path=None):
+        if not photo_jpeg:
+            return None
+        if jpeg_path != own_path and not is_free(jpeg_path):
+            return None
+        claimed.add(jpeg_path)
+        return jpeg_path
+
+    for item in plan['conversion_plan']['webp_no_ext']:
+        old_name = item['file']
+        new_name = item['new_name']
+        root = Path(item['root']) if 'root' in item else image_path
+        new_path = root / new_name
+        if not is_free(new_path):
+            tasks.append(('no_ext', _mapping_key(item, old_name), _mapping_key(item, new_name), None))
+            continue
+        claimed.add(new_path)
+        jpeg_path = claim_jpeg(root / _jpeg_name(new_name))
+        tasks.append(('no_ext', _mapping_key(item, old_name), _mapping_key(item, new_name),
+                      ('no_ext', root / old_name, new_path, jpeg_path, profile, None)))
+    for item in plan['conversion_plan']['webp_wrong_ext']:
+        file_name = item['file']
+        root = Path(item['root']) if 'root' in item else image_path
+        file_path = root / file_name
+        temp_path = root / f"{file_name}.temp"
+        if not is_free(temp_path):
+            tasks.append(('wrong_ext', _mapping_key(item, file_name), _mapping_key(item, temp_path.name), None))
+            continue
+        claimed.update((file_path, temp_path))
+        jpeg_path = claim_jpeg(root / _jpeg_name(file_name), file_path)
+        jpeg_temp = None
+        if jpeg_path is not None:
+            jpeg_temp = root / f"{file_name}.jpg.temp"
+            if is_free(jpeg_temp):
+                claimed.add(jpeg_temp)
+            else:
+                # JPEG 临时文件名被占用时只保存为 PNG
+                if jpeg_path != file_path:
+                    claimed.discard(jpeg_path)
+                jpeg_path = jpeg_temp = None
+        name = _mapping_key(item, file_name)
+        tasks.append(('wrong_ext', name, name,
+                      ('wrong_ext', file_path, file_path, jpeg_path, profile, (temp_path, jpeg_temp))))
+    return tasks
+
+
+def _run_tasks(tasks, workers):
+    """按任务顺序逐个产生 (任务, 结果)；跳过的任务结果为 None"""
+    jobs = [task[3] for task in tasks if task[3] is not None]
+    if workers == 1 or len(jobs) < 2:
+        results = map(_convert_task, jobs)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # 小任务很多时按块分发，减少进程间往返
+        results = pool.map(_convert_task, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+
+    try:
+        # map 按提交顺序返回结果
+        for task in tasks:
+            yield task, (next(results) if task[3] is not None else None)
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+def batch_convert(plan_file='conversion_plan.json', image_dir='image', workers=None,
+                  profile=DEFAULT_IMAGE_PROFILE):
+    """批量转换图片，返回统计、文件名映射和错误列表
+
+    profile: 编码档位（IMAGE_PROFILES 中的名称）
+    """
 
     # 读取转换计划
     if not Path(plan_file).exists():
@@ -41,16 +218,22 @@ def batch_convert(plan_file='conversion_plan.json', image_dir='image'):
         plan = json.load(f)
 
     image_path = Path(image_dir)
-    if not image_path.exists():
+    items = plan['conversion_plan']['webp_no_ext'] + plan['conversion_plan']['webp_wrong_ext']
+    if not image_path.exists() and not all('root' in item for item in items):
         print(f"错误：目录 {image_dir} 不存在")
         return
 
+    workers = max(1, workers or os.cpu_count() or 1)
+
     # 统计数据
     stats = {
         'total': 0,
         'success': 0,
         'skipped': 0,
-        'failed': 0
+        'failed': 0,
+        'jpeg': 0,
+        'bytes_before': 0,
+        'bytes_after': 0
     }
 
     # 文件名映射表（用于更新 Markdown）
@@ -63,77 +246,59 @@ def batch_convert(plan_file='conversion_plan.json', image_dir='image'):
     print("开始批量转换图片")
     print("="*60)
 
-    # 处理无扩展名的 WebP
-    webp_no_ext = plan['conversion_plan']['webp_no_ext']
-    if webp_no_ext:
-        print(f"\n处理无扩展名的 WebP 文件（{len(webp_no_ext)} 个）...")
-
-        for item in webp_no_ext:
-            stats['total'] += 1
-            old_name = item['file']
-            new_name = item['new_name']
-
-            old_path = image_path / old_name
-            new_path = image_path / new_name
-
-            # 检查目标文件是否已存在
-            if new_path.exists():
-                print(f"  跳过：{new_name} 已存在")
-                stats['skipped'] += 1
-                continue
-
-            # 转换图片
-            success, error = convert_webp_to_png(old_path, new_path)
-
-            if success:
-                print(f"  ✓ {old_name} → {new_name}")
-                stats['success'] += 1
-
-                # 删除原文件
-                old_path.unlink()
-
+    headers = {
+        'no_ext': f"\n处理无扩展名的 WebP 文件（{len(plan['conversion_plan']['webp_no_ext'])} 个）...",
+        'wrong_ext': f"\n处理有错误扩展名的 WebP 文件（{len(plan['conversion_plan']['webp_wrong_ext'])} 个）...",
+    }
+    tasks = _plan_tasks(plan, image_path, profile)
+    if tasks:
+        print(f"并发进程：{min(workers, len(tasks))} 个，编码档位：{profile}")
+        # 转换前统计原文件大小（转换后原文件可能已被删除或替换）
+        sizes = {}
+        for task in tasks:
+            if task[3] is not None:
+                try:
+                    sizes[task[3][1]] = task[3][1].stat().st_size
+                except OSError:
+                    pass
+
+    start = time.perf_counter()
+    current = None
+    for (kind, old_name, new_name, job), result in _run_tasks(tasks, workers):
+        if kind != current:
+            current = kind
+            print(headers[kind])
+        stats['total'] += 1
+
+        # 目标文件已存在
+        if result is None:
+            print(f"  跳过：{new_name} 已存在")
+            stats['skipped'] += 1
+            continue
+
+        success, error, is_jpeg = result
+        if success:
+            if is_jpeg:
+                new_name = _jpeg_name(new_name)
+                stats['jpeg'] += 1
+            if new_name != old_name:
+                print(f"  ✓ {old_name} → {new_name}" + (" (照片，已保存为 JPEG)" if is_jpeg else ""))
                 # 记录文件名映射
                 filename_mapping[old_name] = new_name
             else:
-                print(f"  ✗ {old_name} 转换失败：{error}")
-                stats['failed'] += 1
-                errors.append({
-                    'file': old_name,
-                    'error': error
-                })
-
-    # 处理有错误扩展名的 WebP
-    webp_wrong_ext = plan['conversion_plan']['webp_wrong_ext']
-    if webp_wrong_ext:
-        print(f"\n处理有错误扩展名的 WebP 文件（{len(webp_wrong_ext)} 个）...")
-
-        for item in webp_wrong_ext:
-            stats['total'] += 1
-            file_name = item['file']
-            file_path = image_path / file_name
-
-            # 创建临时文件
-            temp_path = image_path / f"{file_name}.temp"
-
-            # 转换图片
-            success, error = convert_webp_to_png(file_path, temp_path)
-
-            if success:
-                # 替换原文件
-                shutil.move(str(temp_path), str(file_path))
-                print(f"  ✓ {file_name} (已转换为真正的 PNG)")
-                stats['success'] += 1
-            else:
-                print(f"  ✗ {file_name} 转换失败：{error}")
-                stats['failed'] += 1
-                errors.append({
-                    'file': file_name,
-                    'error': error
-                })
-
-                # 清理临时文件
-                if temp_path.exists():
-                    temp_path.unlink()
+                print(f"  ✓ {old_name} (已转换为真正的 {'JPEG' if is_jpeg else 'PNG'})")
+            stats['success'] += 1
+            output_path = job[1].parent / PurePosixPath(new_name).name
+            stats['bytes_before'] += sizes.get(job[1], 0)
+            stats['bytes_after'] += output_path.stat().st_size
+        else:
+            print(f"  ✗ {old_name} 转换失败：{error}")
+            stats['failed'] += 1
+            errors.append({
+                'file': old_name,
+                'error': error
+            })
+    elapsed = time.perf_counter() - start
 
     # 生成报告
     print("\n" + "="*60)
@@ -143,6 +308,11 @@ def batch_convert(plan_file='conversion_plan.json', image_dir='image'):
     print(f"成功：{stats['success']} 个")
     print(f"跳过：{stats['skipped']} 个")
     print(f"失败：{stats['failed']} 个")
+    if stats['jpeg']:
+        print(f"其中照片保存为 JPEG：{stats['jpeg']} 个")
+    if stats['success']:
+        print(f"耗时：{elapsed:.1f}s（{stats['success'] / elapsed:.1f} 张/秒）")
+        print(f"大小：{stats['bytes_before'] / 1024 / 1024:.2f} MB → {stats['bytes_after'] / 1024 / 1024:.2f} MB")
 
     if errors:
         print(f"\n错误详情：")
@@ -168,6 +338,25 @@ def batch_convert(plan_file='conversion_plan.json', image_dir='image'):
 
     print("="*60)
 
+    return {
+        'stats': stats,
+        'filename_mapping': filename_mapping,
+        'errors': errors,
+        'seconds': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据转换计划批量把 WebP 图片转换为 PNG')
+    parser.add_argument('--plan', default='conversion_plan.json', help='转换计划文件 (默认: conversion_plan.json)')
+    parser.add_argument('--image-dir', default='image', help='图片目录 (默认: image)')
+    parser.add_argument('-j', '--workers', type=int, help='并发进程数 (默认: CPU 核数)')
+    parser.add_argument('--profile', choices=list(IMAGE_PROFILES), default=DEFAULT_IMAGE_PROFILE,
+                        help=f'编码档位：fast 最快、balanced 与之前相同、small 照片改存 JPEG (默认: {DEFAULT_IMAGE_PROFILE})')
+    args = parser.parse_args()
+
+    batch_convert(args.plan, args.image_dir, args.workers, args.profile)
+
 
 if __name__ == '__main__':
-    batch_convert()
+    main()
@@ -0,0 +1,1088 @@
+#!/usr/bin/env python3
+"""
+markdown-to-pdf 性能基准
+
+使用方法:
+  python benchmark.py preprocess              # 5 MB 笔记的预处理耗时（v2.0 正则方案 vs 扩展方案）
+  python benchmark.py preprocess --size-mb 20
+  python benchmark.py pipeline                # 合成语料上逐阶段计时，结果写入 JSON
+  python benchmark.py pipeline --chapters 100 --runs 5 --json bench.json --baseline old.json
+  python benchmark.py backends                # 各渲染后端在不同类型文档上的耗时、内存和 PDF 大小
+  python benchmark.py memory                  # 文档增大时的峰值内存（默认 vs --low-memory）
+  python benchmark.py tables                  # 5000 行表格的拆分前后对比
+  python benchmark.py derivatives             # --image-dpi 缩小前后的图片数据量、PDF 大小和渲染耗时
+  python benchmark.py images --workers 4      # WebP → PNG 批量转换：串行 vs 进程池的吞吐
+  python benchmark.py image-profiles          # 图片编码档位（fast / balanced / small）的耗时和输出大小
+  python benchmark.py startup --budget-ms 80  # 启动耗时预算，超出或导入了重依赖时返回非零
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import markdown
+import pdfkit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from backends import BACKENDS, available_backends, get_backend
+from convert import (
+    PDFKIT_OPTIONS,
+    Converter,
+    SCRIPT_DIR,
+    _code_fingerprint,
+    assemble_html,
+    create_markdown,
+    extract_metadata,
+    extract_toc_structure,
+    fix_image_paths,
+    generate_toc_html,
+    write_html,
+)
+from corpus import generate_large_blocks, write_corpus
+from profiling import max_rss_bytes
+
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite', 'toc', 'nl2br', 'tables', 'fenced_code']
+
+SECTION_TEMPLATE = """
+## {n}. 第 {n} 章 🚀
+
+**适用场景**: 基准测试
+
+### {n}.1 概述
+
+这是第 {n} 章的正文，包含 **粗体**、`行内代码` 和 [链接](https://example.com)。
+性能基准需要足够多的普通段落文本，模拟真实笔记中的叙述内容 🎉。
+
+![示意图](image/figure-{n}.png)
+<img src="image/shot-{n}" width="300">
+
+### {n}.2 代码
+
+```python
+def chapter_{n}(x):
+    return x * {n}
+```
+
+| 指标 | 数值 |
+|------|------|
+| 章节 | {n} |
+| 状态 | ok |
+
+### 补充说明
+
+- 列表项 A
+- 列表项 B
+"""
+
+
+def make_note(size_bytes):
+    """生成指定大小的笔记（字节数近似）"""
+    parts = ["# 基准测试文档\n\n**创建者**: benchmark\n**最后更新**: 2025-01-01\n"]
+    total = len(parts[0].encode('utf-8'))
+    n = 0
+    while total < size_bytes:
+        n += 1
+        section = SECTION_TEMPLATE.format(n=n)
+        parts.append(section)
+        total += len(section.encode('utf-8'))
+    return ''.join(parts), n
+
+
+def _legacy_process_markdown(md_content):
+    """v2.0 的 process_markdown（多次整篇 re.sub 后再解析），仅作为基准对照"""
+    metadata_patterns = [
+        r'^\*\*创建者\*\*:.+?$',
+        r'^\*\*为谁创建\*\*:.+?$',
+        r'^\*\*基于\*\*:.+?$',
+        r'^\*\*最后更新\*\*:.+?$',
+        r'^\*\*适用场景\*\*:.+?$',
+    ]
+    for pattern in metadata_patterns:
+        md_content = re.sub(pattern, '', md_content, flags=re.MULTILINE)
+
+    md_content = re.sub(r'[\U0001F300-\U0001F9FF]', '', md_content)
+
+    h2_counter = {'count': 0}
+
+    def add_h2_id(match):
+        h2_counter['count'] += 1
+        full_match = match.group(0)
+        page_break = '' if h2_counter['count'] == 1 else '\n<div class="chapter-break"></div>\n\n'
+        numbered_match = re.match(r'\n## (\d+)\.\s+(.+?)\n', full_match)
+        if numbered_match:
+            num = numbered_match.group(1)
+            title = numbered_match.group(2).strip()
+            id_str = f"{num}-{title}".replace(' ', '-').replace(':', '').lower()
+            return f'{page_break}<h2 id="{id_str}" data-number="{num}">{title}</h2>\n'
+        plain_match = re.match(r'\n## (.+?)\n', full_match)
+        if plain_match:
+            title = plain_match.group(1).strip()
+            id_str = title.replace(' ', '-').replace(':', '').lower()
+            return f'{page_break}<h2 id="{id_str}">{title}</h2>\n'
+        return full_match
+
+    md_content = re.sub(r'\n## .+?\n', add_h2_id, md_content)
+
+    def add_h3_id(match):
+        full_match = match.group(0)
+        numbered_match = re.match(r'\n### (\d+\.\d+)\s+(.+?)\n', full_match)
+        if numbered_match:
+            num = numbered_match.group(1)
+            title = numbered_match.group(2).strip()
+            id_str = f"{num}-{title}".replace(' ', '-').replace(':', '').replace('.', '-').lower()
+            return f'\n<h3 id="{id_str}" data-number="{num}">{title}</h3>\n'
+        plain_match = re.match(r'\n### (.+?)\n', full_match)
+        if plain_match:
+            title = plain_match.group(1).strip()
+            id_str = title.replace(' ', '-').replace(':', '').lower()
+            return f'\n<h3 id="{id_str}">{title}</h3>\n'
+        return full_match
+
+    md_content = re.sub(r'\n### .+?\n', add_h3_id, md_content)
+    return md_content
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _accumulate(func, times, name):
+    """包装函数，把每次调用的耗时累加到 times[name]"""
+    times[name] = 0.0
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            times[name] += time.perf_counter() - start
+    return wrapper
+
+
+def bench_preprocess(size_mb):
+    """对比 v2.0 正则预处理和 Markdown 扩展方案"""
+    md_content, chapters = make_note(int(size_mb * 1024 * 1024))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        md_file = Path(tmp) / 'note.md'
+        md_file.write_text(md_content, encoding='utf-8')
+
+        print(f"文档大小: {len(md_content.encode('utf-8')) / 1024 / 1024:.1f} MB, {chapters} 个章节")
+
+        # 图片路径解析的日志不计入对比
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            # 之前: extract_toc_structure + fix_image_paths + 正则预处理 + markdown.markdown
+            _, t_toc = _timed(extract_toc_structure, md_content)
+            fixed, t_images = _timed(fix_image_paths, md_content, md_file)
+            prepared, t_regex = _timed(_legacy_process_markdown, fixed)
+            _, t_parse_legacy = _timed(lambda text: markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS), prepared)
+
+            # 之后: 一次解析完成所有处理，单独统计扩展中各处理器的耗时
+            md, _ = create_markdown(md_file)
+            processor_times = {}
+            for registry, name in ((md.preprocessors, 'notes_strip'), (md.treeprocessors, 'notes_tree')):
+                processor = registry[name]
+                processor.run = _accumulate(processor.run, processor_times, name)
+            _, t_pipeline = _timed(md.convert, md_content)
+
+    legacy_pre = t_toc + t_images + t_regex
+    pipeline_pre = sum(processor_times.values())
+
+    print("\n" + "="*60)
+    print("预处理基准")
+    print("="*60)
+    print("之前 (v2.0 正则方案):")
+    print(f"  extract_toc_structure: {t_toc:.3f}s")
+    print(f"  fix_image_paths:       {t_images:.3f}s")
+    print(f"  正则预处理:            {t_regex:.3f}s")
+    print(f"  markdown 解析:         {t_parse_legacy:.3f}s")
+    print(f"  预处理合计:            {legacy_pre:.3f}s")
+    print(f"  总计:                  {legacy_pre + t_parse_legacy:.3f}s")
+    print("之后 (Markdown 扩展方案):")
+    print(f"  notes_strip:           {processor_times['notes_strip']:.3f}s")
+    print(f"  notes_tree:            {processor_times['notes_tree']:.3f}s")
+    print(f"  预处理合计:            {pipeline_pre:.3f}s")
+    print(f"  总计 (含解析):         {t_pipeline:.3f}s")
+    print("="*60)
+
+    return {
+        'legacy': {'toc': t_toc, 'images': t_images, 'regex': t_regex, 'parse': t_parse_legacy},
+        'pipeline': dict(processor_times, total=t_pipeline),
+    }
+
+
+# 与 Converter._convert 相同的阶段；markdown.* 为 Markdown.convert 内各扩展处理器的耗时，
+# merge 为按章节渲染时合并分片的耗时（包含在 render_pdf 内）
+PIPELINE_STAGES = [
+    'extract_metadata',
+    'markdown',
+    'assemble_html',
+    'render_pdf',
+    'merge',
+]
+
+# 计时的扩展处理器: (注册表, 名称)；未注册的（如禁用缓存时的 highlight_cache）不计入
+MARKDOWN_PROCESSORS = [
+    ('preprocessors', 'notes_strip'),
+    ('preprocessors', 'split_blocks'),
+    ('preprocessors', 'highlight_cache'),
+    ('treeprocessors', 'notes_tree'),
+]
+
+
+def _git_revision():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=SCRIPT_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _wkhtmltopdf_missing():
+    """wkhtmltopdf 不可用时返回原因，否则返回 None"""
+    try:
+        pdfkit.configuration()
+    except OSError as e:
+        return str(e).splitlines()[0]
+    return None
+
+
+def _summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'samples': samples,
+    }
+
+
+def _compare(result, baseline_file):
+    """与之前保存的结果逐阶段对比中位数"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n对比基线: {baseline_file} (git {baseline.get('git') or '?'}, 代码 {baseline.get('code', '?')})")
+    if baseline.get('corpus') != result['corpus']:
+        print("⚠️  语料参数与基线不同，结果仅供参考")
+    for stage, current in result['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before:
+            continue
+        ratio = current['median'] / before['median'] if before['median'] else float('inf')
+        flag = '⚠️ ' if ratio > 1.1 else '  '
+        print(f"  {flag}{stage:<24} {before['median']:.4f}s → {current['median']:.4f}s ({ratio:.2f}x)")
+    # 旧版基线中的 extract_toc_structure / fix_image_paths 等已并入 markdown 阶段，不能逐项对比
+    legacy = [stage for stage in baseline.get('stages', {}) if stage not in result['stages']]
+    if legacy:
+        print(f"  基线中的旧阶段（当前流程不单独执行）: {', '.join(legacy)}")
+
+
+def bench_pipeline(chapters=20, sections=3, images=2, runs=3, render=True, json_file=None, baseline=None,
+                   split_chapters=False):
+    """在合成语料上对转换流程逐阶段计时（阶段与 Converter 的实际流程一致）"""
+    import chapter_render
+
+    render_skipped = None if render else '--no-render'
+    if render:
+        render_skipped = _wkhtmltopdf_missing()
+
+    samples = {}
+    pdf_bytes = None
+
+    def record(stage, seconds):
+        samples.setdefault(stage, []).append(seconds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        md_file = write_corpus(tmp, chapters=chapters, sections=sections, images=images)
+        md_content = md_file.read_text(encoding='utf-8')
+        image_count = len(os.listdir(Path(tmp) / 'image'))
+        pdf_file = os.path.join(tmp, 'corpus.pdf')
+        html_file = os.path.join(tmp, 'corpus.html')
+
+        print(f"语料: {chapters} 章 x {sections} 小节, {image_count} 张图片, "
+              f"{len(md_content.encode('utf-8')) / 1024:.0f} KB, 运行 {runs} 次"
+              f"{'，按章节渲染' if split_chapters else ''}")
+
+        converter = Converter(use_cache=False, split_chapters=split_chapters)
+        processor_times = {}
+        for registry_name, name in MARKDOWN_PROCESSORS:
+            registry = getattr(converter.md, registry_name)
+            if name in registry:
+                processor = registry[name]
+                processor.run = _accumulate(processor.run, processor_times, f'markdown.{name}')
+        merge_times = {}
+        merge_chunks = chapter_render.merge_chunks
+        chapter_render.merge_chunks = _accumulate(merge_chunks, merge_times, 'merge')
+
+        try:
+            for _ in range(runs):
+                processor_times.update(dict.fromkeys(processor_times, 0.0))
+                merge_times['merge'] = 0.0
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    metadata, t = _timed(extract_metadata, md_content)
+                    record('extract_metadata', t)
+                    (html_content, toc_structure), t = _timed(converter.render_html, md_content, md_file)
+                    record('markdown', t)
+                    for name, seconds in processor_times.items():
+                        record(name, seconds)
+
+                    def assemble():
+                        with open(html_file, 'w', encoding='utf-8') as f:
+                            write_html(f, metadata, generate_toc_html(toc_structure), html_content, converter.css)
+                    _, t = _timed(assemble)
+                    record('assemble_html', t)
+
+                    if not render_skipped:
+                        def render_pdf():
+                            if not (split_chapters and converter._render_chapters(
+                                    metadata, generate_toc_html(toc_structure), html_content, pdf_file)):
+                                converter.backend.render_file(html_file, pdf_file)
+                        _, t = _timed(render_pdf)
+                        record('render_pdf', t)
+                        if split_chapters:
+                            record('merge', merge_times['merge'])
+                        pdf_bytes = os.path.getsize(pdf_file)
+        finally:
+            chapter_render.merge_chunks = merge_chunks
+
+    result = {
+        'benchmark': 'pipeline',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'python': platform.python_version(),
+        'markdown': markdown.__version__,
+        'corpus': {
+            'chapters': chapters,
+            'sections': sections,
+            'images_per_chapter': images,
+            'markdown_bytes': len(md_content.encode('utf-8')),
+            'image_files': image_count,
+        },
+        'runs': runs,
+        'split_chapters': split_chapters,
+        'stages': {stage: _summarize(values) for stage, values in samples.items()},
+        'render_skipped': render_skipped,
+        'pdf_bytes': pdf_bytes,
+    }
+
+    print("\n" + "="*60)
+    print("转换流程逐阶段耗时（中位数 / 最小值）")
+    print("="*60)
+    for stage, summary in result['stages'].items():
+        print(f"  {stage:<24} {summary['median']:.4f}s / {summary['min']:.4f}s")
+    if render_skipped:
+        print(f"  {'render_pdf':<24} 跳过: {render_skipped}")
+    elif pdf_bytes:
+        print(f"  PDF 大小: {pdf_bytes / 1024 / 1024:.1f} MB")
+    print("="*60)
+
+    if baseline:
+        _compare(result, baseline)
+
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+
+    return result
+
+
+# 后端对比用的文档类型（corpus.generate_document 参数）
+DOCUMENT_CLASSES = {
+    'text': dict(chapters=20, sections=4, images=0, tables=0, code_blocks=0),
+    'code': dict(chapters=20, sections=4, images=0, tables=1, code_blocks=4),
+    'images': dict(chapters=20, sections=2, images=6, tables=0, code_blocks=0),
+    'mixed': dict(chapters=20, sections=3, images=2, tables=1, code_blocks=1),
+}
+
+
+def _measure_render(job):
+    """在新的子进程中渲染一次，返回耗时和内存（每次测量都是独立进程，峰值 RSS 互不影响）"""
+    backend_name, html_file, pdf_file = job
+    start = time.perf_counter()
+    backend = get_backend(backend_name, PDFKIT_OPTIONS)
+    backend.is_available()  # 导入渲染库
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.render_file(html_file, pdf_file)
+    render_seconds = time.perf_counter() - start
+
+    return {
+        'import_seconds': import_seconds,
+        'render_seconds': render_seconds,
+        'rss_self_bytes': max_rss_bytes(),
+        'rss_children_bytes': max_rss_bytes(children=True),
+        'pdf_bytes': os.path.getsize(pdf_file),
+    }
+
+
+def bench_backends(backends=None, classes=None, runs=3, json_file=None):
+    """对比各渲染后端（延迟、峰值内存、PDF 大小），按文档类型给出最快的后端"""
+    available = available_backends()
+    backends = backends or list(BACKENDS)
+    for name in backends:
+        if name not in available:
+            print(f"⏭️  跳过不可用的后端: {name}")
+    backends = [name for name in backends if name in available]
+    if not backends:
+        print("❌ 没有可用的渲染后端（wkhtmltopdf / weasyprint 均未安装）")
+        return None
+
+    classes = classes or list(DOCUMENT_CLASSES)
+    results = {}
+    spawn = get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        converter = Converter(use_cache=False)
+        for doc_class in classes:
+            class_dir = Path(tmp) / doc_class
+            md_file = write_corpus(class_dir, **DOCUMENT_CLASSES[doc_class])
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                md_content = md_file.read_text(encoding='utf-8')
+                html_content, toc_structure = converter.render_html(md_content, md_file)
+                document = assemble_html(
+                    extract_metadata(md_content), generate_toc_html(toc_structure), html_content, converter.css
+                )
+            html_file = class_dir / 'document.html'
+            html_file.write_text(document, encoding='utf-8')
+
+            results[doc_class] = {}
+            for name in backends:
+                samples = []
+                for run in range(runs):
+                    job = (name, str(html_file), str(class_dir / f"{name}-{run}.pdf"))
+                    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                        samples.append(pool.submit(_measure_render, job).result())
+                rss = [
+                    (s['rss_self_bytes'] or 0) + (s['rss_children_bytes'] or 0) for s in samples
+                ] if resource else None
+                results[doc_class][name] = {
+                    'render': _summarize([s['render_seconds'] for s in samples]),
+                    'import_seconds': statistics.median(s['import_seconds'] for s in samples),
+                    'peak_rss_bytes': max(rss) if rss else None,
+                    'pdf_bytes': samples[-1]['pdf_bytes'],
+                }
+
+    print("\n" + "="*72)
+    print("渲染后端对比（渲染耗时中位数；内存为 Python 进程与渲染子进程峰值 RSS 之和）")
+    print("="*72)
+    fastest = {}
+    for doc_class, by_backend in results.items():
+        fastest[doc_class] = min(by_backend, key=lambda name: by_backend[name]['render']['median'])
+        print(f"{doc_class}:")
+        for name, r in by_backend.items():
+            mark = ' ← 最快' if name == fastest[doc_class] else ''
+            memory = f"{r['peak_rss_bytes'] / 1024 / 1024:7.1f} MB" if r['peak_rss_bytes'] else '      ?'
+            print(f"  {name:<12} {r['render']['median']:>7.2f}s  导入 {r['import_seconds']:.2f}s  "
+                  f"内存 {memory}  PDF {r['pdf_bytes'] / 1024:8.0f} KB{mark}")
+    print("="*72)
+
+    result = {
+        'benchmark': 'backends',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'runs': runs,
+        'classes': {name: DOCUMENT_CLASSES[name] for name in classes},
+        'results': results,
+        'fastest': fastest,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+def _measure_convert(job):
+    """在新的子进程中完整转换一次，返回峰值 RSS（渲染失败时仍记录 Python 侧内存）"""
+    md_file, pdf_file, low_memory = job
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        ok = Converter(use_cache=False, low_memory=low_memory).convert(md_file, pdf_file) is not None
+    return {
+        'seconds': time.perf_counter() - start,
+        'rendered': ok,
+        'rss_self_bytes': max_rss_bytes(),
+        'rss_children_bytes': max_rss_bytes(children=True),
+    }
+
+
+def bench_memory(chapter_counts=(25, 100, 400), json_file=None):
+    """文档逐步增大时的峰值 RSS：默认模式 vs --low-memory"""
+    if resource is None:
+        print("❌ 当前平台无法读取峰值 RSS")
+        return None
+    render_skipped = _wkhtmltopdf_missing()
+    if render_skipped:
+        print(f"⚠️  {render_skipped}，只测量 Python 侧内存")
+
+    spawn = get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for chapters in chapter_counts:
+            md_file = write_corpus(Path(tmp) / f"c{chapters}", chapters=chapters, sections=4,
+                                   images=0, tables=1, code_blocks=2)
+            row = {'chapters': chapters, 'markdown_bytes': md_file.stat().st_size}
+            for mode, low_memory in (('default', False), ('low_memory', True)):
+                job = (str(md_file), str(md_file.with_suffix('.pdf')), low_memory)
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    row[mode] = pool.submit(_measure_convert, job).result()
+            results.append(row)
+
+    print("\n" + "="*72)
+    print("峰值内存（Python 进程 RSS" + ("" if render_skipped else "；括号内为渲染子进程") + "）")
+    print("="*72)
+    print(f"  {'章节':>6} {'Markdown':>10} {'默认':>18} {'--low-memory':>18}")
+    for row in results:
+        cells = []
+        for mode in ('default', 'low_memory'):
+            r = row[mode]
+            cell = f"{r['rss_self_bytes'] / 1024 / 1024:6.0f} MB"
+            if not render_skipped:
+                cell += f" ({r['rss_children_bytes'] / 1024 / 1024:4.0f} MB)"
+            cells.append(cell)
+        print(f"  {row['chapters']:>6} {row['markdown_bytes'] / 1024:>8.0f} KB {cells[0]:>18} {cells[1]:>18}")
+    print("="*72)
+
+    result = {
+        'benchmark': 'memory',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'render_skipped': render_skipped,
+        'results': results,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+def bench_tables(table_rows=5000, code_lines=2000, json_file=None):
+    """超长表格/代码块：拆分（默认阈值）与不拆分的 Markdown 耗时、HTML 大小和渲染耗时、内存"""
+    available = available_backends()
+    backend = 'wkhtmltopdf' if 'wkhtmltopdf' in available else (available[0] if available else None)
+    if backend is None:
+        print("⚠️  没有可用的渲染后端，只测量 Markdown 阶段")
+
+    spawn = get_context('spawn')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        md_file = Path(tmp) / 'large.md'
+        md_file.write_text(generate_large_blocks(table_rows, code_lines), encoding='utf-8')
+        md_content = md_file.read_text(encoding='utf-8')
+        print(f"文档: {table_rows} 行表格 + {code_lines} 行代码块, {len(md_content.encode('utf-8')) / 1024:.0f} KB")
+
+        modes = {
+            'split': Converter(use_cache=False),
+            'unsplit': Converter(use_cache=False, max_table_rows=0, max_code_lines=0),
+        }
+        for mode, converter in modes.items():
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                (html_content, toc_structure), markdown_seconds = _timed(converter.render_html, md_content, md_file)
+                document = assemble_html(
+                    extract_metadata(md_content), generate_toc_html(toc_structure), html_content, converter.css
+                )
+            html_file = Path(tmp) / f"{mode}.html"
+            html_file.write_text(document, encoding='utf-8')
+            row = {
+                'markdown_seconds': markdown_seconds,
+                'tables': html_content.count('<table>'),
+                'code_blocks': html_content.count('class="codehilite"'),
+                'html_bytes': len(document.encode('utf-8')),
+            }
+            if backend:
+                job = (backend, str(html_file), str(Path(tmp) / f"{mode}.pdf"))
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    try:
+                        row.update(pool.submit(_measure_render, job).result())
+                    except Exception as e:
+                        row['render_error'] = str(e).splitlines()[0]
+            results[mode] = row
+
+    print("\n" + "="*72)
+    print(f"超长表格/代码块拆分（渲染后端: {backend or '无'}）")
+    print("="*72)
+    for mode, r in results.items():
+        line = (f"  {mode:<8} Markdown {r['markdown_seconds']:6.2f}s  表格 {r['tables']:>4} 段  "
+                f"代码 {r['code_blocks']:>3} 段  HTML {r['html_bytes'] / 1024:6.0f} KB")
+        if 'render_seconds' in r:
+            rss = (r['rss_self_bytes'] or 0) + (r['rss_children_bytes'] or 0)
+            line += f"  渲染 {r['render_seconds']:6.2f}s  内存 {rss / 1024 / 1024:5.0f} MB"
+        elif 'render_error' in r:
+            line += f"  渲染失败: {r['render_error']}"
+        print(line)
+    print("="*72)
+
+    result = {
+        'benchmark': 'tables',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'table_rows': table_rows,
+        'code_lines': code_lines,
+        'backend': backend,
+        'results': results,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+def bench_derivatives(chapters=6, images=2, width=3840, height=2400, dpi=150, json_file=None):
+    """--image-dpi: 原图与缩小后的衍生件对比图片数据量、PDF 大小和渲染耗时（衍生件缓存冷/热各一次）"""
+    from profiling import Profiler
+
+    render_skipped = _wkhtmltopdf_missing()
+    if render_skipped:
+        print(f"⚠️  {render_skipped}，只测量图片缩小阶段")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        md_file = write_corpus(tmp, image_size=(width, height), chapters=chapters, sections=1,
+                               images=images, tables=0, code_blocks=0)
+        image_files = list((Path(tmp) / 'image').iterdir())
+        image_bytes = sum(path.stat().st_size for path in image_files)
+        print(f"文档: {chapters} 章, {len(image_files)} 张 {width}x{height} 图片, "
+              f"共 {image_bytes / 1024 / 1024:.1f} MB")
+
+        cache_dir = Path(tmp) / 'cache'
+        for mode, image_dpi in (('original', None), ('derived_cold', dpi), ('derived_warm', dpi)):
+            profiler = Profiler(mode)
+            converter = Converter(use_cache=False, cache_dir=cache_dir, image_dpi=image_dpi, profiler=profiler)
+            pdf_file = str(Path(tmp) / f"{mode}.pdf")
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                ok = converter.convert(str(md_file), pdf_file) is not None
+            profiler.finish()
+            stages = {stage['name']: stage['seconds'] for stage in profiler.stages}
+            results[mode] = {
+                'rendered': ok,
+                'markdown_seconds': stages.get('markdown', 0.0),
+                'derivative_seconds': profiler.metrics.get('image_derivative_seconds', 0.0),
+                'render_seconds': stages.get(converter.backend.name) if ok else None,
+                'pdf_bytes': os.path.getsize(pdf_file) if ok else None,
+            }
+
+    print("\n" + "="*72)
+    print(f"图片缩小（--image-dpi {dpi}）前后对比")
+    print("="*72)
+    for mode, r in results.items():
+        line = f"  {mode:<13} Markdown {r['markdown_seconds']:6.2f}s（缩小 {r['derivative_seconds']:6.2f}s）"
+        if r['rendered']:
+            line += f"  渲染 {r['render_seconds']:6.2f}s  PDF {r['pdf_bytes'] / 1024 / 1024:6.1f} MB"
+        print(line)
+    original, derived = results['original'], results['derived_warm']
+    if original['rendered'] and derived['rendered']:
+        print(f"  PDF 缩小 {(1 - derived['pdf_bytes'] / original['pdf_bytes']) * 100:.0f}%，"
+              f"渲染耗时 {original['render_seconds']:.2f}s → {derived['render_seconds']:.2f}s")
+    elif render_skipped:
+        print(f"  渲染跳过: {render_skipped}")
+    print("="*72)
+
+    result = {
+        'benchmark': 'derivatives',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'dpi': dpi,
+        'images': len(image_files),
+        'size': [width, height],
+        'image_bytes': image_bytes,
+        'render_skipped': render_skipped,
+        'results': results,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+def _run_image_batch(source_dir, work_dir, plan, workers):
+    """复制图片到 work_dir 后执行一次批量转换，返回 (耗时, 映射文件内容, 错误文件内容)"""
+    from batch_convert_images import batch_convert
+
+    shutil.copytree(source_dir, work_dir / 'image')
+    (work_dir / 'conversion_plan.json').write_text(json.dumps(plan), encoding='utf-8')
+    # batch_convert 把映射和错误日志写在当前目录
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = batch_convert('conversion_plan.json', 'image', workers)
+    finally:
+        os.chdir(original_dir)
+    outputs = []
+    for name in ('filename_mapping.json', 'conversion_errors.json'):
+        path = work_dir / name
+        outputs.append(path.read_bytes() if path.exists() else b'')
+    return result['seconds'], *outputs
+
+
+def bench_images(count=100, width=1024, height=640, workers=None, json_file=None):
+    """batch_convert_images: 串行（1 个进程）与进程池的吞吐对比，并检查输出文件完全相同"""
+    from PIL import Image
+
+    from corpus import make_png
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp) / 'source'
+        source_dir.mkdir()
+        plan = {'conversion_plan': {'webp_no_ext': [], 'webp_wrong_ext': []}}
+        for i in range(count):
+            # 渐变图片（纯色图片的 PNG 编码太快，不能代表截图）
+            with Image.open(io.BytesIO(make_png(width, height, seed=i))) as img:
+                buffer = io.BytesIO()
+                img.save(buffer, 'WEBP', quality=80)
+            if i % 2:
+                name = f"shot{i:05d}.png"
+                plan['conversion_plan']['webp_wrong_ext'].append({'file': name})
+            else:
+                name = f"shot{i:05d}"
+                plan['conversion_plan']['webp_no_ext'].append({'file': name, 'new_name': f"{name}.png"})
+            data = buffer.getvalue()
+            if i % 50 == 7:
+                data = data[:64]  # 截断的文件：检查错误日志的顺序
+            (source_dir / name).write_bytes(data)
+        print(f"图片: {count} 张 {width}x{height} WebP, 并发进程 {workers}")
+
+        results = {}
+        outputs = {}
+        for mode, mode_workers in (('serial', 1), ('parallel', workers)):
+            seconds, mapping, errors = _run_image_batch(source_dir, Path(tmp) / mode, plan, mode_workers)
+            outputs[mode] = (mapping, errors)
+            results[mode] = {
+                'workers': mode_workers,
+                'seconds': seconds,
+                'images_per_second': count / seconds if seconds else 0.0,
+            }
+
+    identical = outputs['serial'] == outputs['parallel']
+    speedup = results['serial']['seconds'] / results['parallel']['seconds'] if results['parallel']['seconds'] else 0.0
+
+    print("\n" + "="*72)
+    print("WebP → PNG 批量转换吞吐")
+    print("="*72)
+    for mode, r in results.items():
+        print(f"  {mode:<9} {r['workers']:>3} 进程  {r['seconds']:7.2f}s  {r['images_per_second']:7.1f} 张/秒")
+    print(f"  加速比 {speedup:.2f}x，filename_mapping.json / conversion_errors.json "
+          f"{'与串行完全相同' if identical else '与串行不同！'}")
+    print("="*72)
+
+    result = {
+        'benchmark': 'images',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'cpu_count': os.cpu_count(),
+        'images': count,
+        'size': [width, height],
+        'results': results,
+        'speedup': speedup,
+        'outputs_identical': identical,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+def _make_screenshot(width, height, seed):
+    """色块和文字组成的截图（颜色少，适合无损 PNG）"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new('RGB', (width, height), (250, 250, 252))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, 40], fill=(40, 44, 52))
+    for row, y in enumerate(range(60, height - 20, 24)):
+        color = ((seed * 53 + row * 17) % 200, 80, 160)
+        draw.rectangle([20, y, 20 + (row * 97 + seed * 31) % (width - 60) + 20, y + 14], fill=color)
+        draw.text((24, y), f"line {row} of screenshot {seed}", fill=(0, 0, 0))
+    return img
+
+
+def bench_image_profiles(count=20, width=1280, height=800, json_file=None):
+    """batch_convert_images 各编码档位在截图 + 照片样本上的耗时和输出大小"""
+    from PIL import Image
+
+    from batch_convert_images import IMAGE_PROFILES, convert_image
+    from corpus import make_png
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp) / 'source'
+        source_dir.mkdir()
+        samples = []
+        for i in range(count):
+            # 一半截图（无损 WebP），一半照片类渐变图（有损 WebP）
+            if i % 2:
+                kind = 'photo'
+                with Image.open(io.BytesIO(make_png(width, height, seed=i))) as img:
+                    img.save(source_dir / f"{i:04d}", 'WEBP', quality=80)
+            else:
+                kind = 'screenshot'
+                _make_screenshot(width, height, i).save(source_dir / f"{i:04d}", 'WEBP', lossless=True)
+            samples.append((kind, source_dir / f"{i:04d}"))
+        source_bytes = sum(path.stat().st_size for _, path in samples)
+        print(f"样本: {count} 张 {width}x{height} WebP（截图 {(count + 1) // 2}、照片 {count // 2}），"
+              f"共 {source_bytes / 1024 / 1024:.1f} MB")
+
+        results = {}
+        for profile in IMAGE_PROFILES:
+            out_dir = Path(tmp) / profile
+            out_dir.mkdir()
+            row = {'seconds': 0.0, 'bytes': 0, 'jpeg': 0, 'by_kind': {}}
+            for kind, path in samples:
+                start = time.perf_counter()
+                ok, error, output = convert_image(path, out_dir / f"{path.name}.png", profile)
+                seconds = time.perf_counter() - start
+                if not ok:
+                    raise RuntimeError(f"{path.name}: {error}")
+                size = output.stat().st_size
+                row['seconds'] += seconds
+                row['bytes'] += size
+                row['jpeg'] += output.suffix == '.jpg'
+                by_kind = row['by_kind'].setdefault(kind, {'seconds': 0.0, 'bytes': 0})
+                by_kind['seconds'] += seconds
+                by_kind['bytes'] += size
+            results[profile] = row
+
+    print("\n" + "="*72)
+    print("WebP 转换编码档位（单进程）")
+    print("="*72)
+    for profile, r in results.items():
+        kinds = '  '.join(
+            f"{kind} {k['bytes'] / 1024 / 1024:5.1f} MB" for kind, k in sorted(r['by_kind'].items())
+        )
+        print(f"  {profile:<9} {r['seconds']:7.2f}s  {count / r['seconds']:6.1f} 张/秒  "
+              f"输出 {r['bytes'] / 1024 / 1024:6.1f} MB ({kinds})  JPEG {r['jpeg']} 张")
+    print("="*72)
+
+    result = {
+        'benchmark': 'image_profiles',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'code': _code_fingerprint()[:12],
+        'images': count,
+        'size': [width, height],
+        'source_bytes': source_bytes,
+        'results': results,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存: {json_file}")
+    return result
+
+
+# 不应在 convert.py / workflow.py 模块加载时导入的重依赖
+HEAVY_MODULES = ['markdown', 'pygments', 'pdfkit', 'PIL', 'pypdf', 'weasyprint', 'concurrent.futures']
+
+STARTUP_COMMANDS = {
+    'convert.py --help': ['convert.py', '--help'],
+    'workflow.py --help': ['workflow.py', '--help'],
+}
+
+
+def _startup_seconds(args, runs):
+    """子进程启动到退出的墙钟耗时中位数"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _heavy_imports(module):
+    """导入模块后已加载的重依赖"""
+    code = (
+        f"import json, sys; import {module}; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPT_DIR,
+                            capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        return [f"导入失败: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else '?'}"]
+    return json.loads(result.stdout)
+
+
+def bench_startup(budget_ms=100, runs=10, json_file=None):
+    """启动耗时：与空解释器 (python -c pass) 的差值不得超过预算，模块加载时不得导入重依赖"""
+    baseline = _startup_seconds(['-c', 'pass'], runs)
+    print(f"空解释器启动: {baseline * 1000:.0f} ms（中位数，{runs} 次）")
+
+    failures = []
+    commands = {}
+    for label, args in STARTUP_COMMANDS.items():
+        seconds = _startup_seconds(args, runs)
+        overhead_ms = (seconds - baseline) * 1000
+        ok = overhead_ms <= budget_ms
+        if not ok:
+            failures.append(f"{label} 超出预算: {overhead_ms:.0f} ms > {budget_ms} ms")
+        commands[label] = {'seconds': seconds, 'overhead_ms': overhead_ms, 'ok': ok}
+        print(f"  {'✅' if ok else '❌'} {label:<22} {seconds * 1000:6.0f} ms（额外 {overhead_ms:.0f} ms）")
+
+    heavy = {}
+    for module in ('convert', 'workflow'):
+        loaded = _heavy_imports(module)
+        heavy[module] = loaded
+        if loaded:
+            failures.append(f"import {module} 加载了重依赖: {', '.join(loaded)}")
+        print(f"  {'✅' if not loaded else '❌'} import {module:<15} 重依赖: {', '.join(loaded) or '无'}")
+
+    result = {
+        'benchmark': 'startup',
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git': _git_revision(),
+        'python': platform.python_version(),
+        'budget_ms': budget_ms,
+        'baseline_seconds': baseline,
+        'commands': commands,
+        'heavy_imports': heavy,
+        'failures': failures,
+    }
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if failures:
+        print("\n❌ 启动预算检查未通过:")
+        for failure in failures:
+            print(f"  - {failure}")
+    else:
+        print(f"\n✅ 启动预算检查通过（预算 {budget_ms} ms）")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='markdown-to-pdf 性能基准')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_pre = sub.add_parser('preprocess', help='预处理耗时对比')
+    p_pre.add_argument('--size-mb', type=float, default=5, help='生成的笔记大小 (默认: 5 MB)')
+
+    p_pipe = sub.add_parser('pipeline', help='合成语料上的逐阶段耗时')
+    p_pipe.add_argument('--chapters', type=int, default=20, help='## 章节数 (默认: 20)')
+    p_pipe.add_argument('--sections', type=int, default=3, help='每章 ### 小节数 (默认: 3)')
+    p_pipe.add_argument('--images', type=int, default=2, help='每章图片数 (默认: 2)')
+    p_pipe.add_argument('--runs', type=int, default=3, help='重复次数，报告中位数 (默认: 3)')
+    p_pipe.add_argument('--no-render', action='store_true', help='跳过 wkhtmltopdf 渲染')
+    p_pipe.add_argument('--split-chapters', action='store_true',
+                        help='按章节并行渲染后合并（单独统计 merge 阶段；需要 pypdf）')
+    p_pipe.add_argument('--json', default='benchmark_pipeline.json',
+                        help='结果 JSON 文件 (默认: benchmark_pipeline.json)')
+    p_pipe.add_argument('--baseline', help='与之前保存的结果 JSON 对比')
+
+    p_back = sub.add_parser('backends', help='渲染后端对比')
+    p_back.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+                        help='只测试指定后端（可重复；默认: 全部可用后端）')
+    p_back.add_argument('--class', dest='classes', action='append', choices=sorted(DOCUMENT_CLASSES),
+                        help='只测试指定文档类型（可重复；默认: 全部）')
+    p_back.add_argument('--runs', type=int, default=3, help='每个组合的重复次数 (默认: 3)')
+    p_back.add_argument('--json', default='benchmark_backends.json',
+                        help='结果 JSON 文件 (默认: benchmark_backends.json)')
+
+    p_mem = sub.add_parser('memory', help='文档增大时的峰值内存（默认 vs --low-memory）')
+    p_mem.add_argument('--chapters', type=int, action='append',
+                       help='语料章节数（可重复；默认: 25、100、400）')
+    p_mem.add_argument('--json', default='benchmark_memory.json',
+                       help='结果 JSON 文件 (默认: benchmark_memory.json)')
+
+    p_tab = sub.add_parser('tables', help='超长表格/代码块拆分前后的耗时和内存')
+    p_tab.add_argument('--rows', type=int, default=5000, help='表格行数 (默认: 5000)')
+    p_tab.add_argument('--code-lines', type=int, default=2000, help='代码块行数 (默认: 2000)')
+    p_tab.add_argument('--json', default='benchmark_tables.json',
+                       help='结果 JSON 文件 (默认: benchmark_tables.json)')
+
+    p_der = sub.add_parser('derivatives', help='--image-dpi 缩小前后的 PDF 大小和渲染耗时')
+    p_der.add_argument('--chapters', type=int, default=6, help='## 章节数 (默认: 6)')
+    p_der.add_argument('--images', type=int, default=2, help='每章图片数 (默认: 2)')
+    p_der.add_argument('--width', type=int, default=3840, help='图片宽度 (默认: 3840)')
+    p_der.add_argument('--height', type=int, default=2400, help='图片高度 (默认: 2400)')
+    p_der.add_argument('--dpi', type=int, default=150, help='--image-dpi 的值 (默认: 150)')
+    p_der.add_argument('--json', default='benchmark_derivatives.json',
+                       help='结果 JSON 文件 (默认: benchmark_derivatives.json)')
+
+    p_img = sub.add_parser('images', help='WebP → PNG 批量转换的吞吐（串行 vs 进程池）')
+    p_img.add_argument('--count', type=int, default=100, help='图片数量 (默认: 100)')
+    p_img.add_argument('--width', type=int, default=1024, help='图片宽度 (默认: 1024)')
+    p_img.add_argument('--height', type=int, default=640, help='图片高度 (默认: 640)')
+    p_img.add_argument('-j', '--workers', type=int, help='并发进程数 (默认: CPU 核数)')
+    p_img.add_argument('--json', default='benchmark_images.json',
+                       help='结果 JSON 文件 (默认: benchmark_images.json)')
+
+    p_prof = sub.add_parser('image-profiles', help='图片编码档位的耗时和输出大小')
+    p_prof.add_argument('--count', type=int, default=20, help='图片数量，截图和照片各半 (默认: 20)')
+    p_prof.add_argument('--width', type=int, default=1280, help='图片宽度 (默认: 1280)')
+    p_prof.add_argument('--height', type=int, default=800, help='图片高度 (默认: 800)')
+    p_prof.add_argument('--json', default='benchmark_image_profiles.json',
+                        help='结果 JSON 文件 (默认: benchmark_image_profiles.json)')
+
+    p_start = sub.add_parser('startup', help='启动耗时预算检查')
+    p_start.add_argument('--budget-ms', type=float, default=100,
+                         help='相对空解释器的额外启动耗时上限 (默认: 100 ms)')
+    p_start.add_argument('--runs', type=int, default=10, help='每条命令的重复次数 (默认: 10)')
+    p_start.add_argument('--json', help='结果 JSON 文件（可选）')
+
+    args = parser.parse_args()
+
+    if args.command == 'preprocess':
+        bench_preprocess(args.size_mb)
+    elif args.command == 'pipeline':
+        bench_pipeline(args.chapters, args.sections, args.images, args.runs,
+                       not args.no_render, args.json, args.baseline, args.split_chapters)
+    elif args.command == 'backends':
+        if bench_backends(args.backend, args.classes, args.runs, args.json) is None:
+            return 1
+    elif args.command == 'memory':
+        if bench_memory(args.chapters or (25, 100, 400), args.json) is None:
+            return 1
+    elif args.command == 'tables':
+        bench_tables(args.rows, args.code_lines, args.json)
+    elif args.command == 'derivatives':
+        bench_derivatives(args.chapters, args.images, args.width, args.height, args.dpi, args.json)
+    elif args.command == 'images':
+        if not bench_images(args.count, args.width, args.height, args.workers, args.json)['outputs_identical']:
+            return 1
+    elif args.command == 'image-profiles':
+        bench_image_profiles(args.count, args.width, args.height, args.json)
+    elif args.command == 'startup':
+        if bench_startup(args.budget_ms, args.runs, args.json)['failures']:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+按章节并行渲染 PDF
+
+在 md_extensions 插入的 chapter-break 处拆分文档，每个章节单独渲染，最后用 pypdf 合并为一个 PDF:
+- 子进程后端（wkhtmltopdf）用线程池并发：渲染在各自的 wkhtmltopdf 进程中进行，线程只负责等待
+- 进程内后端（weasyprint）用进程池并发，与 convert_batch 相同：线程受 GIL 限制无法并行，
+  且不假定渲染库可以在多个线程中同时使用
+- 封面保留在第一个分片中
+- 书签（outline）按 h1/h2/h3 层级重建，位置取自各分片渲染时生成的书签
+- 分片内部的 #id 链接由 pypdf 合并时保留；跨章节的 #id 链接在渲染前改写为
+  占位 URI，合并后再改回指向目标页面的 GoTo 链接
+- 指定复用目录时（watch 模式），分片 PDF 按内容命名保存，内容未变化的分片不再渲染
+
+额外依赖: pip3 install pypdf
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import tempfile
+import time
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        Fit,
+        FloatObject,
+        NameObject,
+        NullObject,
+    )
+except ImportError:
+    PdfWriter = None
+
+CHAPTER_BREAK = '<div class="chapter-break"></div>'
+# 跨章节链接的占位前缀（渲染器会把它当作外部链接原样写入 PDF）
+LINK_PREFIX = 'https://md2pdf.invalid/#'
+
+ID_RE = re.compile(r'\bid="([^"]+)"')
+HREF_RE = re.compile(r'href="#([^"]+)"')
+HEADING_RE = re.compile(r'<h([1-3])\b([^>]*)>(.*?)</h\1>', re.DOTALL)
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+
+
+def is_available():
+    """是否安装了合并所需的 pypdf"""
+    return PdfWriter is not None
+
+
+def split_chapters(html_content):
+    """在章节分页处拆分 HTML 片段（分页符本身不再需要：每个分片都从新页开始）"""
+    return [chunk for chunk in html_content.split(CHAPTER_BREAK) if chunk.strip()]
+
+
+def _normalize_title(text):
+    return SPACE_RE.sub(' ', html.unescape(TAG_RE.sub('', text))).strip()
+
+
+def _extract_headings(document):
+    """按文档顺序列出 h1-h3: (级别, id, 标题文本)"""
+    headings = []
+    for match in HEADING_RE.finditer(document):
+        id_match = ID_RE.search(match.group(2))
+        headings.append((
+            int(match.group(1)),
+            id_match.group(1) if id_match else None,
+            _normalize_title(match.group(3)),
+        ))
+    return headings
+
+
+def _rewrite_cross_links(documents):
+    """把指向其他分片的 #id 链接改写为占位 URI，返回 (新文档列表, id -> 分片序号)"""
+    owner = {}
+    for index, document in enumerate(documents):
+        for anchor in ID_RE.findall(document):
+            owner.setdefault(anchor, index)
+
+    rewritten = []
+    for index, document in enumerate(documents):
+        def replace(match, index=index):
+            target = match.group(1)
+            if owner.get(target, index) == index:
+                return match.group(0)
+            return f'href="{LINK_PREFIX}{target}"'
+        rewritten.append(HREF_RE.sub(replace, document))
+    return rewritten, owner
+
+
+def _render_chunk(job):
+    """渲染单个分片，返回耗时（在线程池或进程池中执行）"""
+    document, pdf_path, backend = job
+    start = time.perf_counter()
+    # 先写临时文件，渲染失败时不会留下可被复用的残缺分片
+    partial = pdf_path[:-len('.pdf')] + '.partial.pdf'
+    backend.render(document, partial)
+    os.replace(partial, pdf_path)
+    return time.perf_counter() - start
+
+
+def _chunk_key(document, backend):
+    hasher = hashlib.sha256(document.encode('utf-8'))
+    hasher.update(backend.name.encode('utf-8'))
+    hasher.update(json.dumps(backend.cache_options(), sort_keys=True).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _prune(reuse_dir, keep):
+    """删除复用目录中已不属于当前文档的分片"""
+    for name in os.listdir(reuse_dir):
+        path = os.path.join(reuse_dir, name)
+        if name.startswith('chunk-') and path not in keep:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def _flatten_outline(reader, items, result):
+    for item in items:
+        if isinstance(item, list):
+            _flatten_outline(reader, item, result)
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        top = item.top
+        top = None if top is None or isinstance(top, NullObject) else float(top)
+        result.append((_normalize_title(item.title or ''), page, top))
+    return result
+
+
+def _locate_headings(headings, outline):
+    """按顺序把 HTML 标题与分片书签对应起来，返回 [(级别, id, 标题, 页码, top)]"""
+    located = []
+    cursor = 0
+    for level, anchor, title in headings:
+        page, top = 0, None
+        for j in range(cursor, len(outline)):
+            if outline[j][0] == title:
+                _, page, top = outline[j]
+                cursor = j + 1
+                break
+        located.append((level, anchor, title, page, top))
+    return located
+
+
+def _fit(top):
+    return Fit.xyz(top=top) if top is not None else Fit.fit()
+
+
+def _goto_action(writer, page_index, top):
+    return DictionaryObject({
+        NameObject('/S'): NameObject('/GoTo'),
+        NameObject('/D'): ArrayObject([
+            writer.pages[page_index].indirect_reference,
+            NameObject('/XYZ'),
+            NullObject(),
+            FloatObject(top) if top is not None else NullObject(),
+            NullObject(),
+        ]),
+    })
+
+
+def merge_chunks(pdf_paths, documents, owner, output_file, outline=True):
+    """合并分片 PDF，重建书签并修复跨章节链接
+
+    outline: False 时不生成书签（与整篇渲染的 no-outline 一致），跨章节链接照常修复
+    """
+    writer = PdfWriter()
+    targets = {}
+    chunk_starts = []
+    outline_entries = []
+
+    for index, (pdf_path, document) in enumerate(zip(pdf_paths, documents)):
+        reader = PdfReader(pdf_path)
+        offset = len(writer.pages)
+        chunk_starts.append(offset)
+        writer.append(reader, import_outline=False)
+
+        bookmarks = _flatten_outline(reader, reader.outline, [])
+        for level, anchor, title, page, top in _locate_headings(_extract_headings(document), bookmarks):
+            if outline:
+                outline_entries.append((level, title, offset + page, top))
+            if anchor:
+                targets.setdefault(anchor, (offset + page, top))
+
+    # 重建书签：h1 > h2 > h3 层级嵌套，与整篇渲染时的 outline-depth 3 一致
+    parents = {}
+    for level, title, page, top in outline_entries:
+        parent = None
+        for upper in range(level - 1, 0, -1):
+            if upper in parents:
+                parent = parents[upper]
+                break
+        item = writer.add_outline_item(title, page, parent=parent, fit=_fit(top))
+        parents[level] = item
+        for deeper in [lvl for lvl in parents if lvl > level]:
+            del parents[deeper]
+
+    # 跨章节链接：占位 URI -> GoTo
+    fixed = 0
+    for page in writer.pages:
+        for annot_ref in page.get('/Annots', []) or []:
+            annot = annot_ref.get_object()
+            action = annot.get('/A')
+            if not action:
+                continue
+            action = action.get_object()
+            uri = str(action.get('/URI', ''))
+            if not uri.startswith(LINK_PREFIX):
+                continue
+            anchor = uri[len(LINK_PREFIX):]
+            if anchor in targets:
+                page_index, top = targets[anchor]
+            else:
+                # 不是标题的锚点：跳到所在分片的第一页
+                page_index, top = chunk_starts[owner[anchor]], None
+            annot[NameObject('/A')] = _goto_action(writer, page_index, top)
+            fixed += 1
+
+    with open(output_file, 'wb') as f:
+        writer.write(f)
+    return fixed
+
+
+def _render_all(tasks, jobs, backend):
+    """渲染全部分片，按任务顺序返回各自耗时"""
+    jobs = min(jobs, len(tasks))
+    if jobs <= 1:
+        return list(map(_render_chunk, tasks))
+    if backend.in_process:
+        from concurrent.futures import ProcessPoolExecutor as Executor
+    else:
+        from concurrent.futures import ThreadPoolExecutor as Executor
+    with Executor(max_workers=jobs) as pool:
+        return list(pool.map(_render_chunk, tasks))
+
+
+def render_chapters(documents, output_file, backend, jobs=None, reuse_dir=None):
+    """并行渲染各章节并合并，成功返回 True
+
+    documents: 每个分片的完整 HTML 文档（第一个分片包含封面）
+    backend: backends 中的渲染后端（选项含 no-outline 时合并结果同样不带书签）
+    reuse_dir: 可选，跨调用保留分片 PDF 的目录，内容未变化的分片直接复用
+    """
+    if not is_available():
+        print("⚠️  按章节并行渲染需要 pypdf: pip3 install pypdf")
+        return False
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(documents)))
+    documents, owner = _rewrite_cross_links(documents)
+
+    print(f"📚 按章节并行渲染: {len(documents)} 个分片, {jobs} 个并发"
+          f"{'进程' if backend.in_process else '线程'} ({backend.name})")
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='md2pdf-chapters-') as tmp:
+        if reuse_dir:
+            os.makedirs(reuse_dir, exist_ok=True)
+            pdf_paths = [os.path.join(reuse_dir, f"chunk-{_chunk_key(doc, backend)}.pdf") for doc in documents]
+        else:
+            pdf_paths = [os.path.join(tmp, f"chunk-{i:04d}.pdf") for i in range(len(documents))]
+        tasks = [(doc, path, backend) for doc, path in zip(documents, pdf_paths) if not os.path.exists(path)]
+        render_times = _render_all(tasks, jobs, backend)
+
+        render_elapsed = time.perf_counter() - start
+        fixed = merge_chunks(pdf_paths, documents, owner, output_file,
+                             outline='no-outline' not in backend.options)
+        if reuse_dir:
+            _prune(reuse_dir, set(pdf_paths))
+
+    elapsed = time.perf_counter() - start
+    print(f"   ✓ 渲染 {render_elapsed:.1f}s（串行合计 {sum(render_times):.1f}s），合并 {elapsed - render_elapsed:.1f}s")
+    if len(tasks) < len(documents):
+        print(f"   ✓ 复用未变化的分片 {len(documents) - len(tasks)} 个")
+    if fixed:
+        print(f"   ✓ 修复跨章节链接 {fixed} 个")
+    return True
@@ -12,15 +12,81 @@ Markdown to PDF 转换器 - 苹果设计风格 (v2.0)
   python convert.py input.md
   python convert.py input.md -o output.pdf
   python convert.py input.md --title "标题" --author "作者"
+  python convert.py notes/ -o pdf/ -j 8          # 批量: 目录
+  python convert.py "notes/**/*.md" -o pdf/      # 批量: 通配符
+  python convert.py input.md --watch             # 监视模式: 保存后自动重建
 """
 
 import argparse
-import markdown
-import pdfkit
+import contextlib
+import filecmp
+import functools
+import glob
+import hashlib
+import io
+import json
 import re
 import os
+import shutil
+import tempfile
+import time
 from pathlib import Path
 
+# markdown / Pygments / Pillow / 进程池等较重的依赖在用到它们的阶段内导入，
+# --help、缓存命中等路径不必为此付出启动时间（见 benchmark.py startup）
+from backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, hash_file
+from image_index import ImageIndex
+from pdf_optimize import DEFAULT_PDF_PROFILE, PDF_PROFILES
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# pdfkit 配置
+PDFKIT_OPTIONS = {
+    'page-size': 'A4',
+    'margin-top': '15mm',
+    'margin-right': '15mm',
+    'margin-bottom': '15mm',
+    'margin-left': '15mm',
+    'encoding': 'UTF-8',
+    'enable-local-file-access': '',
+    # 启用 PDF 书签导航（侧边栏目录）
+    'outline': '',
+    'outline-depth': 3,
+}
+
+# 草稿模式（--draft）：不生成 PDF 书签，图片按 96 DPI 缩小并以低质量嵌入
+# 96 DPI 下 A4 正文宽度约 680 像素，与页面上的显示尺寸一致，缩小后版面不变
+DRAFT_IMAGE_DPI = 96
+DRAFT_PDFKIT_OPTIONS = {
+    'no-outline': '',
+    'image-dpi': DRAFT_IMAGE_DPI,
+    'image-quality': 50,
+    'lowquality': '',
+}
+
+# 超过阈值的表格（数据行）和代码块（行）拆成多段，避免 wkhtmltopdf 在 page-break-inside: avoid 上耗时
+DEFAULT_MAX_TABLE_ROWS = 40
+DEFAULT_MAX_CODE_LINES = 60
+
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite', 'toc', 'nl2br', 'tables', 'fenced_code']
+
+# 预编译的正则表达式（模块加载时编译一次）
+H1_RE = re.compile(r'^# (.+)$', re.MULTILINE)
+META_CREATOR_RE = re.compile(r'\*\*创建者\*\*:\s*(.+?)$', re.MULTILINE)
+META_FOR_RE = re.compile(r'\*\*为谁创建\*\*:\s*(.+?)$', re.MULTILINE)
+META_BASED_RE = re.compile(r'\*\*基于\*\*:\s*(.+?)$', re.MULTILINE)
+META_DATE_RE = re.compile(r'\*\*最后更新\*\*:\s*(.+?)$', re.MULTILINE)
+LINK_RE = re.compile(r'\[(.+?)\]\((.+?)\)')
+TOC_H2_NUMBERED_RE = re.compile(r'^## (\d+)\.\s+(.+)$')
+TOC_H2_PLAIN_RE = re.compile(r'^## (.+)$')
+TOC_H3_NUMBERED_RE = re.compile(r'^### (\d+\.\d+)\s+(.+)$')
+TOC_H3_PLAIN_RE = re.compile(r'^### (.+)$')
+EMOJI_RE = re.compile(r'[\U0001F300-\U0001F9FF]')
+IMG_TAG_RE = re.compile(r'<img[^>]+>')
+IMG_SRC_RE = re.compile(r'src="([^"]+)"')
+MD_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(([^)]+?)(?:\s+"([^"]+)")?\)')
+
 def extract_metadata(md_content):
     """提取文档元数据"""
     metadata = {
@@ -34,29 +100,29 @@ def extract_metadata(md_content):
     }
 
     # 提取第一个 h1 作为标题
-    h1_match = re.search(r'^# (.+)$', md_content, re.MULTILINE)
+    h1_match = H1_RE.search(md_content)
     if h1_match:
         metadata['title'] = h1_match.group(1).strip()
 
     # 提取 **字段**: 值 格式的元数据
-    creator_match = re.search(r'\*\*创建者\*\*:\s*(.+?)$', md_content, re.MULTILINE)
+    creator_match = META_CREATOR_RE.search(md_content)
     if creator_match:
         metadata['author'] = creator_match.group(1).strip()
 
-    for_match = re.search(r'\*\*为谁创建\*\*:\s*(.+?)$', md_content, re.MULTILINE)
+    for_match = META_FOR_RE.search(md_content)
     if for_match:
-        link_match = re.search(r'\[(.+?)\]\((.+?)\)', for_match.group(1))
+        link_match = LINK_RE.search(for_match.group(1))
         if link_match:
             metadata['created_for'] = link_match.group(1)
             metadata['created_for_url'] = link_match.group(2)
         else:
             metadata['created_for'] = for_match.group(1).strip()
 
-    based_match = re.search(r'\*\*基于\*\*:\s*(.+?)$', md_content, re.MULTILINE)
+    based_match = META_BASED_RE.search(md_content)
     if based_match:
         metadata['based_on'] = based_match.group(1).strip()
 
-    date_match = re.search(r'\*\*最后更新\*\*:\s*(.+?)$', md_content, re.MULTILINE)
+    date_match = META_DATE_RE.search(md_content)
     if date_match:
         metadata['date'] = date_match.group(1).strip()
 
@@ -71,14 +137,14 @@ def extract_toc_structure(md_content):
 
     for line in lines:
         # 主章节: ## 标题 或 ## 1. 标题
-        match_h2_numbered = re.match(r'^## (\d+)\.\s+(.+)$', line)
-        match_h2_plain = re.match(r'^## (.+)$', line)
+        match_h2_numbered = TOC_H2_NUMBERED_RE.match(line)
+        match_h2_plain = TOC_H2_PLAIN_RE.match(line)
 
         if match_h2_numbered:
             # 有序号的标题
             num = match_h2_numbered.group(1)
             title = match_h2_numbered.group(2).strip()
-            title = re.sub(r'[\U0001F300-\U0001F9FF]', '', title).strip()
+            title = EMOJI_RE.sub('', title).strip()
             h2_counter = int(num)
             h3_counter[h2_counter] = 0
             toc.append({
@@ -92,7 +158,7 @@ def extract_toc_structure(md_content):
             h2_counter += 1
             h3_counter[h2_counter] = 0
             title = match_h2_plain.group(1).strip()
-            title = re.sub(r'[\U0001F300-\U0001F9FF]', '', title).strip()
+            title = EMOJI_RE.sub('', title).strip()
             toc.append({
                 'level': 2,
                 'number': None,  # 无序号
@@ -101,14 +167,14 @@ def extract_toc_structure(md_content):
             })
 
         # 子章节: ### 标题 或 ### 1.1 标题
-        match_h3_numbered = re.match(r'^### (\d+\.\d+)\s+(.+)$', line)
-        match_h3_plain = re.match(r'^### (.+)$', line)
+        match_h3_numbered = TOC_H3_NUMBERED_RE.match(line)
+        match_h3_plain = TOC_H3_PLAIN_RE.match(line)
 
         if match_h3_numbered:
             # 有序号的子标题
             num = match_h3_numbered.group(1)
             title = match_h3_numbered.group(2).strip()
-            title = re.sub(r'[\U0001F300-\U0001F9FF]', '', title).strip()
+            title = EMOJI_RE.sub('', title).strip()
             if len(title) > 50:
                 title = title[:47] + '...'
             toc.append({
@@ -121,7 +187,7 @@ def extract_toc_structure(md_content):
             # 无序号的子标题
             h3_counter[h2_counter] = h3_counter.get(h2_counter, 0) + 1
             title = match_h3_plain.group(1).strip()
-            title = re.sub(r'[\U0001F300-\U0001F9FF]', '', title).strip()
+            title = EMOJI_RE.sub('', title).strip()
             if len(title) > 50:
                 title = title[:47] + '...'
             toc.append({
@@ -213,42 +279,102 @@ def create_cover_and_toc(metadata, toc_html):
         # 没有元信息，不显示封面
         return ""
 
-def fix_image_paths(md_content, md_file_path):
-    """修复 Markdown 中的图片路径为绝对路径"""
+def create_draft_cover(metadata):
+    """草稿模式的占位封面：与正式封面一样占满一页（没有元信息时同样不显示），只保留标题"""
+    keys = ('subtitle', 'based_on', 'created_for', 'author', 'date')
+    if not any(metadata.get(key) for key in keys):
+        return ""
+    return f"""
+        <!-- 封面（草稿） -->
+        <div class="apple-cover draft-cover" style="background: none;">
+            <div class="cover-main">
+                <h1 class="cover-title">{metadata.get('title', '文档标题')}</h1>
+                <p class="cover-subtitle">草稿预览</p>
+            </div>
+        </div>
+        """
+
+def resolve_image_path(md_dir, rel_path, index=None):
+    """解析图片路径，返回 (绝对路径, 是否使用了 .png 回退)；文件不存在时路径为 None
+
+    传入同一个 ImageIndex 可在多次调用间共享目录列表和解析结果。
+    """
+    return (index or ImageIndex()).resolve(md_dir, rel_path)
+
+def is_remote_image(path):
+    """已经是绝对 URL 的图片（含未能提取的 data URI）无需处理"""
+    return path.startswith(('http://', 'https://', 'file://', 'data:'))
+
+def find_image_refs(md_content):
+    """列出文档中引用的本地图片路径（HTML img 标签和 Markdown 图片语法）"""
+    refs = []
+    for match in IMG_TAG_RE.finditer(md_content):
+        src_match = IMG_SRC_RE.search(match.group(0))
+        if src_match:
+            refs.append(src_match.group(1))
+    for match in MD_IMAGE_RE.finditer(md_content):
+        refs.append(match.group(2))
+    return [ref for ref in refs if not is_remote_image(ref)]
+
+def make_image_resolver(md_file_path, index=None, transform=None):
+    """创建图片路径解析函数: 相对路径 -> file:// 绝对路径（不存在或无需处理时返回 None）
+
+    transform: 可选，接收解析后的绝对路径，返回实际用于渲染的路径（如缩小后的衍生件）
+    """
     md_dir = Path(md_file_path).parent.absolute()
+    index = index or ImageIndex()
+    reported = set()
+    transformed = {}
+
+    def target(abs_path):
+        if not transform:
+            return f"file://{abs_path}"
+        if abs_path not in transformed:
+            transformed[abs_path] = transform(abs_path)
+        return f"file://{transformed[abs_path]}"
+
+    def resolve(rel_path):
+        # 跳过已经是绝对路径的图片
+        if is_remote_image(rel_path):
+            return None
+
+        abs_path, used_fallback = index.resolve(md_dir, rel_path)
+        # 同一图片多次引用只输出一次日志
+        if rel_path in reported:
+            return target(abs_path) if abs_path else None
+        reported.add(rel_path)
+
+        if abs_path and used_fallback:
+            print(f"  ✓ 找到图片: {abs_path.name}")
+        if abs_path:
+            print(f"  ✓ 转换路径: {abs_path.name}")
+            # 使用 file:// 协议
+            return target(abs_path)
+
+        print(f"  ⚠️  图片不存在: {rel_path}")
+        return None
+
+    return resolve
+
+def fix_image_paths(md_content, md_file_path):
+    """修复 Markdown 中的图片路径为绝对路径（文本替换版本，转换流程中已由 md_extensions 完成）"""
+    resolve = make_image_resolver(md_file_path)
 
     def replace_image(match):
         img_tag = match.group(0)
-        src_match = re.search(r'src="([^"]+)"', img_tag)
+        src_match = IMG_SRC_RE.search(img_tag)
         if not src_match:
             return img_tag
 
         rel_path = src_match.group(1)
-
-        # 跳过已经是绝对路径的图片
-        if rel_path.startswith(('http://', 'https://', 'file://')):
-            return img_tag
-
-        abs_path = (md_dir / rel_path).resolve()
-
-        # 如果原文件不存在,尝试添加 .png 扩展名
-        if not abs_path.exists():
-            png_path = Path(str(abs_path) + '.png')
-            if png_path.exists():
-                abs_path = png_path
-                print(f"  ✓ 找到图片: {abs_path.name}")
-
-        if abs_path.exists():
-            # 使用 file:// 协议
-            img_tag = img_tag.replace(f'src="{rel_path}"', f'src="file://{abs_path}"')
-            print(f"  ✓ 转换路径: {abs_path.name}")
-        else:
-            print(f"  ⚠️  图片不存在: {rel_path}")
+        new_src = resolve(rel_path)
+        if new_src:
+            img_tag = img_tag.replace(f'src="{rel_path}"', f'src="{new_src}"')
 
         return img_tag
 
     # 处理 HTML img 标签
-    md_content = re.sub(r'<img[^>]+>', replace_image, md_content)
+    md_content = IMG_TAG_RE.sub(replace_image, md_content)
 
     # 处理 Markdown 图片语法
     def replace_md_image(match):
@@ -256,111 +382,37 @@ def fix_image_paths(md_content, md_file_path):
         path = match.group(2)
         title = match.group(3) if match.lastindex >= 3 else ""
 
-        # 跳过已经是绝对路径的图片
-        if not path.startswith(('http://', 'https://', 'file://')):
-            abs_path = (md_dir / path).resolve()
-
-            # 如果原文件不存在,尝试添加 .png 扩展名
-            if not abs_path.exists():
-                png_path = Path(str(abs_path) + '.png')
-                if png_path.exists():
-                    abs_path = png_path
-                    print(f"  ✓ 找到图片: {abs_path.name}")
-
-            if abs_path.exists():
-                path = f"file://{abs_path}"
-                print(f"  ✓ 转换路径: {abs_path.name}")
-            else:
-                print(f"  ⚠️  图片不存在: {path}")
+        path = resolve(path) or path
 
         if title:
             return f'![{alt}]({path} "{title}")'
         return f'![{alt}]({path})'
 
-    md_content = re.sub(r'!\[([^\]]*)\]\(([^)]+?)(?:\s+"([^"]+)")?\)', replace_md_image, md_content)
+    md_content = MD_IMAGE_RE.sub(replace_md_image, md_content)
 
     return md_content
 
-def process_markdown(md_content):
-    """处理 Markdown 内容"""
+def create_markdown(md_file_path=None):
+    """创建 Markdown 实例
 
-    # 不移除第一个 h1，让它作为文档标题显示
-    # md_content = re.sub(r'^# .+?\n', '', md_content, count=1, flags=re.MULTILINE)
+    元数据/emoji 清理、标题 id 与编号、章节分页、图片路径解析都由
+    md_extensions.NotesExtension 在同一次解析中完成。
+    """
+    import markdown
+    from md_extensions import NotesExtension
 
-    # 移除开头的元数据行
-    metadata_patterns = [
-        r'^\*\*创建者\*\*:.+?$',
-        r'^\*\*为谁创建\*\*:.+?$',
-        r'^\*\*基于\*\*:.+?$',
-        r'^\*\*最后更新\*\*:.+?$',
-        r'^\*\*适用场景\*\*:.+?$',
-    ]
-    for pattern in metadata_patterns:
-        md_content = re.sub(pattern, '', md_content, flags=re.MULTILINE)
-
-    # 移除 emoji
-    md_content = re.sub(r'[\U0001F300-\U0001F9FF]', '', md_content)
-
-    # 处理 h2 主章节 - 添加 ID 和分页（支持有序号和无序号）
-    # 使用计数器，第一个 h2 不添加分页符
-    h2_counter = {'count': 0}
-
-    def add_h2_id(match):
-        h2_counter['count'] += 1
-        full_match = match.group(0)
-
-        # 第一个 h2 不添加分页符（避免 h1 后单独占页）
-        page_break = '' if h2_counter['count'] == 1 else '\n<div class="chapter-break"></div>\n\n'
-
-        # 检查是否有序号
-        numbered_match = re.match(r'\n## (\d+)\.\s+(.+?)\n', full_match)
-        if numbered_match:
-            # 有序号: ## 1. 标题
-            num = numbered_match.group(1)
-            title = numbered_match.group(2).strip()
-            id_str = f"{num}-{title}".replace(' ', '-').replace(':', '').lower()
-            return f'{page_break}<h2 id="{id_str}" data-number="{num}">{title}</h2>\n'
-        else:
-            # 无序号: ## 标题
-            plain_match = re.match(r'\n## (.+?)\n', full_match)
-            if plain_match:
-                title = plain_match.group(1).strip()
-                id_str = title.replace(' ', '-').replace(':', '').lower()
-                return f'{page_break}<h2 id="{id_str}">{title}</h2>\n'
-        return full_match
-
-    md_content = re.sub(r'\n## .+?\n', add_h2_id, md_content)
-
-    # 处理 h3 子章节 - 添加 ID（支持有序号和无序号）
-    def add_h3_id(match):
-        full_match = match.group(0)
-        # 检查是否有序号
-        numbered_match = re.match(r'\n### (\d+\.\d+)\s+(.+?)\n', full_match)
-        if numbered_match:
-            # 有序号: ### 1.1 标题
-            num = numbered_match.group(1)
-            title = numbered_match.group(2).strip()
-            id_str = f"{num}-{title}".replace(' ', '-').replace(':', '').replace('.', '-').lower()
-            return f'\n<h3 id="{id_str}" data-number="{num}">{title}</h3>\n'
-        else:
-            # 无序号: ### 标题
-            plain_match = re.match(r'\n### (.+?)\n', full_match)
-            if plain_match:
-                title = plain_match.group(1).strip()
-                id_str = title.replace(' ', '-').replace(':', '').lower()
-                return f'\n<h3 id="{id_str}">{title}</h3>\n'
-        return full_match
-
-    md_content = re.sub(r'\n### .+?\n', add_h3_id, md_content)
-
-    # 转换 Markdown
-    html = markdown.markdown(
-        md_content,
-        extensions=['extra', 'codehilite', 'toc', 'nl2br', 'tables', 'fenced_code']
+    notes = NotesExtension(
+        image_resolver=make_image_resolver(md_file_path) if md_file_path else None
     )
+    md = markdown.Markdown(extensions=[notes] + MARKDOWN_EXTENSIONS)
+    return md, notes
 
-    return html
+def process_markdown(md_content, md_file_path=None):
+    """处理 Markdown 内容"""
+    md, _ = create_markdown(md_file_path)
+    return md.convert(md_content)
 
+@functools.lru_cache(maxsize=None)
 def get_apple_css():
     """获取苹果设计风格 CSS"""
     return """
@@ -691,128 +743,819 @@ def get_apple_css():
     }
     """
 
-def convert_markdown_to_pdf(input_file, output_file=None, title=None, author=None, subtitle=None):
-    """主转换函数"""
-
-    print(f"📖 读取文件: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        md_content = f.read()
-
-    # 提取元数据
-    print("📑 提取元数据...")
-    metadata = extract_metadata(md_content)
-
-    # 命令行参数覆盖
-    if title:
-        metadata['title'] = title
-    if author:
-        metadata['author'] = author
-    if subtitle:
-        metadata['subtitle'] = subtitle
-
-    # 提取目录
-    print("📂 提取目录结构...")
-    toc_structure = extract_toc_structure(md_content)
-    print(f"   ✓ 找到 {len([t for t in toc_structure if t['level'] == 2])} 个主章节")
-    print(f"   ✓ 找到 {len([t for t in toc_structure if t['level'] == 3])} 个子章节")
-
-    # 生成目录 HTML
-    toc_html = generate_toc_html(toc_structure)
+@functools.lru_cache(maxsize=None)
+def _code_fingerprint():
+    """转换脚本自身的指纹，脚本更新后旧缓存自动失效"""
+    hasher = hashlib.sha256()
+    for script in sorted(SCRIPT_DIR.glob('*.py')):
+        hasher.update(script.name.encode('utf-8'))
+        hash_file(script, hasher)
+    return hasher.hexdigest()
+
+def compute_cache_key(md_content, input_file, overrides, options, css=None, index=None):
+    """计算 PDF 缓存键：源文件、引用的图片、CSS、命令行覆盖项和渲染后端配置"""
+    hasher = hashlib.sha256()
+
+    def feed(label, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        hasher.update(label.encode('utf-8'))
+        hasher.update(len(data).to_bytes(8, 'big'))
+        hasher.update(data)
+
+    feed('code', _code_fingerprint())
+    feed('markdown', md_content)
+    feed('css', css if css is not None else get_apple_css())
+    feed('overrides', json.dumps(overrides, sort_keys=True, ensure_ascii=False))
+    feed('options', json.dumps(options, sort_keys=True, ensure_ascii=False))
+
+    md_dir = Path(input_file).parent.absolute()
+    for rel_path in sorted(set(find_image_refs(md_content))):
+        abs_path, _ = resolve_image_path(md_dir, rel_path, index)
+        if abs_path:
+            feed('image', f"{rel_path}\0{abs_path}\0{hash_file(abs_path).hexdigest()}")
+        else:
+            feed('missing-image', rel_path)
 
-    # 处理图片路径
-    print("🖼️  处理图片...")
-    md_content = fix_image_paths(md_content, input_file)
+    return hasher.hexdigest()
 
-    # 处理 Markdown
-    print("🎨 处理 Markdown 内容...")
-    html_content = process_markdown(md_content)
+def restore_from_cache(cached_pdf, output_file):
+    """从缓存恢复 PDF；输出文件已是相同内容时不做任何写入"""
+    if os.path.exists(output_file) and filecmp.cmp(cached_pdf, output_file, shallow=False):
+        print(f"\n✅ 未变化，跳过渲染: {output_file}")
+        return output_file
 
-    # 生成完整 HTML
-    print("📄 生成 HTML...")
-    full_html = f"""
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(cached_pdf, output_file)
+    print(f"\n✅ 命中缓存: {output_file}")
+    return output_file
+
+def _html_frame(metadata, toc_html, css=None, include_cover=True, draft=False):
+    """完整 HTML 文档在正文之前和之后的部分"""
+    cover = ''
+    if include_cover:
+        cover = create_draft_cover(metadata) if draft else create_cover_and_toc(metadata, toc_html)
+    head = f"""
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
         <meta charset="UTF-8">
         <title>{metadata.get('title', '文档')}</title>
         <style>
-            {get_apple_css()}
+            {css if css is not None else get_apple_css()}
         </style>
     </head>
     <body>
-        {create_cover_and_toc(metadata, toc_html)}
+        {cover}
         <div class="content">
-            {html_content}
+            """
+    tail = """
         </div>
     </body>
     </html>
     """
+    return head, tail
 
-    # 生成 PDF
-    print("📝 生成 PDF...")
-    if not output_file:
-        output_file = str(Path(input_file).with_suffix('.pdf'))
+def assemble_html(metadata, toc_html, html_content, css=None, include_cover=True, draft=False):
+    """组装完整 HTML 文档"""
+    head, tail = _html_frame(metadata, toc_html, css, include_cover, draft)
+    return head + html_content + tail
 
-    # 保存 HTML 用于调试
-    html_file = output_file.replace('.pdf', '.html')
-    with open(html_file, 'w', encoding='utf-8') as f:
-        f.write(full_html)
-    print(f"💾 已保存 HTML: {html_file}")
+def write_html(f, metadata, toc_html, content, css=None, include_cover=True, draft=False):
+    """把完整 HTML 文档依次写入 f，不在内存中拼接整篇文档
 
-    # pdfkit 配置
-    options = {
-        'page-size': 'A4',
-        'margin-top': '15mm',
-        'margin-right': '15mm',
-        'margin-bottom': '15mm',
-        'margin-left': '15mm',
-        'encoding': 'UTF-8',
-        'enable-local-file-access': '',
-        # 启用 PDF 书签导航（侧边栏目录）
-        'outline': '',
-        'outline-depth': 3,
+    content 为正文字符串，或可读的文本文件对象（按块复制）。
+    写出的内容与 assemble_html 相同。
+    """
+    head, tail = _html_frame(metadata, toc_html, css, include_cover, draft)
+    f.write(head)
+    if isinstance(content, str):
+        f.write(content)
+    else:
+        shutil.copyfileobj(content, f)
+    f.write(tail)
+
+class Converter:
+    """可复用的转换引擎
+
+    Markdown 实例（含全部扩展）、CSS 和渲染后端只构建一次，
+    文档之间调用 Markdown.reset()。批量转换和嵌入式调用方应复用同一个实例；
+    Markdown 实例不是线程安全的，每个线程/进程各用一个。
+    Markdown 实例在第一次转换时才构建，PDF 缓存命中时不会加载 markdown / Pygments。
+    """
+
+    def __init__(self, use_cache=True, force=False, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                 split_chapters=False, chapter_jobs=None, image_dpi=None, profile=False, profiler=None,
+                 backend=None, optimize=None, low_memory=False,
+                 max_table_rows=DEFAULT_MAX_TABLE_ROWS, max_code_lines=DEFAULT_MAX_CODE_LINES, draft=False):
+        self._md = None
+        # 草稿模式：占位封面、不做语法高亮、不生成书签、低分辨率图片；分页与正式输出一致
+        self.draft = draft
+        # 超长表格/代码块的拆分阈值（0 表示不拆分）
+        self.max_table_rows = max_table_rows
+        self.max_code_lines = max_code_lines
+        self.split_blocks = None
+        self.notes = None
+        # 代码高亮缓存与 PDF 缓存一起启用/禁用（随 Markdown 实例一起构建）
+        self.use_highlight_cache = use_cache
+        self.highlight = None
+        self.css = get_apple_css()
+        self.options = dict(PDFKIT_OPTIONS)
+        if draft:
+            del self.options['outline']
+            del self.options['outline-depth']
+            self.options.update(DRAFT_PDFKIT_OPTIONS)
+            # 固定为 96 DPI：更高浪费时间，更低时图片在页面上被放大，版面可能与正式输出不同
+            image_dpi = DRAFT_IMAGE_DPI
+        self.backend = get_backend(backend, self.options)
+        if self.backend.name != DEFAULT_BACKEND and not self.backend.is_available():
+            print(f"⚠️  渲染后端 {self.backend.name} 不可用，本次使用 {DEFAULT_BACKEND}")
+            for line in self.backend.install_hint[1:]:
+                print(line)
+            self.backend = get_backend(DEFAULT_BACKEND, self.options)
+        self.force = force
+        self.split_chapters = split_chapters
+        self.chapter_jobs = chapter_jobs
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.image_dpi = image_dpi
+        if image_dpi:
+            from image_derivatives import DerivativeStage
+            if not DerivativeStage.is_available():
+                print("⚠️  图片缩小需要 Pillow: pip3 install Pillow，本次使用原图")
+                self.image_dpi = None
+        # 低内存模式：按章节转换 Markdown 并把 HTML 依次写入临时文件，整篇 HTML 不驻留内存
+        self.low_memory = low_memory
+        # PDF 后处理优化档位（pdf_optimize.PDF_PROFILES 中的名称），None 表示不优化
+        self.optimize = optimize
+        if optimize:
+            import pdf_optimize
+            if not pdf_optimize.is_available():
+                print("⚠️  PDF 优化需要 pypdf: pip3 install pypdf，本次不优化")
+                self.optimize = None
+        self.cache = DiskCache('pdf', max_bytes=cache_max_bytes, root=cache_dir) if use_cache else None
+        # 增量模式（watch）：设为 dict 后按章节缓存 HTML，未修改的章节不再转换
+        self.chapter_cache = None
+        # 增量模式下按章节渲染时保留分片 PDF 的目录
+        self.chapter_pdf_dir = None
+        # 最近一次转换引用到的图片文件，以及未找到的图片引用会查找的路径
+        self.last_images = []
+        self.last_missing_images = []
+        # 最近一次转换的代码高亮缓存 (命中, 未命中)
+        self.last_highlight = (0, 0)
+        # 性能剖析：profile=True 时每次转换在 PDF 旁写出报告；
+        # 传入 profiler（如 workflow.py 的）时只向其中记录阶段，由调用方写出
+        self.profile = profile
+        self.profiler = profiler
+
+    @property
+    def md(self):
+        """Markdown 实例（含 NotesExtension 和代码高亮缓存）"""
+        if self._md is None:
+            import markdown
+            from md_extensions import NotesExtension, SplitBlocksExtension
+
+            self.notes = NotesExtension()
+            extensions = [self.notes]
+            if self.max_table_rows or self.max_code_lines:
+                self.split_blocks = SplitBlocksExtension(
+                    max_table_rows=self.max_table_rows, max_code_lines=self.max_code_lines
+                )
+                extensions.append(self.split_blocks)
+            if self.use_highlight_cache and not self.draft:
+                from highlight_cache import HighlightCache, HighlightCacheExtension
+                self.highlight = HighlightCache(self.cache_dir, self.cache_max_bytes)
+                extensions.append(HighlightCacheExtension(self.highlight))
+            # 草稿模式不调用 Pygments：代码块输出为 <pre><code>，行数和换行与高亮后相同
+            configs = {'codehilite': {'use_pygments': False}} if self.draft else {}
+            self._md = markdown.Markdown(extensions=extensions + MARKDOWN_EXTENSIONS, extension_configs=configs)
+        return self._md
+
+    def _split_counts(self):
+        """累计拆分的 (表格数, 代码块数)（Markdown 实例尚未构建时为 0）"""
+        if self.split_blocks is None:
+            return (0, 0)
+        return (self.split_blocks.processor.tables_split, self.split_blocks.processor.code_blocks_split)
+
+    def _stage(self, name, **args):
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.stage(name, **args)
+
+    def render_html(self, md_content, input_file, index=None, derivatives=None):
+        """Markdown -> HTML 片段，返回 (html, 目录结构)"""
+        index = index or ImageIndex()
+        resolver = make_image_resolver(input_file, index, derivatives.derive if derivatives else None)
+        chunks = None
+        if self.chapter_cache is not None:
+            from md_extensions import split_markdown_chapters
+            chunks = split_markdown_chapters(md_content)
+        if chunks:
+            return self._render_html_incremental(chunks, input_file, index, resolver)
+
+        self.md.reset()
+        self.notes.image_resolver = resolver
+        html_content = self.md.convert(md_content)
+        return html_content, list(self.notes.toc)
+
+    def render_html_to(self, md_content, input_file, out, index=None, derivatives=None):
+        """Markdown -> HTML 片段，按 ## 章节逐个转换并写入 out，返回目录结构
+
+        任意时刻只有一个章节的 HTML 在内存中；输出与 render_html 相同，
+        只是块元素之间的空行可能不同（不影响渲染）。文档包含跨章节生效的定义时整篇转换。
+        """
+        from md_extensions import has_cross_references, iter_markdown_chapters
+
+        if has_cross_references(md_content):
+            html_content, toc = self.render_html(md_content, input_file, index, derivatives)
+            out.write(html_content)
+            return toc
+
+        index = index or ImageIndex()
+        resolver = make_image_resolver(input_file, index, derivatives.derive if derivatives else None)
+        toc = []
+        h2_count = 0
+        written = False
+        for chunk in iter_markdown_chapters(md_content):
+            self.md.reset()
+            self.notes.image_resolver = resolver
+            # 分页符和无序号 h3 的目录规则取决于之前是否出现过 h2
+            self.notes.h2_count = h2_count
+            html = self.md.convert(chunk)
+            if html:
+                if written:
+                    out.write('\n')
+                out.write(html)
+                written = True
+            toc.extend(self.notes.toc)
+            h2_count = self.notes.h2_count
+        return toc
+
+    def _chapter_key(self, chunk, first, md_dir, index):
+        """章节缓存键：章节源文本、是否位于首个 h2 之前，以及引用图片的 mtime/大小"""
+        hasher = hashlib.sha256(chunk.encode('utf-8'))
+        hasher.update(b'\0first' if first else b'\0rest')
+        for rel_path in sorted(set(find_image_refs(chunk))):
+            abs_path, _ = index.resolve(md_dir, rel_path)
+            try:
+                st = os.stat(abs_path) if abs_path else None
+            except OSError:
+                st = None
+            signature = f"{abs_path}\0{st.st_mtime_ns}\0{st.st_size}" if st else '-'
+            hasher.update(f"\0{rel_path}\0{signature}".encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _render_html_incremental(self, chunks, input_file, index, resolver):
+        """按 ## 章节分别转换，源文本和图片都未变化的章节直接复用上次的 HTML"""
+        md_dir = Path(input_file).parent.absolute()
+        cache = {}
+        parts = []
+        toc = []
+        h2_before = 0
+        reused = 0
+        for chunk in chunks:
+            key = self._chapter_key(chunk, h2_before == 0, md_dir, index)
+            entry = self.chapter_cache.get(key)
+            if entry is None:
+                self.md.reset()
+                self.notes.image_resolver = resolver
+                # 分页符和无序号 h3 的目录规则取决于之前是否出现过 h2
+                self.notes.h2_count = h2_before
+                html_content = self.md.convert(chunk)
+                entry = (html_content, list(self.notes.toc), self.notes.h2_count - h2_before)
+            else:
+                reused += 1
+            cache[key] = entry
+            parts.append(entry[0])
+            toc.extend(entry[1])
+            h2_before += entry[2]
+
+        self.chapter_cache.clear()
+        self.chapter_cache.update(cache)
+        print(f"♻️  章节 HTML: 复用 {reused}/{len(chunks)} 个")
+        return '\n'.join(parts), toc
+
+    def convert(self, input_file, output_file=None, title=None, author=None, subtitle=None):
+        """转换单个文件，成功返回 PDF 路径，失败返回 None"""
+        if not output_file:
+            output_file = str(Path(input_file).with_suffix('.draft.pdf' if self.draft else '.pdf'))
+
+        own_profiler = self.profile and self.profiler is None
+        if own_profiler:
+            from profiling import Profiler
+            self.profiler = Profiler(Path(input_file).name)
+        try:
+            with self._stage('convert', file=str(input_file)):
+                result = self._convert(input_file, output_file, title, author, subtitle)
+        finally:
+            profiler = self.profiler
+            if own_profiler:
+                self.profiler = None
+
+        if own_profiler:
+            profiler.report()
+            report_file, trace_file = profiler.write(Path(output_file).with_suffix(''))
+            print(f"💾 性能报告: {report_file}")
+            print(f"💾 Trace: {trace_file}")
+        return result
+
+    def _convert(self, input_file, output_file, title, author, subtitle):
+        self.last_highlight = (0, 0)
+        print(f"📖 读取文件: {input_file}")
+        with self._stage('read'):
+            with open(input_file, 'r', encoding='utf-8') as f:
+                md_content = f.read()
+
+        # 内嵌的 data URI 图片先提取为缓存文件，后续阶段（含缓存键计算）只处理短文本
+        if 'data:image/' in md_content:
+            from data_uri import DataUriStage
+            data_uris = DataUriStage(self.cache_dir, self.cache_max_bytes)
+            with self._stage('extract_data_uris'):
+                md_content = data_uris.extract(md_content)
+            data_uris.report()
+            if data_uris.stats['decoded']:
+                data_uris.cache.evict()
+
+        # 本次转换内共享的图片目录索引（缓存键计算和路径解析共用）
+        index = ImageIndex()
+
+        # 内容寻址缓存：所有输入都未变化时直接复用上次的 PDF
+        cache_key = None
+        if self.cache:
+            overrides = {'title': title, 'author': author, 'subtitle': subtitle}
+            if self.split_chapters:
+                overrides['split_chapters'] = True
+            if self.image_dpi:
+                overrides['image_dpi'] = self.image_dpi
+            if self.backend.name != DEFAULT_BACKEND:
+                overrides['backend'] = self.backend.name
+            if self.optimize:
+                overrides['optimize'] = self.optimize
+            if (self.max_table_rows, self.max_code_lines) != (DEFAULT_MAX_TABLE_ROWS, DEFAULT_MAX_CODE_LINES):
+                overrides['split_blocks'] = [self.max_table_rows, self.max_code_lines]
+            if self.draft:
+                overrides['draft'] = True
+            with self._stage('cache_lookup'):
+                cache_key = compute_cache_key(
+                    md_content, input_file, overrides, self.backend.cache_options(), self.css, index
+                )
+                cached_pdf = None if self.force else self.cache.get(cache_key, '.pdf')
+            if cached_pdf:
+                self.last_images = index.paths()
+                self.last_missing_images = index.missing()
+                if self.profiler:
+                    self.profiler.set('cache_hit', True)
+                return restore_from_cache(cached_pdf, output_file)
+
+        # 提取元数据
+        print("📑 提取元数据...")
+        with self._stage('extract_metadata'):
+            metadata = extract_metadata(md_content)
+
+        # 命令行参数覆盖
+        if title:
+            metadata['title'] = title
+        if author:
+            metadata['author'] = author
+        if subtitle:
+            metadata['subtitle'] = subtitle
+
+        # 处理 Markdown（图片路径和目录结构在同一次解析中完成）
+        print("🎨 处理 Markdown 内容...")
+        derivatives = None
+        if self.image_dpi:
+            from image_derivatives import DerivativeStage
+            derivatives = DerivativeStage(self.image_dpi, self.cache_dir, self.cache_max_bytes)
+        highlight_before = (self.highlight.hits, self.highlight.misses) if self.highlight else (0, 0)
+        split_before = self._split_counts()
+        # 低内存模式下正文 HTML 按章节写入临时文件（按章节渲染和 watch 增量模式需要整篇正文，不使用）
+        body_file = None
+        with self._stage('markdown'):
+            if self.low_memory and not self.split_chapters and self.chapter_cache is None:
+                body_file = tempfile.TemporaryFile('w+', encoding='utf-8')
+                toc_structure = self.render_html_to(md_content, input_file, body_file, index, derivatives)
+                html_content = None
+            else:
+                html_content, toc_structure = self.render_html(md_content, input_file, index, derivatives)
+        self.last_images = index.paths()
+        self.last_missing_images = index.missing()
+        if self.highlight:
+            self.last_highlight = (
+                self.highlight.hits - highlight_before[0],
+                self.highlight.misses - highlight_before[1],
+            )
+            if sum(self.last_highlight):
+                print(f"🖍️  代码高亮缓存: 命中 {self.last_highlight[0]}, 未命中 {self.last_highlight[1]}")
+            self.highlight.evict()
+        split_after = self._split_counts()
+        tables_split = split_after[0] - split_before[0]
+        code_blocks_split = split_after[1] - split_before[1]
+        if tables_split or code_blocks_split:
+            print(f"✂️  拆分超长表格 {tables_split} 个（每段 {self.max_table_rows} 行）、"
+                  f"代码块 {code_blocks_split} 个（每段 {self.max_code_lines} 行）")
+        if derivatives:
+            derivatives.report()
+            derivatives.cache.evict()
+            if self.profiler:
+                self.profiler.set('image_derivative_seconds', round(derivatives.stats['seconds'], 6))
+        print(f"🖼️  图片引用 {index.lookups} 次, 不同图片 {index.unique} 个, 文件系统调用 {index.fs_calls} 次")
+        print("📂 目录结构:")
+        print(f"   ✓ 找到 {len([t for t in toc_structure if t['level'] == 2])} 个主章节")
+        print(f"   ✓ 找到 {len([t for t in toc_structure if t['level'] == 3])} 个子章节")
+
+        # 生成目录 HTML
+        print("📄 生成 HTML...")
+        with self._stage('assemble_html'):
+            toc_html = generate_toc_html(toc_structure)
+
+        # 生成 PDF
+        print("📝 生成 PDF...")
+
+        # HTML 依次写入文件（同时保留用于调试），渲染器直接读取该文件，不再整篇拼接后经管道传入
+        html_file = output_file.replace('.pdf', '.html')
+        if html_file == output_file:
+            html_file += '.html'
+        with self._stage('write_html'):
+            with open(html_file, 'w', encoding='utf-8') as f:
+                if body_file:
+                    body_file.seek(0)
+                    write_html(f, metadata, toc_html, body_file, self.css, draft=self.draft)
+                    body_file.close()
+                else:
+                    write_html(f, metadata, toc_html, html_content, self.css, draft=self.draft)
+        print(f"💾 已保存 HTML: {html_file}")
+
+        try:
+            render_start = time.perf_counter()
+            with self._stage(self.backend.name, split_chapters=bool(self.split_chapters)):
+                if not (self.split_chapters and self._render_chapters(metadata, toc_html, html_content, output_file)):
+                    self.backend.render_file(html_file, output_file)
+            render_seconds = time.perf_counter() - render_start
+            print(f"\n✅ PDF 生成成功: {output_file}")
+            pdf_bytes = os.path.getsize(output_file)
+            print(f"📊 文件大小: {pdf_bytes / (1024 * 1024):.1f} MB, 渲染耗时 {render_seconds:.1f}s")
+            if self.optimize:
+                from pdf_optimize import optimize_pdf
+                try:
+                    with self._stage('optimize', profile=self.optimize):
+                        stats = optimize_pdf(output_file, profile=self.optimize)
+                except Exception as e:
+                    # 优化失败不影响已生成的 PDF
+                    print(f"⚠️  PDF 优化失败，保留未优化的文件: {e}")
+                else:
+                    if stats:
+                        pdf_bytes = stats['bytes_after']
+                    if stats and self.profiler:
+                        self.profiler.set('pdf_bytes_before_optimize', stats['bytes_before'])
+                        self.profiler.set('optimize_seconds', round(stats['seconds'], 6))
+            self._report_memory()
+            if self.profiler:
+                self.profiler.set('pdf_bytes', pdf_bytes)
+            if self.cache:
+                with self._stage('cache_store'):
+                    self.cache.put_file(cache_key, output_file, '.pdf')
+                    self.cache.evict()
+            return output_file
+        except Exception as e:
+            print(f"\n❌ 转换失败: {e}")
+            print()
+            for line in self.backend.install_hint:
+                print(line)
+            return None
+
+    def _report_memory(self):
+        """输出峰值 RSS（进程生命周期内的最高值，批量和常驻模式下不是单个文档的值）"""
+        from profiling import max_rss_bytes
+
+        rss = max_rss_bytes()
+        if rss is None:
+            return
+        children = max_rss_bytes(children=True)
+        print(f"📈 峰值内存: 进程 {rss / 1024 / 1024:.0f} MB, 渲染子进程 {children / 1024 / 1024:.0f} MB")
+        if self.profiler:
+            self.profiler.set('peak_rss_bytes', rss)
+            self.profiler.set('children_peak_rss_bytes', children)
+
+    def _render_chapters(self, metadata, toc_html, html_content, output_file):
+        """按章节拆分并行渲染后合并；章节不足或缺少 pypdf 时返回 False，由调用方整篇渲染"""
+        import chapter_render
+
+        chunks = chapter_render.split_chapters(html_content)
+        if len(chunks) < 2:
+            return False
+
+        documents = [
+            assemble_html(metadata, toc_html, chunk, self.css, include_cover=(i == 0), draft=self.draft)
+            for i, chunk in enumerate(chunks)
+        ]
+        return chapter_render.render_chapters(
+            documents, output_file, self.backend, self.chapter_jobs, self.chapter_pdf_dir
+        )
+
+def convert_markdown_to_pdf(input_file, output_file=None, title=None, author=None, subtitle=None,
+                            **settings):
+    """主转换函数（单次调用；需要转换多个文档时请复用 Converter）
+
+    settings 为 Converter 的构造参数（缓存、按章节渲染等）。
+    """
+    converter = Converter(**settings)
+    return converter.convert(input_file, output_file, title, author, subtitle)
+
+def converter_defaults():
+    """Converter 构造参数的默认值（--server 只转发与默认值不同的设置）"""
+    import inspect
+    return {
+        name: param.default
+        for name, param in inspect.signature(Converter).parameters.items()
+        if param.default is not inspect.Parameter.empty
     }
 
-    try:
-        pdfkit.from_string(full_html, output_file, options=options)
-        print(f"\n✅ PDF 生成成功: {output_file}")
-        size_mb = os.path.getsize(output_file) / (1024 * 1024)
-        print(f"📊 文件大小: {size_mb:.1f} MB")
-        return output_file
-    except Exception as e:
-        print(f"\n❌ 转换失败: {e}")
-        print("\n提示: 请确保已安装 wkhtmltopdf")
-        print("  macOS: brew install wkhtmltopdf")
-        print("  Linux: sudo apt-get install wkhtmltopdf")
+def is_batch_input(inputs):
+    """判断是否为批量模式（多个输入、目录或通配符）"""
+    if len(inputs) > 1:
+        return True
+    item = inputs[0]
+    return Path(item).is_dir() or glob.has_magic(item)
+
+def collect_inputs(inputs):
+    """将目录和通配符展开为 Markdown 文件列表（去重，保持顺序）"""
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(str(p) for p in path.rglob('*.md'))
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            matches = [item]
+        files.extend(m for m in matches if m.endswith('.md') or m == item)
+
+    seen = set()
+    unique = []
+    for f in files:
+        key = os.path.abspath(f)
+        if key not in seen:
+            seen.add(key)
+            unique.append(f)
+    return unique
+
+def _batch_output_path(input_file, base_dir, output_dir):
+    """批量模式下的输出路径：在输出目录中保留相对目录结构"""
+    if not output_dir:
         return None
+    rel = Path(os.path.relpath(os.path.abspath(input_file), base_dir))
+    return str((Path(output_dir) / rel).with_suffix('.pdf'))
+
+# 每个工作进程复用一个 Converter，按设置区分
+_worker_converters = {}
+
+def _get_worker_converter(settings):
+    key = tuple(sorted(settings.items()))
+    if key not in _worker_converters:
+        _worker_converters[key] = Converter(**settings)
+    return _worker_converters[key]
+
+def _batch_worker(job):
+    """进程池任务：转换单个文件，捕获日志输出"""
+    input_file, output_file, overrides, settings = job
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            if output_file:
+                Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+            converter = _get_worker_converter(settings)
+            result = converter.convert(input_file, output_file, **overrides)
+            highlight = converter.last_highlight
+        except Exception as e:
+            print(f"❌ 转换失败: {e}")
+            result = None
+            highlight = (0, 0)
+    return {
+        'input': input_file,
+        'output': result,
+        'ok': result is not None,
+        'seconds': time.perf_counter() - start,
+        'highlight_hits': highlight[0],
+        'highlight_misses': highlight[1],
+        'log': log.getvalue(),
+    }
+
+def convert_batch(inputs, output_dir=None, jobs=None, verbose=False,
+                  title=None, author=None, subtitle=None, **settings):
+    """批量转换：通过有界进程池并发渲染，按输入顺序输出结果
+
+    settings 用于构建每个进程的 Converter（缓存设置等）。
+    """
+    files = collect_inputs(inputs)
+    if not files:
+        print("❌ 没有找到 Markdown 文件")
+        return []
+
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    tasks = [
+        (f, _batch_output_path(f, base_dir, output_dir),
+         {'title': title, 'author': author, 'subtitle': subtitle}, settings)
+        for f in files
+    ]
+
+    print(f"📚 批量转换: {len(files)} 个文件, {jobs} 个并发进程")
+    start = time.perf_counter()
+
+    results = []
+    if jobs == 1:
+        iterator = map(_batch_worker, tasks)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        iterator = pool.map(_batch_worker, tasks)
+
+    try:
+        # map 按提交顺序返回结果，保证输出顺序稳定
+        for index, result in enumerate(iterator, 1):
+            results.append(result)
+            status = '✅' if result['ok'] else '❌'
+            target = result['output'] or '失败'
+            print(f"  [{index}/{len(tasks)}] {status} {result['input']} → {target} ({result['seconds']:.1f}s)")
+            if verbose or not result['ok']:
+                for line in result['log'].rstrip().splitlines():
+                    print(f"      {line}")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for r in results if r['ok'])
+    failed = len(results) - succeeded
+    throughput = succeeded / elapsed * 60 if elapsed > 0 else 0.0
+
+    print("\n" + "="*60)
+    print("批量转换完成")
+    print("="*60)
+    print(f"成功: {succeeded} 个")
+    print(f"失败: {failed} 个")
+    print(f"耗时: {elapsed:.1f}s")
+    print(f"吞吐: {throughput:.1f} docs/min")
+    highlight_hits = sum(r['highlight_hits'] for r in results)
+    highlight_misses = sum(r['highlight_misses'] for r in results)
+    if highlight_hits or highlight_misses:
+        print(f"代码高亮缓存: 命中 {highlight_hits}, 未命中 {highlight_misses}")
+
+    return results
+
+def convert_via_server(server_url, input_file, output_file=None, title=None, author=None, subtitle=None,
+                       settings=None):
+    """把转换请求交给常驻服务（server.py），返回服务端结果字典
+
+    settings 为覆盖服务端设置的 Converter 参数（见 server.REQUEST_SETTINGS）。
+    路径转换为绝对路径后发送；无法连接服务时抛出 OSError。
+    """
+    import urllib.error
+    import urllib.request
+
+    job = {
+        'input': os.path.abspath(input_file),
+        'output': os.path.abspath(output_file) if output_file else None,
+        'title': title,
+        'author': author,
+        'subtitle': subtitle,
+        'settings': settings or {},
+    }
+    request = urllib.request.Request(
+        server_url.rstrip('/') + '/convert',
+        data=json.dumps(job).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 4xx/5xx 的响应体仍是 JSON（转换失败时带有日志）
+        with e:
+            result = json.loads(e.read() or b'{}')
+        result.setdefault('ok', False)
+        return result
 
 def main():
     parser = argparse.ArgumentParser(
         description='将 Markdown 转换为苹果设计风格的 PDF 白皮书 (v2.0)'
     )
-    parser.add_argument('input', help='输入的 Markdown 文件')
-    parser.add_argument('-o', '--output', help='输出的 PDF 文件 (默认: 与输入文件同名)')
+    parser.add_argument('input', nargs='+', help='输入的 Markdown 文件（批量模式下可为多个文件、目录或通配符）')
+    parser.add_argument('-o', '--output', help='输出的 PDF 文件 (默认: 与输入文件同名)；批量模式下为输出目录')
     parser.add_argument('--title', help='自定义文档标题')
     parser.add_argument('--subtitle', help='自定义副标题')
     parser.add_argument('--author', help='自定义作者')
+    parser.add_argument('-j', '--jobs', type=int, help='批量模式并发进程数 (默认: CPU 核数)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='批量模式下输出每个文件的详细日志')
+    parser.add_argument('--force', action='store_true', help='忽略缓存，强制重新渲染（结果仍写入缓存）')
+    parser.add_argument('--no-cache', action='store_true', help='完全禁用 PDF 缓存')
+    parser.add_argument('--cache-dir', help='缓存目录 (默认: $MD2PDF_CACHE_DIR 或 ~/.cache/markdown-to-pdf)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='PDF 缓存容量上限，单位 MB (默认: %(default)s)')
+    parser.add_argument('--split-chapters', action='store_true',
+                        help='按 ## 章节拆分，并行渲染后合并（需要 pypdf）')
+    parser.add_argument('--chapter-jobs', type=int, help='按章节渲染时的并发数 (默认: CPU 核数)')
+    parser.add_argument('--image-dpi', type=int,
+                        help='渲染前把超过该 DPI 下 A4 正文尺寸的图片缩小（如 150；需要 Pillow）')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help=f'PDF 渲染后端 (默认: {DEFAULT_BACKEND}；weasyprint 为进程内渲染)')
+    parser.add_argument('--max-table-rows', type=int, default=DEFAULT_MAX_TABLE_ROWS,
+                        help='超过该行数的表格拆成多段并重复表头，0 表示不拆分 (默认: %(default)s)')
+    parser.add_argument('--max-code-lines', type=int, default=DEFAULT_MAX_CODE_LINES,
+                        help='超过该行数的代码块拆成多段，0 表示不拆分 (默认: %(default)s)')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='按章节转换 Markdown 并把 HTML 依次写入文件，大文档的峰值内存基本不随文档增大')
+    parser.add_argument('--optimize', nargs='?', const=DEFAULT_PDF_PROFILE, choices=sorted(PDF_PROFILES),
+                        help='渲染后用 pypdf 压缩 PDF：内容流、重复对象、图片质量（默认档位 %(const)s）')
+    parser.add_argument('--draft', action='store_true',
+                        help='快速草稿预览：占位封面、无语法高亮和书签、低分辨率图片，分页与正式输出一致'
+                             '（默认输出 <文件名>.draft.pdf）')
+    parser.add_argument('--profile', action='store_true',
+                        help='记录各阶段耗时、内存峰值和 wkhtmltopdf 耗时，在 PDF 旁写出 .profile.json 和 .trace.json')
+    parser.add_argument('--watch', action='store_true',
+                        help='监视 Markdown 文件及其图片，保存后自动增量重建（仅单文件）')
+    parser.add_argument('--server', metavar='URL',
+                        help='交给常驻转换服务处理（如 http://127.0.0.1:8765，见 server.py；仅单文件）')
 
     args = parser.parse_args()
 
-    try:
-        convert_markdown_to_pdf(
+    options = {
+        'title': args.title,
+        'author': args.author,
+        'subtitle': args.subtitle,
+        'use_cache': not args.no_cache,
+        'force': args.force,
+        'cache_dir': args.cache_dir,
+        'cache_max_bytes': args.cache_size * 1024 * 1024,
+        'split_chapters': args.split_chapters,
+        'chapter_jobs': args.chapter_jobs,
+        'image_dpi': args.image_dpi,
+        'profile': args.profile,
+        'backend': args.backend,
+        'optimize': args.optimize,
+        'low_memory': args.low_memory,
+        'max_table_rows': args.max_table_rows,
+        'max_code_lines': args.max_code_lines,
+        'draft': args.draft,
+    }
+
+    if args.watch:
+        if is_batch_input(args.input):
+            print("❌ --watch 只支持单个 Markdown 文件")
+            return 1
+        from watch import watch
+        return watch(args.input[0], args.output, **options)
+
+    if args.server:
+        if is_batch_input(args.input):
+            print("❌ --server 只支持单个 Markdown 文件")
+            return 1
+        # 缓存目录和容量由服务端决定
+        if args.cache_dir or args.cache_size != DEFAULT_MAX_BYTES // (1024 * 1024):
+            parser.error('--server 不支持 --cache-dir / --cache-size（缓存由服务端配置）')
+        # 只转发与默认值不同的设置，其余沿用服务端启动参数
+        defaults = converter_defaults()
+        settings = {
+            key: value for key, value in options.items()
+            if key in defaults and key not in ('cache_dir', 'cache_max_bytes') and value != defaults[key]
+        }
+        try:
+            result = convert_via_server(args.server, args.input[0], args.output,
+                                        args.title, args.author, args.subtitle, settings)
+        except OSError as e:
+            # 服务未启动时退回本地转换
+            print(f"⚠️  无法连接转换服务 {args.server} ({e})，改为本地转换")
+        else:
+            if result.get('log'):
+                print(result['log'].rstrip())
+            if not result['ok']:
+                if result.get('error'):
+                    print(f"❌ 转换失败: {result['error']}")
+                return 1
+            print(f"🛰️  服务端耗时: {result['seconds']:.2f}s")
+            return 0
+
+    if is_batch_input(args.input):
+        results = convert_batch(
             args.input,
             args.output,
-            args.title,
-            args.author,
-            args.subtitle
+            args.jobs,
+            args.verbose,
+            **options
         )
+        return 0 if results and all(r['ok'] for r in results) else 1
+
+    try:
+        output = convert_markdown_to_pdf(args.input[0], args.output, **options)
     except Exception as e:
         print(f"❌ 转换失败: {e}")
         import traceback
         traceback.print_exc()
         return 1
 
-    return 0
+    return 0 if output is not None else 1
 
 if __name__ == '__main__':
     exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+合成测试语料生成器
+
+生成结构与真实笔记一致的 Markdown 文档及其图片目录，用于性能基准:
+- 元数据行（创建者/最后更新/适用场景）和 emoji
+- 带序号的 ## 章节、### 小节，以及无序号的 ### 小节
+- 图片: 普通 PNG（Markdown 语法）和无扩展名的 WebP（<img> 标签）
+- 表格、围栏代码块
+
+图片使用纯 Python 写出的 PNG（zlib）；安装了 Pillow 时 WebP 按指定尺寸生成，
+否则使用内置的 1x1 WebP。
+
+使用方法:
+  python corpus.py out/ --chapters 50 --sections 4 --images 2
+"""
+
+import argparse
+import base64
+import io
+import os
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 1x1 无损 WebP（未安装 Pillow 时使用）
+TINY_WEBP = base64.b64decode('UklGRhoAAABXRUJQVlA4TA0AAAAvAAAAEAcQERGIiP4HAA==')
+
+LANGUAGES = ('python', 'java', 'bash')
+
+CODE_TEMPLATES = {
+    'python': "def chapter_{n}_{s}(items):\n    return [x * {n} for x in items if x % {s}]\n",
+    'java': "public int chapter{n}x{s}(int x) {{\n    return x * {n} + {s};\n}}\n",
+    'bash': "for i in $(seq 1 {n}); do\n  echo \"section {s}: $i\"\ndone\n",
+}
+
+
+def make_png(width, height, seed=0):
+    """生成渐变 PNG（不依赖 Pillow）"""
+    # 按通道切片赋值整行像素（逐像素拼接在大图上很慢）
+    cycle = bytes(range(256)) * (width // 256 + 2)
+    red = cycle[seed % 256:seed % 256 + width]
+    rows = []
+    for y in range(height):
+        pixels = bytearray(width * 3)
+        pixels[0::3] = red
+        pixels[1::3] = bytes([(y + seed) % 256]) * width
+        offset = (y + seed * 7) % 256
+        pixels[2::3] = cycle[offset:offset + width]
+        rows.append(b'\x00' + bytes(pixels))  # 过滤类型: None
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def make_webp(width, height, seed=0):
+    """生成 WebP（未安装 Pillow 时返回 1x1 图片）"""
+    if Image is None:
+        return TINY_WEBP
+    img = Image.new('RGB', (width, height), ((seed * 37) % 256, (seed * 91) % 256, 180))
+    buffer = io.BytesIO()
+    img.save(buffer, 'WEBP', quality=80)
+    return buffer.getvalue()
+
+
+def make_chapter(n, sections, images, tables, code_blocks):
+    """生成一个 ## 章节，返回 (Markdown 文本, 图片列表 [(文件名, 格式)])"""
+    lines = [f"## {n}. 第 {n} 章 性能基准 🚀", "", "**适用场景**: 基准测试", ""]
+    refs = []
+
+    for s in range(1, sections + 1):
+        lines += [
+            f"### {n}.{s} 小节 {s}",
+            "",
+            f"这是第 {n} 章第 {s} 节的正文，包含 **粗体**、`行内代码` 和 [链接](https://example.com)。",
+            "性能基准需要足够多的普通段落文本，模拟真实笔记中的叙述内容 🎉。",
+            "",
+        ]
+        if s <= code_blocks:
+            lang = LANGUAGES[(n + s) % len(LANGUAGES)]
+            lines += [f"```{lang}", CODE_TEMPLATES[lang].format(n=n, s=s).rstrip('\n'), "```", ""]
+
+    for i in range(1, images + 1):
+        if i % 2:
+            name = f"figure-{n}-{i}.png"
+            lines += [f"![示意图 {n}-{i}](image/{name})", ""]
+            refs.append((name, 'png'))
+        else:
+            # 无扩展名的 WebP（常见于从网页保存的截图）
+            name = f"shot-{n}-{i}"
+            lines += [f'<img src="image/{name}" width="300">', ""]
+            refs.append((name, 'webp'))
+
+    for t in range(1, tables + 1):
+        lines += ["| 指标 | 数值 | 说明 |", "|------|------|------|"]
+        lines += [f"| 行 {r} | {n * r + t} | 第 {n} 章表 {t} |" for r in range(1, 6)]
+        lines.append("")
+
+    lines += ["### 补充说明 ✨", "", "- 列表项 A", "- 列表项 B", ""]
+    return '\n'.join(lines), refs
+
+
+def generate_document(chapters=20, sections=3, images=2, tables=1, code_blocks=1):
+    """生成完整文档，返回 (Markdown 文本, 图片列表)"""
+    parts = [
+        "# 合成基准文档",
+        "",
+        "**创建者**: corpus.py",
+        "**最后更新**: 2025-01-01",
+        "",
+    ]
+    refs = []
+    for n in range(1, chapters + 1):
+        text, chapter_refs = make_chapter(n, sections, images, tables, code_blocks)
+        parts.append(text)
+        refs += chapter_refs
+    return '\n'.join(parts), refs
+
+
+def generate_large_blocks(table_rows=5000, code_lines=2000):
+    """生成包含一个超长表格和一个超长代码块的文档（拆分基准用）"""
+    lines = ["# 超长表格与代码块", "", "## 1. 数据表", "", "| 序号 | 名称 | 数值 | 说明 |", "|------|------|------|------|"]
+    lines += [f"| {r} | 项目 {r} | {r * 37 % 1000} | 第 {r} 行数据 |" for r in range(1, table_rows + 1)]
+    lines += ["", "## 2. 代码清单", "", "```python"]
+    lines += [f"value_{i} = compute({i}, factor={i % 7})  # 第 {i} 行" for i in range(1, code_lines + 1)]
+    lines += ["```", ""]
+    return '\n'.join(lines)
+
+
+def write_corpus(out_dir, name='corpus.md', image_size=(800, 600), **params):
+    """写出文档和图片目录，返回 Markdown 文件路径"""
+    out_dir = Path(out_dir)
+    image_dir = out_dir / 'image'
+    image_dir.mkdir(parents=True, exist_ok=True)
+
+    md_content, refs = generate_document(**params)
+    md_file = out_dir / name
+    md_file.write_text(md_content, encoding='utf-8')
+
+    width, height = image_size
+    for seed, (filename, kind) in enumerate(refs):
+        path = image_dir / filename
+        if path.exists():
+            continue
+        data = make_png(width, height, seed) if kind == 'png' else make_webp(width, height, seed)
+        path.write_bytes(data)
+
+    return md_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成 markdown-to-pdf 基准语料')
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--name', default='corpus.md', help='Markdown 文件名 (默认: corpus.md)')
+    parser.add_argument('--chapters', type=int, default=20, help='## 章节数 (默认: 20)')
+    parser.add_argument('--sections', type=int, default=3, help='每章 ### 小节数 (默认: 3)')
+    parser.add_argument('--images', type=int, default=2, help='每章图片数，PNG 与无扩展名 WebP 交替 (默认: 2)')
+    parser.add_argument('--tables', type=int, default=1, help='每章表格数 (默认: 1)')
+    parser.add_argument('--code-blocks', type=int, default=1, help='每章代码块数 (默认: 1)')
+    parser.add_argument('--image-size', default='800x600', help='图片尺寸 (默认: 800x600)')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    md_file = write_corpus(
+        args.output, args.name, (width, height),
+        chapters=args.chapters, sections=args.sections, images=args.images,
+        tables=args.tables, code_blocks=args.code_blocks,
+    )
+    size_kb = os.path.getsize(md_file) / 1024
+    print(f"✅ 已生成: {md_file} ({size_kb:.0f} KB)")
+    if Image is None:
+        print("💡 未安装 Pillow，WebP 图片为 1x1")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+内嵌 data URI 图片提取
+
+Typora、Notion 导出的笔记常把图片以 data:image/...;base64 的形式写在正文里，单张可达数 MB。
+后续每个文本处理阶段都要扫过这些字符串，wkhtmltopdf 也要再解码一次。
+转换前把它们解码为缓存目录中按内容命名的文件（命名空间 datauri），正文中替换为文件路径:
+- 文件名取 base64 文本的哈希，相同的内嵌图片只解码、写入一次（跨文档、跨运行复用）
+- 替换后的路径与普通本地图片一样参与路径解析、--image-dpi 缩小和 PDF 缓存键
+- 只处理图片地址（![](...) 和 <img src=...>），围栏代码块和行内代码中的 data URI 保持原样；
+  base64 内容可以跨行或含空白，媒体类型可以带参数（如 ;charset=utf-8）
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+import time
+from pathlib import Path
+
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache
+
+# 图片地址中的 data URI: 前缀为 ![...]( 或 <img ... src=
+DATA_URI_RE = re.compile(
+    r'(!\[[^\]]*\]\(\s*<?|(?i:<img\b[^>]*?\ssrc\s*=\s*["\']?))'
+    r'data:image/([A-Za-z0-9.+-]+)(?:;[A-Za-z0-9.+-]+=[^;,\s]*)*;base64,'
+    r'([A-Za-z0-9+/=]+(?:\s+[A-Za-z0-9+/=]+)*)'
+)
+# 与 md_extensions.iter_markdown_chapters 相同的围栏规则（这里不导入 markdown）
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+# 行内代码（反引号数量相同的一对，不跨段落）
+CODE_SPAN_RE = re.compile(r'(`+)(?!`)(?:(?!\n[ \t]*\n).)*?(?<!`)\1(?!`)', re.DOTALL)
+WHITESPACE_RE = re.compile(r'\s+')
+
+EXTENSIONS = {
+    'png': '.png',
+    'jpeg': '.jpg',
+    'jpg': '.jpg',
+    'gif': '.gif',
+    'webp': '.webp',
+    'svg+xml': '.svg',
+    'bmp': '.bmp',
+}
+
+
+class DataUriStage:
+    """转换前的内嵌图片提取阶段"""
+
+    def __init__(self, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+        self.cache = DiskCache('datauri', max_bytes=cache_max_bytes, root=cache_dir)
+        self.stats = {
+            'images': 0,
+            'unique': 0,
+            'decoded': 0,
+            'bytes': 0,
+            'seconds': 0.0,
+        }
+        # 本次转换中已提取的 base64 哈希 -> 引用路径
+        self._done = {}
+
+    def _reference(self, path):
+        # 含空格的路径在 Markdown 图片语法中会被截断，改用 file:// URL
+        return Path(path).as_uri() if ' ' in str(path) else str(path)
+
+    def _extract(self, match):
+        prefix = match.group(1)
+        subtype = match.group(2).lower()
+        payload = WHITESPACE_RE.sub('', match.group(3))
+        suffix = EXTENSIONS.get(subtype)
+        if suffix is None:
+            return match.group(0)
+
+        self.stats['images'] += 1
+        key = hashlib.sha256(f"{subtype}\0{payload}".encode('ascii')).hexdigest()
+        if key in self._done:
+            return prefix + self._done[key]
+
+        path = self.cache.get(key, suffix)
+        if path is None:
+            try:
+                data = base64.b64decode(payload, validate=True)
+            except (binascii.Error, ValueError):
+                self.stats['images'] -= 1
+                return match.group(0)
+            path = self.cache.put_bytes(key, data, suffix)
+            self.stats['decoded'] += 1
+            self.stats['bytes'] += len(data)
+
+        self.stats['unique'] += 1
+        self._done[key] = self._reference(path)
+        return prefix + self._done[key]
+
+    def _extract_text(self, text):
+        """替换一段非围栏文本中的 data URI 图片（跳过行内代码）"""
+        if 'data:image/' not in text:
+            return text
+        parts = []
+        position = 0
+        for span in CODE_SPAN_RE.finditer(text):
+            parts.append(DATA_URI_RE.sub(self._extract, text[position:span.start()]))
+            parts.append(span.group(0))
+            position = span.end()
+        parts.append(DATA_URI_RE.sub(self._extract, text[position:]))
+        return ''.join(parts)
+
+    def extract(self, md_content):
+        """把正文中的 data URI 图片替换为缓存文件路径，返回新的正文"""
+        if 'data:image/' not in md_content:
+            return md_content
+
+        start = time.perf_counter()
+        result = []
+        text = []
+        fence = None
+        for line in md_content.splitlines(keepends=True):
+            match = FENCE_RE.match(line)
+            if fence:
+                result.append(line)
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                    fence = None
+            elif match:
+                fence = match.group(1)
+                result.append(self._extract_text(''.join(text)))
+                text = []
+                result.append(line)
+            else:
+                text.append(line)
+        result.append(self._extract_text(''.join(text)))
+        self.stats['seconds'] += time.perf_counter() - start
+        return ''.join(result)
+
+    def report(self):
+        stats = self.stats
+        if not stats['images']:
+            return
+        print(f"🧩 内嵌图片: 提取 {stats['images']} 处, 不同图片 {stats['unique']} 个, "
+              f"新解码 {stats['decoded']} 个 ({stats['bytes'] / 1024 / 1024:.1f} MB), 耗时 {stats['seconds']:.2f}s")
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+按内容去重笔记库中的图片
+
+同一张截图常以不同文件名散落在多个 image/ 目录中，转换时每个副本都会单独嵌入 PDF。
+这里按内容哈希找出重复图片（先按文件大小分组，只对大小相同的文件计算 sha256；
+已是硬链接的文件按 inode 只算一次），每组选出一个规范文件，然后:
+- rewrite（默认）: 通过 update_markdown_refs 把引用副本的 Markdown 改为引用规范文件，
+  再删除副本。PDF 中同一路径的图片只嵌入一次，因此也能减小 PDF
+- hardlink: 用指向规范文件的硬链接替换副本，不修改 Markdown；只节省磁盘空间
+
+规范文件优先选被引用次数最多的（需要改写的引用最少），其次是带扩展名、路径最短的。
+默认只生成计划和报告，加 --apply 才会修改文件。
+rewrite 改写后重新扫描全部 Markdown，只删除已不再被引用的副本；仍被引用的（单引号 src、
+引用式链接定义、普通链接等无法改写的写法，或无法按 UTF-8 读取的文件中出现了副本文件名）
+保留并在报告中记为 failed。
+注意：扫描范围之外的 Markdown 若引用了副本，rewrite 删除副本后会失效。
+
+使用方法:
+  python dedup_images.py notes/                 # 只报告
+  python dedup_images.py notes/ --apply         # 改写引用并删除副本
+  python dedup_images.py notes/ --mode hardlink --apply
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import urllib.parse
+from collections import defaultdict
+from pathlib import Path
+
+from analyze_images import detect_format
+from update_markdown_refs import split_ref, update_markdown_refs
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.svg', '.tif', '.tiff'}
+MARKDOWN_EXTENSIONS = {'.md', '.markdown'}
+
+# 与 update_markdown_refs 的引用格式一致（前缀为空），这些引用可以被改写
+REF_PATTERNS = [
+    re.compile(r'src="([^"]+)"'),
+    re.compile(r'!\[[^\]]*\]\(([^)]+)\)'),
+]
+
+# 删除副本前额外检查的写法（update_markdown_refs 不改写）：单引号 src、引用式链接定义、普通链接
+OTHER_REF_PATTERNS = [
+    re.compile(r"src='([^']+)'"),
+    re.compile(r'^[ ]{0,3}\[[^\]]+\]:[ \t]*(<[^>]*>|\S+)', re.MULTILINE),
+    re.compile(r'(?<!!)\[[^\]]*\]\(([^)]+)\)'),
+]
+
+URL_SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*:', re.IGNORECASE)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _walk(roots):
+    """遍历所有根目录下的文件（跳过隐藏文件和目录），按路径排序"""
+    files = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if not name.startswith('.'):
+                    files.add(os.path.abspath(os.path.join(dirpath, name)))
+    return sorted(files)
+
+
+def _is_image(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in IMAGE_EXTENSIONS:
+        return True
+    # 无扩展名的图片（如下载的 WebP）按 Magic Bytes 判断
+    if suffix:
+        return False
+    actual_format = detect_format(path)
+    return actual_format != 'unknown' and not actual_format.startswith('error')
+
+
+def file_digest(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def find_duplicates(image_files, skipped=None):
+    """返回 [(sha256, 大小, [路径...])]，只包含有重复的组
+
+    先按大小分组，只对大小相同的文件计算哈希；同一 inode 的硬链接只哈希一次。
+    无法读取的文件（如失效的符号链接）跳过，记入 skipped 列表。
+    """
+    by_size = defaultdict(list)
+    for path in image_files:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if skipped is not None:
+                skipped.append({'file': path, 'error': str(e)})
+            continue
+        by_size[st.st_size].append((path, (st.st_dev, st.st_ino)))
+
+    groups = []
+    for size, entries in by_size.items():
+        if len(entries) < 2 or size == 0:
+            continue
+        digests = {}
+        by_digest = defaultdict(list)
+        for path, inode in entries:
+            if inode not in digests:
+                try:
+                    digests[inode] = file_digest(path)
+                except OSError as e:
+                    if skipped is not None:
+                        skipped.append({'file': path, 'error': str(e)})
+                    digests[inode] = None
+            if digests[inode] is not None:
+                by_digest[digests[inode]].append(path)
+        for digest, paths in by_digest.items():
+            if len(paths) > 1:
+                groups.append((digest, size, sorted(paths)))
+    return sorted(groups, key=lambda g: g[2][0])
+
+
+def scan_references(markdown_files, patterns=REF_PATTERNS, unreadable=None):
+    """返回 {图片绝对路径: [(Markdown 文件, 引用原文)]}
+
+    无法按 UTF-8 读取的 Markdown 文件跳过，记入 unreadable 列表。
+    """
+    references = defaultdict(list)
+    for md_file in markdown_files:
+        try:
+            content = Path(md_file).read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            if unreadable is not None:
+                unreadable.append(md_file)
+            continue
+        md_dir = os.path.dirname(md_file)
+        for pattern in patterns:
+            for match in pattern.finditer(content):
+                raw = match.group(1)
+                path, _ = split_ref(raw)
+                if not path or URL_SCHEME_RE.match(path):
+                    continue  # http:、data: 等
+                target = os.path.normpath(os.path.join(md_dir, urllib.parse.unquote(path)))
+                references[target].append((md_file, raw))
+    return references
+
+
+def _mentioned_in(path, md_file):
+    """无法解析的 Markdown 文件中是否出现了图片文件名（按字节查找，宁可保留副本）"""
+    name = os.path.basename(path)
+    needles = {name.encode('utf-8'), urllib.parse.quote(name).encode('utf-8')}
+    try:
+        data = Path(md_file).read_bytes()
+    except OSError:
+        return True
+    return any(needle in data for needle in needles)
+
+
+def choose_canonical(paths, references):
+    """被引用最多 > 带扩展名 > 路径最短 > 字典序"""
+    return min(paths, key=lambda p: (
+        -len(references.get(p, ())),
+        not Path(p).suffix,
+        len(p),
+        p,
+    ))
+
+
+def estimate_pdf_savings(references, content_key, sizes):
+    """估算每个 Markdown 生成的 PDF 减少的图片字节数
+
+    同一文档中不同路径的图片分别嵌入；改写后同内容的路径合并为一个。
+    """
+    per_doc = defaultdict(set)
+    for target, refs in references.items():
+        if target in sizes:
+            for md_file, _ in refs:
+                per_doc[md_file].add(target)
+
+    savings = {}
+    for md_file, targets in per_doc.items():
+        before = sum(sizes[t] for t in targets)
+        contents = {content_key.get(t, t): sizes[t] for t in targets}
+        saved = before - sum(contents.values())
+        if saved:
+            savings[md_file] = saved
+    return savings
+
+
+def _rewrite_references(plan, references, markdown_files):
+    """按 Markdown 文件汇总映射，交给 update_markdown_refs 改写
+
+    改写后重新扫描全部 Markdown（包括无法改写的写法），返回 (更新的引用数, 已不再被引用的副本集合)。
+    """
+    mappings = defaultdict(dict)
+    for group in plan:
+        canonical = group['canonical']
+        for duplicate in group['duplicates']:
+            for md_file, raw in references.get(duplicate, ()):
+                path, rest = split_ref(raw)
+                new_path = os.path.relpath(canonical, os.path.dirname(md_file)).replace(os.sep, '/')
+                if '%' in path or ' ' in new_path:
+                    new_path = urllib.parse.quote(new_path)
+                mappings[md_file][raw] = new_path + rest
+
+    updated = 0
+    for md_file, mapping in sorted(mappings.items()):
+        stats = update_markdown_refs(md_file, mapping=mapping, image_prefix='', report_file=None)
+        updated += stats['updated_refs'] if stats else 0
+
+    unreadable = []
+    remaining = scan_references(markdown_files, REF_PATTERNS + OTHER_REF_PATTERNS, unreadable)
+    rewritten = set()
+    for group in plan:
+        for duplicate in group['duplicates']:
+            if duplicate in remaining or any(_mentioned_in(duplicate, f) for f in unreadable):
+                continue
+            rewritten.add(duplicate)
+    return updated, rewritten
+
+
+def _hardlink(canonical, duplicate):
+    temp = f"{duplicate}.dedup-tmp"
+    os.link(canonical, temp)
+    os.replace(temp, duplicate)
+
+
+def dedup_images(roots=('.',), mode='rewrite', apply=False, report_file='dedup_report.json'):
+    """查找并合并重复图片，返回报告字典"""
+    files = _walk(roots)
+    image_files = [f for f in files if _is_image(f)]
+    markdown_files = [f for f in files if Path(f).suffix.lower() in MARKDOWN_EXTENSIONS]
+
+    print("="*60)
+    print(f"图片去重（{'执行' if apply else '预览'}，模式：{mode}）")
+    print("="*60)
+    print(f"图片文件：{len(image_files)} 个，Markdown 文件：{len(markdown_files)} 个")
+
+    errors = []
+    skipped = []
+    groups = find_duplicates(image_files, skipped)
+    if skipped:
+        print(f"⚠️  跳过无法读取的文件：{len(skipped)} 个")
+    references = scan_references(markdown_files)
+
+    plan = []
+    disk_saved = 0
+    content_key = {}
+    for digest, size, paths in groups:
+        canonical = choose_canonical(paths, references)
+        canonical_inode = os.stat(canonical).st_ino
+        duplicates = [p for p in paths if p != canonical]
+        # 已经是规范文件硬链接的副本不再占用额外空间
+        distinct = {os.stat(p).st_ino for p in duplicates} - {canonical_inode}
+        disk_saved += size * len(distinct)
+        for path in paths:
+            content_key[path] = digest
+        plan.append({
+            'sha256': digest,
+            'size': size,
+            'canonical': canonical,
+            'duplicates': duplicates,
+            'references': sum(len(references.get(p, ())) for p in duplicates),
+        })
+
+    sizes = {p: g['size'] for g in plan for p in [g['canonical'], *g['duplicates']]}
+    for target in references:
+        if target not in sizes and os.path.isfile(target):
+            sizes[target] = os.path.getsize(target)
+    pdf_savings = estimate_pdf_savings(references, content_key, sizes) if mode == 'rewrite' else {}
+
+    duplicate_count = sum(len(g['duplicates']) for g in plan)
+    print(f"重复组：{len(plan)} 组，副本：{duplicate_count} 个")
+    for group in plan[:5]:
+        print(f"  {group['canonical']} ← {len(group['duplicates'])} 个副本（{group['size']} 字节）")
+    if len(plan) > 5:
+        print(f"  ... 还有 {len(plan) - 5} 组")
+
+    stats = {
+        'duplicate_groups': len(plan),
+        'duplicate_files': duplicate_count,
+        'disk_bytes_saved': disk_saved,
+        'pdf_bytes_saved': sum(pdf_savings.values()),
+        'updated_refs': 0,
+        'deleted': 0,
+        'failed': 0,
+        'skipped': len(skipped),
+    }
+    errors.extend({'file': item['file'], 'error': f"跳过：{item['error']}"} for item in skipped)
+
+    if apply and plan:
+        if mode == 'rewrite':
+            stats['updated_refs'], rewritten = _rewrite_references(plan, references, markdown_files)
+            for group in plan:
+                for duplicate in group['duplicates']:
+                    if duplicate not in rewritten:
+                        # 仍有引用未能改写，删除会让引用失效
+                        stats['failed'] += 1
+                        errors.append({'file': duplicate, 'error': '仍被引用（引用写法无法自动改写），已保留'})
+                        continue
+                    try:
+                        os.unlink(duplicate)
+                        stats['deleted'] += 1
+                    except OSError as e:
+                        stats['failed'] += 1
+                        errors.append({'file': duplicate, 'error': str(e)})
+        else:
+            for group in plan:
+                for duplicate in group['duplicates']:
+                    if os.path.samefile(group['canonical'], duplicate):
+                        continue
+                    try:
+                        _hardlink(group['canonical'], duplicate)
+                    except OSError as e:
+                        # 跨文件系统等无法建立硬链接
+                        stats['failed'] += 1
+                        errors.append({'file': duplicate, 'error': str(e)})
+
+    print("\n" + "="*60)
+    print("去重完成" if apply else "去重计划（加 --apply 执行）")
+    print("="*60)
+    print(f"磁盘节省：{disk_saved / 1024 / 1024:.2f} MB")
+    if mode == 'rewrite':
+        print(f"PDF 估计节省：{stats['pdf_bytes_saved'] / 1024 / 1024:.2f} MB（{len(pdf_savings)} 个文档）")
+    else:
+        print("PDF 节省：0（hardlink 模式不改变引用路径，PDF 仍分别嵌入）")
+    if apply and mode == 'rewrite':
+        print(f"已更新引用：{stats['updated_refs']} 处，删除副本：{stats['deleted']} 个")
+    if stats['failed']:
+        print(f"⚠️  {'保留仍被引用的副本' if mode == 'rewrite' else '硬链接失败'}：{stats['failed']} 个")
+
+    report = {
+        'mode': mode,
+        'applied': apply,
+        'stats': stats,
+        'groups': plan,
+        'pdf_savings': dict(sorted(pdf_savings.items())),
+        'errors': errors,
+    }
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n详细报告已保存到：{report_file}")
+    print("="*60)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按内容去重笔记库中的图片')
+    parser.add_argument('roots', nargs='*', default=['.'], help='扫描的根目录 (默认: 当前目录)')
+    parser.add_argument('--mode', choices=['rewrite', 'hardlink'], default='rewrite',
+                        help='rewrite: 改写引用并删除副本；hardlink: 副本替换为硬链接 (默认: rewrite)')
+    parser.add_argument('--apply', action='store_true', help='执行去重（默认只生成报告）')
+    parser.add_argument('--report', default='dedup_report.json', help='报告文件 (默认: dedup_report.json)')
+    args = parser.parse_args()
+
+    report = dedup_images(args.roots, args.mode, args.apply, args.report)
+    return 1 if report['stats']['failed'] else 0
+
+
+if __name__ == '__main__':
+    exit(main())
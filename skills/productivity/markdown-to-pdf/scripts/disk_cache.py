@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+内容寻址磁盘缓存
+
+所有缓存共用一个根目录，按命名空间划分子目录:
+  <根目录>/<namespace>/<key[:2]>/<key><suffix>
+
+根目录默认为 ~/.cache/markdown-to-pdf，可通过环境变量 MD2PDF_CACHE_DIR 修改。
+超过容量上限时按最近访问时间（命中时刷新 mtime）淘汰最旧的条目。
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+
+def default_cache_dir():
+    """缓存根目录"""
+    env_dir = os.environ.get('MD2PDF_CACHE_DIR')
+    if env_dir:
+        return Path(env_dir)
+    return Path.home() / '.cache' / 'markdown-to-pdf'
+
+
+def hash_file(file_path, hasher=None, chunk_size=1024 * 1024):
+    """计算文件内容的 sha256（分块读取，不一次性载入内存）"""
+    hasher = hasher or hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher
+
+
+class DiskCache:
+    """单个命名空间下的磁盘缓存"""
+
+    def __init__(self, namespace, max_bytes=DEFAULT_MAX_BYTES, root=None):
+        self.directory = Path(root or default_cache_dir()) / namespace
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key, suffix=''):
+        """缓存条目的存储路径"""
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def get(self, key, suffix=''):
+        """查找缓存条目，命中时刷新访问时间并返回路径，否则返回 None"""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def get_bytes(self, key, suffix=''):
+        """读取缓存内容，未命中返回 None"""
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def _atomic_write(self, path, write):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            # mkstemp 默认 0600，缓存文件可能被其他进程（如 wkhtmltopdf）读取
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return path
+
+    def put_bytes(self, key, data, suffix=''):
+        """写入缓存内容（原子替换，并发进程安全）"""
+        return self._atomic_write(self.path_for(key, suffix), lambda f: f.write(data))
+
+    def put_file(self, key, src_path, suffix=''):
+        """将已有文件复制进缓存"""
+        def copy(f):
+            with open(src_path, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        return self._atomic_write(self.path_for(key, suffix), copy)
+
+    def evict(self):
+        """超出容量上限时按访问时间淘汰最旧条目，返回释放的字节数"""
+        if not self.directory.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        freed = 0
+        if total <= self.max_bytes:
+            return freed
+
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
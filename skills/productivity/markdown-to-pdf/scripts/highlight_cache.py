@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+代码高亮缓存
+
+codehilite 每次转换都要对每个围栏代码块重新做 Pygments 词法分析和格式化
+（未标注语言的代码块还要先猜测语言），而笔记中的代码几乎不变。
+这里在 fenced_code 之前接管围栏代码块的高亮，结果按 语言 + 代码 + 高亮配置
+缓存在磁盘上（与 PDF 缓存共用根目录，命名空间 highlight），跨运行、跨文档复用。
+
+输出与 fenced_code + codehilite 完全一致；使用 {attrs} 语法的代码块仍交给 fenced_code 处理。
+"""
+
+import hashlib
+import json
+
+import markdown
+from markdown.extensions import Extension
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension, parse_hl_lines
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.preprocessors import Preprocessor
+
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache
+
+try:
+    import pygments
+    PYGMENTS_VERSION = pygments.__version__
+except ImportError:
+    PYGMENTS_VERSION = None
+
+FENCED_BLOCK_RE = FencedBlockPreprocessor.FENCED_BLOCK_RE
+
+# 进程内缓存的条目上限（watch / 批量模式下进程常驻）
+MAX_MEMORY_ENTRIES = 4096
+
+
+def highlight_key(lang, code, config):
+    """缓存键：语言、代码、高亮配置（含样式）以及 Pygments / Markdown 版本"""
+    payload = json.dumps({
+        'lang': lang,
+        'config': config,
+        'pygments': PYGMENTS_VERSION,
+        'markdown': markdown.__version__,
+    }, sort_keys=True, default=str)
+    hasher = hashlib.sha256(payload.encode('utf-8'))
+    hasher.update(b'\0')
+    hasher.update(code.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class HighlightCache:
+    """高亮结果缓存：进程内字典 + 磁盘"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.disk = DiskCache('highlight', max_bytes=max_bytes, root=cache_dir)
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+        self._written = False
+
+    def get(self, key):
+        html = self.memory.get(key)
+        if html is None:
+            data = self.disk.get_bytes(key, '.html')
+            if data is not None:
+                html = data.decode('utf-8')
+                self._remember(key, html)
+        if html is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return html
+
+    def put(self, key, html):
+        self._remember(key, html)
+        self.disk.put_bytes(key, html.encode('utf-8'), '.html')
+        self._written = True
+
+    def _remember(self, key, html):
+        if len(self.memory) >= MAX_MEMORY_ENTRIES:
+            self.memory.clear()
+        self.memory[key] = html
+
+    def evict(self):
+        """有新条目写入时才检查容量（避免每次转换都扫描缓存目录）"""
+        if not self._written:
+            return 0
+        self._written = False
+        return self.disk.evict()
+
+
+class CachedHighlightPreprocessor(Preprocessor):
+    """带缓存的围栏代码块高亮（与 fenced_code 的 Pygments 分支一致）"""
+
+    def __init__(self, md, cache):
+        super().__init__(md)
+        self.cache = cache
+        self._codehilite_conf = None
+
+    def _config(self):
+        if self._codehilite_conf is None:
+            self._codehilite_conf = {}
+            for ext in self.md.registeredExtensions:
+                if isinstance(ext, CodeHiliteExtension):
+                    self._codehilite_conf = ext.getConfigs()
+        return self._codehilite_conf
+
+    def _highlight(self, code, lang, config):
+        key = highlight_key(lang, code, config)
+        html = self.cache.get(key)
+        if html is None:
+            local_config = dict(config)
+            style = local_config.pop('pygments_style', 'default')
+            html = CodeHilite(code, lang=lang, style=style, **local_config).hilite(shebang=False)
+            self.cache.put(key, html)
+        return html
+
+    def run(self, lines):
+        config = self._config()
+        if not config or not config['use_pygments']:
+            return lines
+
+        text = '\n'.join(lines)
+        if '```' not in text and '~~~' not in text:
+            return lines
+
+        index = 0
+        while True:
+            m = FENCED_BLOCK_RE.search(text, index)
+            if not m:
+                break
+            if m.group('attrs'):
+                # {attrs} 语法（id、class、键值对）交给 fenced_code 处理
+                index = m.end()
+                continue
+
+            local_config = dict(config)
+            if m.group('hl_lines'):
+                local_config['hl_lines'] = parse_hl_lines(m.group('hl_lines'))
+            html = self._highlight(m.group('code'), m.group('lang') or None, local_config)
+
+            placeholder = self.md.htmlStash.store(html)
+            text = f'{text[:m.start()]}\n{placeholder}\n{text[m.end():]}'
+            index = m.start() + 1 + len(placeholder)
+        return text.split('\n')
+
+
+class HighlightCacheExtension(Extension):
+    """启用代码高亮缓存，需与 codehilite、fenced_code 一起使用"""
+
+    def __init__(self, cache, **kwargs):
+        # 缓存对象不能放进 config（setConfig 会按默认值类型转换）
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        # 在 notes_strip (28) 之后、fenced_code (25) 之前
+        md.preprocessors.register(CachedHighlightPreprocessor(md, self.cache), 'highlight_cache', 26)
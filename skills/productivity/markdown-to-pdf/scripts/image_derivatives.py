@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+打印分辨率图片衍生件
+
+PDF 为 A4、四边 15mm 边距，正文区域 180mm x 267mm。超过目标 DPI 下
+正文区域像素尺寸的图片（例如 4K 截图）会被缩小后再交给 wkhtmltopdf:
+- 带透明通道或颜色数较少的图片（截图、示意图）保存为 PNG
+- 颜色丰富的图片（照片）保存为 JPEG
+衍生件按 源文件哈希 + 目标尺寸 缓存在磁盘上，源文件不变时不会重复生成；
+无法缩小的图片（动图、缩小后反而更大）在同一个键下记录「使用原图」标记，之后不再解码。
+缩小对 PDF 大小和渲染耗时的影响见 benchmark.py derivatives。
+
+依赖: Pillow（未安装时跳过此阶段）
+"""
+
+import hashlib
+import io
+import os
+import time
+
+from analyze_images import sniff_image
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, hash_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CONTENT_WIDTH_MM = 210 - 15 * 2
+CONTENT_HEIGHT_MM = 297 - 15 * 2
+MM_PER_INCH = 25.4
+
+# 颜色数判断: 最近邻缩小到 64x64 后不超过该颜色数视为截图/示意图
+SAMPLE_SIZE = (64, 64)
+MAX_GRAPHIC_COLORS = 256
+JPEG_QUALITY = 85
+
+# 「使用原图」标记的后缀（空文件）
+ORIGINAL_MARKER = '.original'
+
+
+def target_size(dpi):
+    """正文区域在给定 DPI 下的像素尺寸"""
+    return (
+        round(CONTENT_WIDTH_MM / MM_PER_INCH * dpi),
+        round(CONTENT_HEIGHT_MM / MM_PER_INCH * dpi),
+    )
+
+
+def has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def is_photo(img):
+    """颜色丰富（照片）返回 True，截图和示意图返回 False"""
+    sample = img.convert('RGB').resize(SAMPLE_SIZE, Image.NEAREST)
+    return sample.getcolors(maxcolors=MAX_GRAPHIC_COLORS) is None
+
+
+class DerivativeStage:
+    """渲染前的图片缩小阶段"""
+
+    def __init__(self, dpi=150, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+        self.dpi = dpi
+        self.max_size = target_size(dpi)
+        self.cache = DiskCache('derivatives', max_bytes=cache_max_bytes, root=cache_dir)
+        self.stats = {
+            'images': 0,
+            'resized': 0,
+            'kept_original': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'seconds': 0.0,
+        }
+        self._done = {}
+
+    @staticmethod
+    def is_available():
+        return Image is not None
+
+    def derive(self, path):
+        """返回用于渲染的图片路径（需要缩小时为衍生件，否则为原图）"""
+        path = str(path)
+        if path in self._done:
+            return self._done[path]
+
+        start = time.perf_counter()
+        result = self._derive(path)
+        self.stats['seconds'] += time.perf_counter() - start
+        self._done[path] = result
+        return result
+
+    def _derive(self, path):
+        self.stats['images'] += 1
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return path
+        self.stats['bytes_before'] += size
+
+        # 文件头中的尺寸已在目标范围内，或是矢量图时，不必用 Pillow 打开
+        image_format, width, height = sniff_image(path)
+        max_w, max_h = self.max_size
+        if image_format == 'svg' or (width and width <= max_w and height <= max_h):
+            self.stats['bytes_after'] += size
+            return path
+
+        try:
+            key = hashlib.sha256(
+                f"{hash_file(path).hexdigest()}:{max_w}x{max_h}".encode('utf-8')
+            ).hexdigest()
+            for suffix in ('.png', '.jpg'):
+                cached = self.cache.get(key, suffix)
+                if cached:
+                    self.stats['resized'] += 1
+                    self.stats['bytes_after'] += cached.stat().st_size
+                    return str(cached)
+            if self.cache.get(key, ORIGINAL_MARKER):
+                return self._keep_original(path, size)
+
+            with Image.open(path) as img:
+                width, height = img.size
+                if (width <= max_w and height <= max_h) or getattr(img, 'n_frames', 1) > 1:
+                    return self._keep_original(path, size, key)
+
+                img.draft('RGB', (max_w, max_h))
+                img.thumbnail((max_w, max_h), Image.LANCZOS)
+
+                buffer = io.BytesIO()
+                if not has_alpha(img) and is_photo(img):
+                    img.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY)
+                    suffix = '.jpg'
+                else:
+                    img.save(buffer, 'PNG')
+                    suffix = '.png'
+        except Exception as e:
+            print(f"  ⚠️  图片缩小失败 {os.path.basename(path)}: {e}")
+            self.stats['bytes_after'] += size
+            return path
+
+        data = buffer.getvalue()
+        if len(data) >= size:
+            # 缩小后反而更大（源文件已高度压缩），继续使用原图
+            return self._keep_original(path, size, key)
+
+        derived = self.cache.put_bytes(key, data, suffix)
+        self.stats['resized'] += 1
+        self.stats['bytes_after'] += len(data)
+        return str(derived)
+
+    def _keep_original(self, path, size, key=None):
+        """使用原图；给出 key 时记录标记，下次不必再解码判断"""
+        if key:
+            self.cache.put_bytes(key, b'', ORIGINAL_MARKER)
+        self.stats['kept_original'] += 1
+        self.stats['bytes_after'] += size
+        return path
+
+    def report(self):
+        """输出本次转换的衍生件统计"""
+        stats = self.stats
+        before = stats['bytes_before'] / (1024 * 1024)
+        after = stats['bytes_after'] / (1024 * 1024)
+        saved = (1 - after / before) * 100 if before else 0.0
+        print(f"🖼️  图片缩小 ({self.dpi} DPI, 最大 {self.max_size[0]}x{self.max_size[1]}): "
+              f"{stats['resized']}/{stats['images']} 张, "
+              f"{before:.1f} MB → {after:.1f} MB (-{saved:.0f}%), 耗时 {stats['seconds']:.2f}s")
+        if stats['kept_original']:
+            print(f"   超出尺寸但无法缩小（动图或缩小后更大），使用原图: {stats['kept_original']} 张")
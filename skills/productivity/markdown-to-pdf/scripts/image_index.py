@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+图片路径索引
+
+每个被引用到的目录只列一次（os.scandir），之后的存在性检查和 .png 回退
+都在内存中完成；同一个图片引用多次只解析一次。
+在网络挂载的笔记目录上，可以把每个文档数千次 stat 调用降到每个目录一次。
+
+解析结果与 Path.resolve() + Path.exists() 一致:
+- 目录部分按真实路径解析（每个目录一次 realpath），.. 经过符号链接时指向链接目标的上级目录；
+  文件本身是符号链接时解析到链接目标（.png 回退得到的路径与之前一样不再解析）
+- 大小写不敏感的文件系统（macOS、Windows 默认）上，大小写不同的文件名同样视为存在；
+  是否区分大小写按目录检测一次
+"""
+
+import os
+from pathlib import Path
+
+
+class _Listing:
+    """单个目录的文件列表: 名称 -> 是否为符号链接，以及大小写不敏感时的折叠名称集合"""
+
+    def __init__(self, names, folded=None):
+        self.names = names
+        self.folded = folded
+
+    def get(self, name):
+        """返回 (是否存在, 是否为符号链接)"""
+        if name in self.names:
+            return True, self.names[name]
+        if self.folded is not None and name.casefold() in self.folded:
+            return True, False
+        return False, False
+
+
+class ImageIndex:
+    """单次转换内使用的图片目录索引"""
+
+    def __init__(self):
+        self._listings = {}
+        self._real_dirs = {}
+        self._resolved = {}
+        self._missing = set()
+        self.fs_calls = 0
+        self.lookups = 0
+
+    def _real_dir(self, directory):
+        """目录的真实路径（与 Path.resolve() 相同，不要求存在）"""
+        real = self._real_dirs.get(directory)
+        if real is None:
+            self.fs_calls += 1
+            real = self._real_dirs[directory] = os.path.realpath(directory)
+        return real
+
+    def _case_insensitive(self, directory, names):
+        """用目录中一个含字母的文件名检测文件系统是否区分大小写"""
+        for name in names:
+            swapped = name.swapcase()
+            if swapped != name and swapped not in names:
+                self.fs_calls += 1
+                return os.path.exists(os.path.join(directory, swapped))
+        return False
+
+    def _listing(self, directory):
+        """目录的文件列表（目录不存在时为空）"""
+        listing = self._listings.get(directory)
+        if listing is None:
+            self.fs_calls += 1
+            try:
+                with os.scandir(directory) as entries:
+                    names = {entry.name: entry.is_symlink() for entry in entries}
+            except OSError:
+                names = {}
+            folded = None
+            if self._case_insensitive(directory, names):
+                folded = frozenset(name.casefold() for name in names)
+            listing = self._listings[directory] = _Listing(names, folded)
+        return listing
+
+    def _lookup(self, path, follow_links=True):
+        """路径存在时返回解析后的路径，否则返回 None"""
+        parent, name = os.path.split(path)
+        found, is_link = self._listing(parent).get(name)
+        if not found:
+            return None
+        if is_link and follow_links:
+            self.fs_calls += 1
+            return os.path.realpath(path)
+        return path
+
+    def exists(self, path):
+        """路径是否存在（基于目录列表判断）"""
+        parent, name = os.path.split(str(path))
+        return self._listing(self._real_dir(parent)).get(name)[0]
+
+    def resolve(self, base_dir, rel_path):
+        """解析图片路径，返回 (绝对路径, 是否使用了 .png 回退)；文件不存在时路径为 None"""
+        self.lookups += 1
+        key = (str(base_dir), rel_path)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        parent, name = os.path.split(os.path.join(str(base_dir), rel_path))
+        if name in ('', '.', '..'):
+            parent, name = os.path.split(self._real_dir(os.path.join(parent, name)))
+        abs_path = os.path.join(self._real_dir(parent), name)
+
+        found = self._lookup(abs_path)
+        if found:
+            result = (Path(found), False)
+        else:
+            # 如果原文件不存在,尝试添加 .png 扩展名
+            found = self._lookup(abs_path + '.png', follow_links=False)
+            result = (Path(found), True) if found else (None, False)
+            if not found:
+                self._missing.add(abs_path)
+
+        self._resolved[key] = result
+        return result
+
+    @property
+    def unique(self):
+        """解析过的不同图片引用数"""
+        return len(self._resolved)
+
+    def paths(self):
+        """解析到的全部图片文件路径"""
+        return sorted({str(path) for path, _ in self._resolved.values() if path})
+
+    def missing(self):
+        """未找到的图片引用会查找的路径（原路径及 .png 回退），文件出现后即可解析"""
+        return sorted(self._missing | {path + '.png' for path in self._missing})
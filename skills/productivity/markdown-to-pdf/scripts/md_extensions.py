@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Python-Markdown 扩展：把 convert.py 的文本预处理合并进一次 Markdown 解析
+
+- NotesPreprocessor: 逐行一次遍历，去除元数据行和 emoji
+- NotesTreeprocessor: 一次遍历文档树，为 h2/h3 添加 id 和 data-number，
+  在 h2 前插入分页符，解析 <img> 路径（包括原始 HTML 中的 <img> 标签），并收集目录结构
+- SplitBlocksExtension: 把超长的表格和围栏代码块拆成多段（表格每段重复表头）
+
+原先的实现在 markdown.markdown 之前对整篇文档做 8 次以上的 re.sub，
+再由 fix_image_paths / extract_toc_structure 各扫描一遍；
+现在文档只被 Markdown 解析器分词一次，其余处理都在文档树上完成。
+"""
+
+import re
+import xml.etree.ElementTree as etree
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.treeprocessors import Treeprocessor
+
+# 需要从正文中移除的元数据行（封面中单独展示）
+METADATA_LINE_RE = re.compile(r'^\*\*(?:创建者|为谁创建|基于|最后更新|适用场景)\*\*:.+$')
+EMOJI_RE = re.compile(r'[\U0001F300-\U0001F9FF]')
+H2_NUMBERED_RE = re.compile(r'^(\d+)\.\s+(.+)$', re.DOTALL)
+H3_NUMBERED_RE = re.compile(r'^(\d+\.\d+)\s+(.+)$', re.DOTALL)
+RAW_IMG_RE = re.compile(r'<img[^>]+>')
+RAW_IMG_SRC_RE = re.compile(r'src="([^"]+)"')
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+TABLE_SEPARATOR_RE = re.compile(r'^ {0,3}\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+# 跨章节生效的定义（引用式链接、脚注、缩写），存在时不能按章节单独转换
+CROSS_REF_RE = re.compile(r'^ {0,3}(?:\[[^\]]+\]|\*\[[^\]]+\]):', re.MULTILINE)
+
+TOC_TITLE_MAX = 50
+
+
+def heading_id(title, number=None, level=2):
+    """生成标题 id（与 v2.0 的规则一致）"""
+    slug = f"{number}-{title}" if number else title
+    slug = slug.replace(' ', '-').replace(':', '')
+    if number and level == 3:
+        slug = slug.replace('.', '-')
+    return slug.lower()
+
+
+def has_cross_references(md_content):
+    """是否包含引用式链接、脚注或缩写定义（这些定义跨章节生效，不能按章节分别转换）"""
+    return CROSS_REF_RE.search(md_content) is not None
+
+
+def iter_markdown_chapters(md_content):
+    """逐个产生在顶层 "## " 标题处拆分的片段（忽略代码块内的行）
+
+    第一个片段是首个 h2 之前的内容（可能为空），拼接后与原文相同。
+    """
+    current = []
+    fence = None
+    for line in md_content.splitlines(keepends=True):
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+        elif match:
+            fence = match.group(1)
+        elif line.startswith('## '):
+            yield ''.join(current)
+            current = []
+        current.append(line)
+    yield ''.join(current)
+
+
+def split_markdown_chapters(md_content):
+    """在顶层 "## " 标题处拆分 Markdown 源文本，返回片段列表
+
+    文档包含引用式链接、脚注或缩写定义时返回 None（这些定义跨章节生效）。
+    """
+    if has_cross_references(md_content):
+        return None
+    return list(iter_markdown_chapters(md_content))
+
+
+class NotesPreprocessor(Preprocessor):
+    """去除元数据行和 emoji"""
+
+    def run(self, lines):
+        result = []
+        for line in lines:
+            if METADATA_LINE_RE.match(line):
+                result.append('')
+            else:
+                result.append(EMOJI_RE.sub('', line))
+        return result
+
+
+class NotesTreeprocessor(Treeprocessor):
+    """标题编号、章节分页、图片路径和目录结构"""
+
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+
+    def _strip_number(self, el, pattern):
+        """从标题文本开头移除序号，返回序号（无序号时返回 None）"""
+        text = el.text or ''
+        match = pattern.match(text)
+        if not match:
+            return None
+        el.text = match.group(2)
+        return match.group(1)
+
+    def _heading(self, el, level):
+        pattern = H2_NUMBERED_RE if level == 2 else H3_NUMBERED_RE
+        number = self._strip_number(el, pattern)
+        title = ''.join(el.itertext()).strip()
+
+        el.set('id', heading_id(title, number, level))
+        if number:
+            el.set('data-number', number)
+
+        # 无序号的 h3 只有出现在某个 h2 之后才计入目录
+        if level == 3 and not number and self.extension.h2_count == 0:
+            return
+
+        toc_title = title
+        if level == 3 and len(toc_title) > TOC_TITLE_MAX:
+            toc_title = toc_title[:TOC_TITLE_MAX - 3] + '...'
+        self.extension.toc.append({
+            'level': level,
+            'number': number,
+            'title': toc_title,
+            'id': el.get('id'),
+        })
+
+    def _image(self, el):
+        resolver = self.extension.image_resolver
+        src = el.get('src')
+        if resolver and src:
+            new_src = resolver(src)
+            if new_src:
+                el.set('src', new_src)
+
+    def _raw_images(self):
+        """原始 HTML 片段在 inline 阶段已全部暂存，这里一次性处理其中的 <img> 标签"""
+        resolver = self.extension.image_resolver
+        if not resolver:
+            return
+
+        def replace_image(match):
+            img_tag = match.group(0)
+            src_match = RAW_IMG_SRC_RE.search(img_tag)
+            if not src_match:
+                return img_tag
+            new_src = resolver(src_match.group(1))
+            if not new_src:
+                return img_tag
+            return img_tag.replace(src_match.group(0), f'src="{new_src}"')
+
+        stash = self.md.htmlStash.rawHtmlBlocks
+        for i, block in enumerate(stash):
+            if isinstance(block, str) and '<img' in block:
+                stash[i] = RAW_IMG_RE.sub(replace_image, block)
+
+    def run(self, root):
+        self._raw_images()
+
+        breaks = []
+        for parent in root.iter():
+            for child in parent:
+                if child.tag == 'h2':
+                    self._heading(child, 2)
+                    # 第一个 h2 不添加分页符（避免 h1 后单独占页）
+                    if self.extension.h2_count > 0:
+                        breaks.append((parent, child))
+                    self.extension.h2_count += 1
+                elif child.tag == 'h3':
+                    self._heading(child, 3)
+                elif child.tag == 'img':
+                    self._image(child)
+
+        # 每个父节点只重建一次子节点列表（逐个 insert 在长文档上是平方复杂度）
+        parents = {}
+        for parent, heading in breaks:
+            parents.setdefault(parent, set()).add(heading)
+        for parent, headings in parents.items():
+            children = []
+            for child in parent:
+                if child in headings:
+                    div = etree.Element('div', {'class': 'chapter-break'})
+                    div.tail = '\n'
+                    children.append(div)
+                children.append(child)
+            parent[:] = children
+
+
+class SplitBlocksPreprocessor(Preprocessor):
+    """拆分超长的管道表格和围栏代码块
+
+    CSS 对 pre、table 设置了 page-break-inside: avoid，数千行的表格或代码会让 wkhtmltopdf
+    花费大量时间和内存尝试满足该规则。这里在源文本层面把它们拆成每段不超过阈值的多个块，
+    表格每段重复表头和分隔行；带 hl_lines 或 {attrs} 的代码块保持不变（行号和属性无法按段对应）。
+    """
+
+    def __init__(self, md, max_table_rows, max_code_lines):
+        super().__init__(md)
+        self.max_table_rows = max_table_rows
+        self.max_code_lines = max_code_lines
+        self.tables_split = 0
+        self.code_blocks_split = 0
+
+    def _split_code(self, opening, body, closing):
+        lang_line = opening.strip()
+        if '{' in lang_line or 'hl_lines' in lang_line or len(body) <= self.max_code_lines:
+            return [opening, *body, closing]
+        self.code_blocks_split += 1
+        result = []
+        fence_line = opening.rstrip('\n')
+        close_line = FENCE_RE.match(opening).group(1)
+        for start in range(0, len(body), self.max_code_lines):
+            if result:
+                result.append('')
+            result.append(fence_line)
+            result.extend(body[start:start + self.max_code_lines])
+            result.append(close_line)
+        return result
+
+    def _split_table(self, header, separator, rows):
+        if len(rows) <= self.max_table_rows:
+            return [header, separator, *rows]
+        self.tables_split += 1
+        result = []
+        for start in range(0, len(rows), self.max_table_rows):
+            if result:
+                result.append('')
+            result.extend([header, separator])
+            result.extend(rows[start:start + self.max_table_rows])
+        return result
+
+    def run(self, lines):
+        if not self.max_table_rows and not self.max_code_lines:
+            return lines
+
+        result = []
+        i = 0
+        count = len(lines)
+        while i < count:
+            line = lines[i]
+            fence = FENCE_RE.match(line)
+            if fence:
+                marker = fence.group(1)
+                end = i + 1
+                while end < count:
+                    close = FENCE_RE.match(lines[end])
+                    if close and close.group(1)[0] == marker[0] and len(close.group(1)) >= len(marker) \
+                            and not lines[end].strip().strip(marker[0]):
+                        break
+                    end += 1
+                if end >= count or not self.max_code_lines:
+                    result.extend(lines[i:end + 1])
+                else:
+                    result.extend(self._split_code(line, lines[i + 1:end], lines[end]))
+                i = end + 1
+                continue
+
+            if (self.max_table_rows and '|' in line and i + 1 < count
+                    and TABLE_SEPARATOR_RE.match(lines[i + 1]) and '-' in lines[i + 1]):
+                end = i + 2
+                while end < count and lines[end].strip() and '|' in lines[end]:
+                    end += 1
+                result.extend(self._split_table(line, lines[i + 1], lines[i + 2:end]))
+                i = end
+                continue
+
+            result.append(line)
+            i += 1
+        return result
+
+
+class SplitBlocksExtension(Extension):
+    """拆分超长表格和代码块（阈值为 0 表示不拆分该类块）"""
+
+    def __init__(self, **kwargs):
+        self.config = {
+            'max_table_rows': [0, '每个表格段的最大行数（不含表头）'],
+            'max_code_lines': [0, '每个代码块段的最大行数'],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        self.processor = SplitBlocksPreprocessor(
+            md, self.getConfig('max_table_rows'), self.getConfig('max_code_lines')
+        )
+        # 在 notes_strip (28) 之后、highlight_cache (26) 和 fenced_code (25) 之前
+        md.preprocessors.register(self.processor, 'split_blocks', 27)
+
+
+class NotesExtension(Extension):
+    """笔记文档处理扩展
+
+    image_resolver: 接收原始 src，返回新的 src（如 file:// 绝对路径），
+    返回 None 表示保持不变。
+    转换结束后目录结构保存在 extension.toc。
+    """
+
+    def __init__(self, image_resolver=None, **kwargs):
+        # 函数对象不能放进 config（None 默认值会被 setConfig 当作布尔值解析）
+        self.image_resolver = image_resolver
+        super().__init__(**kwargs)
+        self.reset()
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        md.preprocessors.register(NotesPreprocessor(md), 'notes_strip', 28)
+        # 在 inline (20) 之后运行，标题内的行内语法已解析；在 toc (5) 之前，toc 会保留已有 id
+        # 不使用 Postprocessor 处理原始 HTML：toc 会为每个标题重跑一遍全部 postprocessor
+        md.treeprocessors.register(NotesTreeprocessor(md, self), 'notes_tree', 15)
+
+    def reset(self):
+        self.toc = []
+        self.h2_count = 0
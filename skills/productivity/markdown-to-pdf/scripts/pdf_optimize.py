@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+PDF 后处理优化（convert.py 的 --optimize）
+
+wkhtmltopdf 输出的 PDF 往往偏大：页面内容流未压缩或压缩级别低、相同的字体和图片对象重复、
+图片保持原始质量。渲染完成后用 pypdf 离线处理:
+- 以最高级别重新压缩页面内容流
+- 合并内容相同的对象并删除无引用对象
+- 按质量档位把图片重新编码为 JPEG（需要 Pillow；带透明通道的图片保持不变，
+  只在明显变小时替换）
+- 可选的线性化（--linearize，Fast Web View，首页可先显示）：pypdf 不支持，需要 pikepdf
+  （qpdf 的原生绑定），因此默认不做；未安装 pikepdf 时只给出警告，统计中 linearized 为 False
+
+结果不比原文件小（且未线性化）时保留原文件。中途出错时不会留下临时文件。
+
+额外依赖: pip3 install pypdf（图片重新压缩需要 Pillow，--linearize 需要 pikepdf）
+
+使用方法:
+  python pdf_optimize.py output.pdf
+  python pdf_optimize.py output.pdf --profile small -o output.small.pdf
+  python pdf_optimize.py output.pdf --linearize
+"""
+
+import argparse
+import io
+import os
+import shutil
+import time
+
+# 质量档位: 图片 JPEG 质量（None 表示不处理图片）、图片最长边上限（像素）
+PDF_PROFILES = {
+    'lossless': {'image_quality': None, 'max_dimension': None},
+    'balanced': {'image_quality': 85, 'max_dimension': None},
+    'small': {'image_quality': 70, 'max_dimension': 1600},
+}
+
+DEFAULT_PDF_PROFILE = 'balanced'
+
+# 重新编码后至少缩小这个比例才替换（避免 JPEG 反复有损压缩却收益很小）
+MIN_IMAGE_SAVING = 0.1
+
+
+def is_available():
+    """是否安装了 pypdf（convert.py 启动时只读取档位，pypdf 在优化时才导入）"""
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _pikepdf():
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+    return pikepdf
+
+
+def _recompress_images(writer, quality, max_dimension):
+    """重新编码图片，返回 (处理的图片数, 节省的字节数)"""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("   ⚠️  图片重新压缩需要 Pillow: pip3 install Pillow，已跳过")
+        return 0, 0
+
+    seen = set()
+    count = 0
+    saved = 0
+    for page in writer.pages:
+        for image_file in page.images:
+            ref = image_file.indirect_reference
+            if ref is None or ref.idnum in seen:
+                continue
+            seen.add(ref.idnum)
+
+            xobject = ref.get_object()
+            if '/SMask' in xobject or '/Mask' in xobject:
+                continue
+            try:
+                image = image_file.image
+            except Exception:
+                continue  # pypdf 无法解码的颜色空间或滤镜
+            if image.mode not in ('RGB', 'L'):
+                if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+                    continue
+                image = image.convert('RGB')
+            if max_dimension and max(image.size) > max_dimension:
+                image = image.copy()
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            original_size = len(xobject._data)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=quality, optimize=True)
+            if buffer.tell() > original_size * (1 - MIN_IMAGE_SAVING):
+                continue
+
+            image_file.replace(image, quality=quality)
+            saved += original_size - len(ref.get_object()._data)
+            count += 1
+    return count, saved
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _linearize(path):
+    """用 pikepdf 线性化，成功返回 True；未安装 pikepdf 时返回 False"""
+    pikepdf = _pikepdf()
+    if pikepdf is None:
+        return False
+    temp = f"{path}.linearized.pdf"
+    try:
+        with pikepdf.open(path) as pdf:
+            pdf.save(temp, linearize=True)
+        os.replace(temp, path)
+    finally:
+        _remove(temp)
+    return True
+
+
+def optimize_pdf(input_file, output_file=None, profile=DEFAULT_PDF_PROFILE, linearize=False):
+    """优化 PDF，返回统计数据；缺少 pypdf 时返回 None
+
+    output_file 为空时原地替换。linearize=True 时用 pikepdf 线性化（可选步骤），
+    未能执行时统计中 linearized 为 False，linearize_skipped 给出原因。
+    """
+    if not is_available():
+        print("⚠️  PDF 优化需要 pypdf: pip3 install pypdf，已跳过")
+        return None
+
+    from pypdf import PdfReader, PdfWriter
+
+    settings = PDF_PROFILES[profile]
+    output_file = output_file or input_file
+    start = time.perf_counter()
+    before = os.path.getsize(input_file)
+
+    print(f"🗜️  优化 PDF（档位: {profile}）...")
+    writer = PdfWriter(clone_from=PdfReader(input_file))
+    for page in writer.pages:
+        page.compress_content_streams(level=9)
+
+    images, image_saved = 0, 0
+    if settings['image_quality']:
+        images, image_saved = _recompress_images(writer, settings['image_quality'], settings['max_dimension'])
+
+    writer.compress_identical_objects()
+
+    temp = f"{output_file}.optimizing.pdf"
+    linearized = False
+    linearize_skipped = None
+    try:
+        with open(temp, 'wb') as f:
+            writer.write(f)
+
+        if linearize:
+            linearized = _linearize(temp)
+            if not linearized:
+                linearize_skipped = '未安装 pikepdf'
+
+        after = os.path.getsize(temp)
+        if after < before or linearized:
+            os.replace(temp, output_file)
+        else:
+            after = before
+            if output_file != input_file:
+                shutil.copyfile(input_file, output_file)
+    finally:
+        _remove(temp)
+
+    stats = {
+        'profile': profile,
+        'bytes_before': before,
+        'bytes_after': after,
+        'images_recompressed': images,
+        'image_bytes_saved': image_saved,
+        'linearized': linearized,
+        'linearize_skipped': linearize_skipped,
+        'seconds': time.perf_counter() - start,
+    }
+    ratio = (1 - after / before) * 100 if before else 0.0
+    print(f"   ✓ {before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB (-{ratio:.1f}%), "
+          f"耗时 {stats['seconds']:.2f}s")
+    if images:
+        print(f"   ✓ 重新压缩图片 {images} 张, 节省 {image_saved / 1024 / 1024:.2f} MB")
+    if linearized:
+        print("   ✓ 已线性化（Fast Web View）")
+    elif linearize_skipped:
+        print(f"   ⚠️  未线性化（{linearize_skipped}）: pip3 install pikepdf")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF 后处理优化')
+    parser.add_argument('input', help='输入的 PDF 文件')
+    parser.add_argument('-o', '--output', help='输出的 PDF 文件 (默认: 原地替换)')
+    parser.add_argument('--profile', choices=sorted(PDF_PROFILES), default=DEFAULT_PDF_PROFILE,
+                        help=f'质量档位 (默认: {DEFAULT_PDF_PROFILE})')
+    parser.add_argument('--linearize', action='store_true',
+                        help='线性化（Fast Web View；需要 pikepdf，未安装时跳过并给出警告）')
+    args = parser.parse_args()
+
+    stats = optimize_pdf(args.input, args.output, args.profile, args.linearize)
+    # 线性化是可选步骤，跳过时只给出警告
+    return 0 if stats else 1
+
+
+if __name__ == '__main__':
+    exit(main())
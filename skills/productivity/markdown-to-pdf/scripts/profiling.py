@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+逐阶段性能剖析（convert.py / workflow.py 的 --profile）
+
+记录每个阶段的:
+- 墙钟耗时
+- Python 内存峰值（tracemalloc；开启后 Python 代码会明显变慢，耗时仅用于相对比较）
+- 子进程 CPU 时间（wkhtmltopdf 在子进程中运行，由 RUSAGE_CHILDREN 的差值得到）
+
+结果写成两个文件:
+- <name>.profile.json: 阶段列表和汇总指标（如 PDF 大小）
+- <name>.trace.json: Chrome trace-event 格式，可在 chrome://tracing 或 https://ui.perfetto.dev 打开
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def max_rss_bytes(children=False):
+    """本进程（或已结束的子进程中最大者）的峰值 RSS，单位字节；Windows 上返回 None
+
+    ru_maxrss 在 Linux 上单位为 KB，macOS 上为字节；取的是进程生命周期内的最高值。
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """阶段计时器，阶段可以嵌套"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.metrics = {}
+        self._stack = []
+        self._origin = time.perf_counter()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+
+    def _update_peaks(self):
+        """把当前峰值计入所有未结束的阶段，然后重置峰值"""
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        """记录一个阶段: with profiler.stage('markdown'): ..."""
+        if tracemalloc.is_tracing():
+            self._update_peaks()
+        frame = {'peak': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        children_start = _children_cpu()
+        try:
+            yield frame
+        finally:
+            elapsed = time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                self._update_peaks()
+            self._stack.pop()
+            self.stages.append({
+                'name': name,
+                'depth': len(self._stack),
+                'start': start - self._origin,
+                'seconds': elapsed,
+                'peak_memory_bytes': frame['peak'],
+                'child_cpu_seconds': _children_cpu() - children_start,
+                'thread': threading.get_ident(),
+                'args': args,
+            })
+
+    def set(self, key, value):
+        """记录汇总指标（如 pdf_bytes）"""
+        self.metrics[key] = value
+
+    def finish(self):
+        """停止内存跟踪（仅当由本实例开启时）"""
+        if self._owns_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def to_dict(self):
+        stages = sorted(self.stages, key=lambda s: s['start'])
+        return {
+            'name': self.name,
+            'total_seconds': time.perf_counter() - self._origin,
+            'peak_memory_bytes': max((s['peak_memory_bytes'] for s in stages), default=0),
+            'metrics': self.metrics,
+            'stages': [{k: v for k, v in s.items() if k != 'thread'} for s in stages],
+        }
+
+    def to_trace(self):
+        """Chrome trace-event 格式（时间单位: 微秒）"""
+        pid = os.getpid()
+        events = [{
+            'name': 'process_name',
+            'ph': 'M',
+            'pid': pid,
+            'args': {'name': self.name},
+        }]
+        for s in sorted(self.stages, key=lambda s: s['start']):
+            events.append({
+                'name': s['name'],
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': round(s['start'] * 1e6),
+                'dur': round(s['seconds'] * 1e6),
+                'pid': pid,
+                'tid': s['thread'],
+                'args': dict(
+                    s['args'],
+                    peak_memory_bytes=s['peak_memory_bytes'],
+                    child_cpu_seconds=round(s['child_cpu_seconds'], 6),
+                ),
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.metrics}
+
+    def write(self, base_path):
+        """写出 <base>.profile.json 和 <base>.trace.json，返回两个路径"""
+        self.finish()
+        base = str(base_path)
+        report_file = f"{base}.profile.json"
+        trace_file = f"{base}.trace.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        with open(trace_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_trace(), f, ensure_ascii=False)
+        return report_file, trace_file
+
+    def report(self):
+        """输出各阶段耗时表"""
+        data = self.to_dict()
+        print("\n" + "="*60)
+        print(f"⏱️  性能剖析: {self.name}")
+        print("="*60)
+        for s in data['stages']:
+            label = '  ' * s['depth'] + s['name']
+            line = f"  {label:<28} {s['seconds']:>8.3f}s  峰值 {s['peak_memory_bytes'] / 1024 / 1024:>7.1f} MB"
+            if s['child_cpu_seconds'] >= 0.005:
+                line += f"  子进程 CPU {s['child_cpu_seconds']:.2f}s"
+            print(line)
+        for key, value in data['metrics'].items():
+            print(f"  {key}: {value}")
+        print("="*60)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+常驻转换服务（本机 HTTP）
+
+编辑器插件和文档机器人每分钟调用 convert.py 多次，每次都要重新启动解释器、
+加载 markdown / Pygments 并构建 CSS。服务进程常驻，持有若干个已预热的 Converter:
+- 并发上限为 Converter 数量（--jobs），其余请求排队；排队数超过 --max-queue 时返回 503
+- 每个请求的日志单独捕获并随结果返回
+- 请求可带 settings 覆盖服务端的转换设置（--draft、--split-chapters 等，见 REQUEST_SETTINGS）；
+  设置不同的请求使用各自的 Converter，按设置分组复用，并发上限不变
+
+接口:
+  POST /convert   {"input": "/abs/doc.md", "output": "/abs/doc.pdf", "title": ..., "author": ...,
+                   "subtitle": ..., "settings": {"draft": true, ...}, "return": "path" | "bytes"}
+                  return=path（默认）返回 JSON {ok, output, seconds, log}；
+                  return=bytes 成功时直接返回 application/pdf
+  GET  /health    {"status": "ok", "uptime": ..., "completed": ..., "failed": ...}
+  GET  /queue     {"waiting": ..., "running": ..., "max_concurrency": ..., "max_queue": ...}
+
+路径在服务进程所在机器上解析，请传绝对路径。服务默认只监听 127.0.0.1。
+
+使用方法:
+  python server.py --port 8765 --jobs 2
+  python convert.py doc.md --server http://127.0.0.1:8765
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from convert import Converter, converter_defaults
+from disk_cache import DEFAULT_MAX_BYTES
+from pdf_optimize import PDF_PROFILES
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 64
+
+# 请求可以覆盖的 Converter 设置（缓存目录和容量只由服务端决定）
+REQUEST_SETTINGS = {
+    'use_cache', 'force', 'split_chapters', 'chapter_jobs', 'image_dpi', 'backend', 'optimize',
+    'low_memory', 'max_table_rows', 'max_code_lines', 'draft', 'profile',
+}
+# 只影响单次转换的设置：直接作用在复用的 Converter 上，不需要单独的实例
+PER_CALL_SETTINGS = {'force'}
+
+# 预热文档：构建 Markdown 实例并加载常用语言的 Pygments 词法分析器
+WARMUP_MARKDOWN = """# 预热
+
+## 1. 章节
+
+### 1.1 小节
+
+```python
+print("warm")
+```
+
+```bash
+echo warm
+```
+
+| a | b |
+|---|---|
+| 1 | 2 |
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ThreadLogs(io.TextIOBase):
+    """按线程捕获 print 输出（redirect_stdout 是进程级的，不能在并发请求中使用）"""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        (buffer or self.fallback).write(text)
+        return len(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        buffer = io.StringIO()
+        self.local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self.local.buffer = None
+
+
+class ConversionService:
+    """Converter 池、排队计数和统计"""
+
+    def __init__(self, jobs=1, max_queue=DEFAULT_MAX_QUEUE, logs=None, **settings):
+        self.jobs = jobs
+        self.max_queue = max_queue
+        self.logs = logs
+        self.settings = settings
+        self.converters = queue.Queue()
+        for _ in range(jobs):
+            self.converters.put(Converter(**settings))
+        # 请求覆盖了设置时使用的 Converter: 设置 -> 空闲实例列表（每种设置最多保留 jobs 个）
+        self.variants = {}
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        """每个 Converter 先转换一次预热文档"""
+        start = time.perf_counter()
+        converters = [self.converters.get() for _ in range(self.jobs)]
+        with tempfile.TemporaryDirectory(prefix='md2pdf-warmup-') as tmp:
+            md_file = Path(tmp) / 'warmup.md'
+            md_file.write_text(WARMUP_MARKDOWN, encoding='utf-8')
+            with contextlib.redirect_stdout(io.StringIO()):
+                for converter in converters:
+                    converter.render_html(WARMUP_MARKDOWN, md_file)
+        for converter in converters:
+            self.converters.put(converter)
+        return time.perf_counter() - start
+
+    def _variant_key(self, overrides):
+        """覆盖设置后的 Converter 设置键；与服务端设置相同时返回 None（使用预热的实例）"""
+        settings = {k: v for k, v in overrides.items() if k not in PER_CALL_SETTINGS}
+        defaults = converter_defaults()
+        if all(self.settings.get(k, defaults[k]) == v for k, v in settings.items()):
+            return None
+        return tuple(sorted({**self.settings, **settings}.items()))
+
+    def _checkout_variant(self, key):
+        """取出一个该设置的空闲 Converter，没有时新建"""
+        with self.lock:
+            idle = self.variants.get(key)
+            if idle:
+                return idle.pop()
+        return Converter(**dict(key))
+
+    def _checkin_variant(self, key, converter):
+        with self.lock:
+            idle = self.variants.setdefault(key, [])
+            if len(idle) < self.jobs:
+                idle.append(converter)
+
+    def convert(self, job):
+        """执行一个转换请求，返回结果字典"""
+        overrides = job.get('settings') or {}
+        key = self._variant_key(overrides)
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                raise QueueFull()
+            self.waiting += 1
+
+        # 并发上限为预热实例的数量：覆盖了设置的请求同样占用一个预热实例的名额
+        slot = self.converters.get()
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+
+        start = time.perf_counter()
+        log = io.StringIO()
+        result = None
+        converter = slot
+        default_force = self.settings.get('force', False)
+        try:
+            with self.logs.capture() if self.logs else contextlib.nullcontext(log) as log:
+                try:
+                    if key is not None:
+                        converter = self._checkout_variant(key)
+                    converter.force = overrides.get('force', default_force)
+                    if job.get('output'):
+                        Path(job['output']).parent.mkdir(parents=True, exist_ok=True)
+                    result = converter.convert(
+                        job['input'],
+                        job.get('output'),
+                        job.get('title'),
+                        job.get('author'),
+                        job.get('subtitle'),
+                    )
+                except Exception as e:
+                    print(f"❌ 转换失败: {e}")
+                    result = None
+        finally:
+            converter.force = default_force
+            if converter is not slot:
+                self._checkin_variant(key, converter)
+            self.converters.put(slot)
+            with self.lock:
+                self.running -= 1
+                if result:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+        return {
+            'ok': result is not None,
+            'output': result,
+            'seconds': time.perf_counter() - start,
+            'log': log.getvalue(),
+        }
+
+    def health(self):
+        with self.lock:
+            return {
+                'status': 'ok',
+                'pid': os.getpid(),
+                'uptime': time.time() - self.started,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def queue_status(self):
+        with self.lock:
+            return {
+                'waiting': self.waiting,
+                'running': self.running,
+                'max_concurrency': self.jobs,
+                'max_queue': self.max_queue,
+            }
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    server_version = 'md2pdf/2.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.service.health())
+        elif self.path == '/queue':
+            self._send_json(200, self.service.queue_status())
+        else:
+            self._send_json(404, {'error': f'未知路径: {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/convert':
+            self._send_json(404, {'error': f'未知路径: {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {'error': f'请求不是合法的 JSON: {e}'})
+            return
+        if not isinstance(job, dict) or not job.get('input'):
+            self._send_json(400, {'error': '缺少 input 字段'})
+            return
+        settings = job.get('settings') or {}
+        if not isinstance(settings, dict) or set(settings) - REQUEST_SETTINGS:
+            unknown = ', '.join(sorted(set(settings) - REQUEST_SETTINGS)) if isinstance(settings, dict) else settings
+            self._send_json(400, {'error': f'不支持的 settings: {unknown}'})
+            return
+        if not os.path.isfile(job['input']):
+            self._send_json(404, {'error': f"找不到文件: {job['input']}"})
+            return
+
+        try:
+            result = self.service.convert(job)
+        except QueueFull:
+            self._send_json(503, {'error': '排队请求过多，请稍后重试', **self.service.queue_status()})
+            return
+
+        if job.get('return') == 'bytes' and result['ok']:
+            with open(result['output'], 'rb') as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('X-Conversion-Seconds', f"{result['seconds']:.3f}")
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self._send_json(200 if result['ok'] else 500, result)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, max_queue=DEFAULT_MAX_QUEUE, **settings):
+    """启动服务（阻塞，Ctrl+C 退出）"""
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    logs = ThreadLogs(sys.stdout)
+    sys.stdout = logs
+
+    service = ConversionService(jobs, max_queue, logs, **settings)
+    warmup_seconds = service.warm_up()
+
+    httpd = ThreadingHTTPServer((host, port), ConversionHandler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    print(f"🚀 转换服务已启动: http://{host}:{httpd.server_address[1]}")
+    print(f"   并发 {jobs}, 最大排队 {max_queue}, 预热耗时 {warmup_seconds:.2f}s")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+    finally:
+        httpd.server_close()
+        sys.stdout = logs.fallback
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='markdown-to-pdf 常驻转换服务')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址 (默认: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口 (默认: {DEFAULT_PORT})')
+    parser.add_argument('-j', '--jobs', type=int, help='并发转换数 (默认: CPU 核数)')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f'最大排队请求数，超出返回 503 (默认: {DEFAULT_MAX_QUEUE})')
+    parser.add_argument('--no-cache', action='store_true', help='禁用 PDF 缓存')
+    parser.add_argument('--cache-dir', help='缓存目录 (默认: $MD2PDF_CACHE_DIR 或 ~/.cache/markdown-to-pdf)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='缓存容量上限，单位 MB (默认: %(default)s)')
+    parser.add_argument('--split-chapters', action='store_true', help='按章节并行渲染（需要 pypdf）')
+    parser.add_argument('--image-dpi', type=int, help='渲染前缩小超过该 DPI 的图片（需要 Pillow）')
+    parser.add_argument('--backend', help='PDF 渲染后端 (默认: wkhtmltopdf)')
+    parser.add_argument('--optimize', choices=sorted(PDF_PROFILES), help='渲染后压缩 PDF 的档位')
+    args = parser.parse_args()
+
+    return serve(
+        args.host,
+        args.port,
+        args.jobs,
+        args.max_queue,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        split_chapters=args.split_chapters,
+        image_dpi=args.image_dpi,
+        backend=args.backend,
+        optimize=args.optimize,
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,24 +2,194 @@
 """
 更新 Markdown 文件中的图片引用
 根据 filename_mapping.json 批量替换无扩展名的图片引用
+
+每个文件只做一次正则替换，每处引用在映射表中查找:
+- 默认按 Markdown 文件所在目录解析相对路径，只处理指向转换目录（image_dir，默认 ./image）中文件的引用，
+  以相对于该目录的路径查找映射（多根目录转换的映射表以绝对路径为键），只替换文件名部分；
+  指向其他目录的同名文件不受影响，http:、data: 等外部引用不处理
+- 指定 image_prefix 时只处理以该前缀开头的引用，映射的键是前缀之后的完整文本；
+  前缀为空字符串时，映射的键是引用中写的完整路径（如 dedup_images.py 的去重结果）
+- match_tail=True（--match-tail）时不解析路径，按路径末尾的若干段查找映射（最长的优先），
+  如 ../../image/sub/abc 依次查找 ../../image/sub/abc、../image/sub/abc、…、sub/abc、abc；
+  任何目录下的同名引用都会被替换，只在确认不会误改时使用
+
+多个文件或目录可在一次运行中用同一个映射表并行处理，每个文件原子写入。
+
+使用方法:
+  python update_markdown_refs.py notes/netty.md
+  python update_markdown_refs.py notes/ README.md --mapping filename_mapping.json -j 4
+  python update_markdown_refs.py doc.md --image-dir assets
+  python update_markdown_refs.py doc.md --prefix ../../image/
 """
 
+import argparse
+import os
 import re
 import json
-from pathlib import Path
+import shutil
+import tempfile
+import time
+from pathlib import Path, PurePosixPath
+
+DEFAULT_IMAGE_DIR = 'image'
+MARKDOWN_EXTENSIONS = {'.md', '.markdown'}
+
+# <img src="..."> 和 ![alt](...)
+REF_RE = re.compile(r'src="([^"]+)"|!\[[^\]]*\]\(([^)]+)\)')
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*:', re.IGNORECASE)
+
+
+def split_ref(raw):
+    """把引用拆成 (路径, 其余部分)，如 'a.png "标题"' -> ('a.png', ' "标题"')"""
+    raw = raw.strip()
+    if raw.startswith('<') and '>' in raw:
+        end = raw.index('>')
+        return raw[1:end].strip(), raw[end + 1:]
+    parts = raw.split(None, 1)
+    return parts[0], (' ' + parts[1]) if len(parts) > 1 else ''
+
+
+def _lookup_tail(path, mapping):
+    """按路径末尾查找映射，返回 (替换后的路径, 匹配的键)，没有匹配时返回 None"""
+    if path in mapping:
+        return mapping[path], path
+    start = path.find('/')
+    while start != -1:
+        tail = path[start + 1:]
+        if tail in mapping:
+            return path[:start + 1] + mapping[tail], tail
+        start = path.find('/', start + 1)
+    return None
+
+
+def _lookup_resolved(path, mapping, md_dir, image_dir):
+    """按 Markdown 所在目录解析引用，指向 image_dir 中已转换的文件时返回 (替换后的路径, 匹配的键)"""
+    target = os.path.normpath(os.path.join(md_dir, path))
+    try:
+        rel = os.path.relpath(target, image_dir)
+    except ValueError:  # Windows 上位于不同盘符
+        rel = os.pardir
+    if rel != os.pardir and not rel.startswith(os.pardir + os.sep) and Path(rel).as_posix() in mapping:
+        key = Path(rel).as_posix()
+    elif Path(target).as_posix() in mapping:
+        key = Path(target).as_posix()
+    else:
+        return None
+    # 转换只改变文件名（补扩展名或改为 .jpg），目录部分保持引用原样
+    return path[:path.rfind('/') + 1] + PurePosixPath(mapping[key]).name, key
+
 
+def rewrite_refs(content, mapping, image_prefix=None, md_dir='.', image_dir=DEFAULT_IMAGE_DIR,
+                 match_tail=False):
+    """一次替换完成全部引用更新，返回 (新内容, 统计, 更新详情)
 
-def update_markdown_refs(markdown_file, mapping_file='filename_mapping.json'):
-    """更新 Markdown 文件中的图片引用"""
+    image_prefix 为 None 时相对路径按 md_dir 解析，只替换指向 image_dir 中文件的引用；
+    match_tail=True 时改为按路径末尾查找（不区分目录）。
+    """
+    stats = {
+        'total_refs': 0,
+        'updated_refs': 0,
+        'skipped_refs': 0
+    }
+    updates = []
+
+    if image_prefix is None:
+        pattern = REF_RE
+        md_dir = os.path.abspath(md_dir)
+        image_dir = os.path.abspath(image_dir)
+    else:
+        prefix = re.escape(image_prefix)
+        pattern = re.compile(rf'src="{prefix}([^"]+)"|!\[[^\]]*\]\({prefix}([^)]+)\)')
+
+    def replace(match):
+        group = 1 if match.group(1) is not None else 2
+        raw = match.group(group)
+        stats['total_refs'] += 1
+
+        if image_prefix is None:
+            path, rest = split_ref(raw)
+            if SCHEME_RE.match(path):
+                found = None
+            elif match_tail:
+                found = _lookup_tail(path, mapping)
+            else:
+                found = _lookup_resolved(path, mapping, md_dir, image_dir)
+            if found is None:
+                stats['skipped_refs'] += 1
+                return match.group(0)
+            new_path, key = found
+            if raw.lstrip().startswith('<'):
+                new_path = f"<{new_path}>"
+            # 保留原引用开头的空白
+            new_raw = raw[:len(raw) - len(raw.lstrip())] + new_path + rest
+            old, new = key, mapping[key]
+        else:
+            if raw not in mapping:
+                stats['skipped_refs'] += 1
+                return match.group(0)
+            new_raw = mapping[raw]
+            old, new = raw, new_raw
+
+        stats['updated_refs'] += 1
+        updates.append({
+            'type': 'img_tag' if group == 1 else 'markdown',
+            'old': old,
+            'new': new
+        })
+        # 只替换捕获的部分（前缀和 alt 文本保持不变）
+        start, end = match.span(group)
+        offset = match.start()
+        text = match.group(0)
+        return text[:start - offset] + new_raw + text[end - offset:]
+
+    return pattern.sub(replace, content), stats, updates
+
+
+def _atomic_write(path, content):
+    """写入同目录下的临时文件后替换原文件（保留权限），中途失败不会留下半个文件"""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        shutil.copymode(path, tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def _load_mapping(mapping_file, mapping):
+    if mapping is not None:
+        return mapping
 
     # 读取文件名映射表
     if not Path(mapping_file).exists():
         print(f"错误：找不到映射文件 {mapping_file}")
         print("请先运行 batch_convert_images.py 生成映射表")
-        return
+        return None
 
     with open(mapping_file, 'r', encoding='utf-8') as f:
-        filename_mapping = json.load(f)
+        return json.load(f)
+
+
+def update_markdown_refs(markdown_file, mapping_file='filename_mapping.json', mapping=None,
+                         image_prefix=None, report_file='markdown_update_report.json',
+                         image_dir=DEFAULT_IMAGE_DIR, match_tail=False):
+    """更新 Markdown 文件中的图片引用
+
+    mapping: 直接给出的 {旧文件名: 新文件名}，提供时不读取 mapping_file
+    image_prefix: 引用路径中文件名之前的部分；None 表示按 Markdown 所在目录解析相对路径
+    image_dir: 映射表对应的图片目录（image_prefix 为 None 时使用）
+    match_tail: 按路径末尾查找，不检查引用是否指向 image_dir
+    report_file: 更新报告路径，None 表示不写报告
+    返回统计数据（未执行时返回 None）
+    """
+
+    filename_mapping = _load_mapping(mapping_file, mapping)
+    if filename_mapping is None:
+        return
 
     if not filename_mapping:
         print("映射表为空，无需更新")
@@ -34,59 +204,15 @@ def update_markdown_refs(markdown_file, mapping_file='filename_mapping.json'):
     with open(md_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    original_content = content
-
-    # 统计数据
-    stats = {
-        'total_refs': 0,
-        'updated_refs': 0,
-        'skipped_refs': 0
-    }
-
-    # 更新详情
-    updates = []
-
     print("="*60)
     print(f"更新 Markdown 文件：{markdown_file}")
     print("="*60)
     print(f"映射条目数：{len(filename_mapping)}")
 
-    # 匹配图片引用的正则表达式
-    # 匹配 <img src="../../image/filename" ...> 和 ![alt](../../image/filename)
-    patterns = [
-        (r'src="(../../image/([^"]+))"', 'img_tag'),
-        (r'!\[[^\]]*\]\((../../image/([^)]+))\)', 'markdown')
-    ]
-
-    for pattern, ref_type in patterns:
-        matches = list(re.finditer(pattern, content))
-        stats['total_refs'] += len(matches)
-
-        for match in matches:
-            full_path = match.group(1)  # ../../image/filename
-            filename = match.group(2)   # filename
-
-            # 检查是否需要更新
-            if filename in filename_mapping:
-                new_filename = filename_mapping[filename]
-                new_full_path = f"../../image/{new_filename}"
-
-                # 替换
-                old_ref = match.group(0)
-                new_ref = old_ref.replace(full_path, new_full_path)
-
-                content = content.replace(old_ref, new_ref, 1)
-
-                stats['updated_refs'] += 1
-                updates.append({
-                    'type': ref_type,
-                    'old': filename,
-                    'new': new_filename
-                })
-
-                print(f"  ✓ {filename} → {new_filename}")
-            else:
-                stats['skipped_refs'] += 1
+    content, stats, updates = rewrite_refs(content, filename_mapping, image_prefix, md_path.parent,
+                                           image_dir, match_tail)
+    for update in updates:
+        print(f"  ✓ {update['old']} → {update['new']}")
 
     # 生成报告
     print("\n" + "="*60)
@@ -97,28 +223,186 @@ def update_markdown_refs(markdown_file, mapping_file='filename_mapping.json'):
     print(f"跳过：{stats['skipped_refs']}")
 
     # 保存更新后的文件
-    if content != original_content:
-        with open(md_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+    if stats['updated_refs']:
+        _atomic_write(md_path, content)
         print(f"\n✓ Markdown 文件已更新")
 
         # 保存更新报告
+        if report_file:
+            report = {
+                'markdown_file': str(markdown_file),
+                'stats': stats,
+                'updates': updates
+            }
+
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"更新报告已保存到：{report_file}")
+    else:
+        print("\n无需更新（没有匹配的引用）")
+
+    print("="*60)
+
+    return stats
+
+
+def collect_markdown_files(inputs):
+    """把文件和目录展开为 Markdown 文件列表（目录递归，跳过隐藏目录；去重，保持顺序）"""
+    files = []
+    seen = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = []
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                matches.extend(
+                    Path(dirpath) / name for name in sorted(filenames)
+                    if Path(name).suffix.lower() in MARKDOWN_EXTENSIONS
+                )
+        else:
+            matches = [path]
+        for match in matches:
+            key = os.path.abspath(match)
+            if key not in seen:
+                seen.add(key)
+                files.append(str(match))
+    return files
+
+
+# 工作进程中的映射表和匹配选项（通过 initializer 每个进程只传一次）
+_worker_mapping = None
+_worker_options = {}
+
+
+def _init_worker(mapping, options):
+    global _worker_mapping, _worker_options
+    _worker_mapping = mapping
+    _worker_options = options
+
+
+def _update_file(markdown_file):
+    """在工作进程中改写一个文件，返回结果字典"""
+    result = {'file': markdown_file, 'ok': True, 'error': None}
+    try:
+        with open(markdown_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        content, stats, updates = rewrite_refs(content, _worker_mapping, md_dir=Path(markdown_file).parent,
+                                               **_worker_options)
+        if stats['updated_refs']:
+            _atomic_write(markdown_file, content)
+    except (OSError, UnicodeDecodeError) as e:
+        result.update(ok=False, error=str(e))
+        stats, updates = {'total_refs': 0, 'updated_refs': 0, 'skipped_refs': 0}, []
+    result['stats'] = stats
+    result['updates'] = updates
+    return result
+
+
+def update_markdown_files(inputs, mapping_file='filename_mapping.json', mapping=None, image_prefix=None,
+                          workers=None, report_file='markdown_update_report.json',
+                          image_dir=DEFAULT_IMAGE_DIR, match_tail=False):
+    """用同一个映射表更新多个 Markdown 文件（可为目录），通过进程池并行处理
+
+    image_prefix / image_dir / match_tail 的含义同 update_markdown_refs。
+    结果按文件顺序汇总，返回每个文件的结果列表（未执行时返回 None）。
+    """
+    filename_mapping = _load_mapping(mapping_file, mapping)
+    if filename_mapping is None:
+        return
+    if not filename_mapping:
+        print("映射表为空，无需更新")
+        return
+
+    files = collect_markdown_files(inputs)
+    if not files:
+        print("错误：没有找到 Markdown 文件")
+        return
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    print("="*60)
+    print(f"更新 Markdown 引用：{len(files)} 个文件，映射条目 {len(filename_mapping)} 个，并发进程 {workers} 个")
+    print("="*60)
+
+    options = {'image_prefix': image_prefix, 'image_dir': os.path.abspath(image_dir), 'match_tail': match_tail}
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(filename_mapping, options)
+        iterator = map(_update_file, files)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(filename_mapping, options))
+        iterator = pool.map(_update_file, files, chunksize=max(1, len(files) // (workers * 8)))
+
+    results = []
+    try:
+        # map 按提交顺序返回结果
+        for result in iterator:
+            results.append(result)
+            stats = result['stats']
+            if not result['ok']:
+                print(f"  ✗ {result['file']}: {result['error']}")
+            elif stats['updated_refs']:
+                print(f"  ✓ {result['file']}: 更新 {stats['updated_refs']}/{stats['total_refs']} 处引用")
+    finally:
+        if pool:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+
+    totals = {
+        key: sum(r['stats'][key] for r in results)
+        for key in ('total_refs', 'updated_refs', 'skipped_refs')
+    }
+    changed = sum(1 for r in results if r['stats']['updated_refs'])
+    failed = sum(1 for r in results if not r['ok'])
+
+    print("\n" + "="*60)
+    print("更新完成")
+    print("="*60)
+    print(f"文件：{len(files)} 个，已修改 {changed} 个，失败 {failed} 个")
+    print(f"总引用数：{totals['total_refs']}")
+    print(f"已更新：{totals['updated_refs']}")
+    print(f"跳过：{totals['skipped_refs']}")
+    print(f"耗时：{elapsed:.2f}s")
+
+    if report_file and changed:
         report = {
-            'markdown_file': markdown_file,
-            'stats': stats,
-            'updates': updates
+            'stats': {**totals, 'files': len(files), 'changed_files': changed, 'failed_files': failed},
+            'files': [
+                {'markdown_file': r['file'], 'stats': r['stats'], 'updates': r['updates'], 'error': r['error']}
+                for r in results if r['stats']['updated_refs'] or not r['ok']
+            ]
         }
-
-        report_file = 'markdown_update_report.json'
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
         print(f"更新报告已保存到：{report_file}")
-    else:
-        print("\n无需更新（没有匹配的引用）")
 
     print("="*60)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据文件名映射表更新 Markdown 中的图片引用')
+    parser.add_argument('inputs', nargs='+', help='Markdown 文件或目录（目录递归处理）')
+    parser.add_argument('--mapping', default='filename_mapping.json', help='映射表文件 (默认: filename_mapping.json)')
+    parser.add_argument('--image-dir', default=DEFAULT_IMAGE_DIR,
+                        help='映射表对应的图片目录，只改写指向该目录的引用 (默认: %(default)s)')
+    match = parser.add_mutually_exclusive_group()
+    match.add_argument('--prefix', help='只处理以该前缀开头的引用，映射的键是前缀之后的文本')
+    match.add_argument('--match-tail', action='store_true',
+                       help='不解析路径，按路径末尾匹配映射表（任何目录下的同名引用都会被改写）')
+    parser.add_argument('-j', '--workers', type=int, help='并发进程数 (默认: CPU 核数)')
+    parser.add_argument('--report', default='markdown_update_report.json',
+                        help='更新报告文件 (默认: markdown_update_report.json)')
+    args = parser.parse_args()
+
+    results = update_markdown_files(args.inputs, args.mapping, image_prefix=args.prefix,
+                                    workers=args.workers, report_file=args.report,
+                                    image_dir=args.image_dir, match_tail=args.match_tail)
+    return 0 if results is not None and all(r['ok'] for r in results) else 1
 
 
 if __name__ == '__main__':
-    # 更新 netty.md
-    update_markdown_refs('node/网络与通信/netty.md')
+    exit(main())
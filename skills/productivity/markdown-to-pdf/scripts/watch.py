@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+监视模式：Markdown 文件或其引用的图片保存后自动重新生成 PDF
+
+- 轮询 os.stat（mtime_ns 和大小），不依赖第三方文件监听库
+- 防抖：文件在防抖间隔内不再变化才开始重建，编辑器连续保存只触发一次
+- 常驻同一个 Converter：未修改章节的 HTML 直接复用；
+  配合 --split-chapters 时，未修改章节的 PDF 分片也不再渲染
+- 未找到的图片引用同样监视其查找路径（含 .png 回退），补上图片后自动重建
+- 每次重建输出耗时（从检测到保存到 PDF 写完）
+
+使用方法:
+  python convert.py input.md --watch
+  python convert.py input.md --watch --split-chapters
+"""
+
+import os
+import tempfile
+import time
+
+from convert import Converter
+
+DEFAULT_INTERVAL = 0.5   # 轮询间隔（秒）
+DEFAULT_DEBOUNCE = 0.3   # 防抖间隔（秒）
+
+
+def snapshot(paths):
+    """记录文件状态: 路径 -> (mtime_ns, 大小)，文件不存在时为 None"""
+    state = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+
+def wait_until_settled(paths, current, debounce):
+    """等待文件在一个防抖间隔内不再变化，返回稳定后的状态"""
+    while True:
+        time.sleep(debounce)
+        settled = snapshot(paths)
+        if settled == current:
+            return settled
+        current = settled
+
+
+def watched_paths(input_file, converter):
+    """需要监视的路径: Markdown 文件、引用到的图片、未找到的图片引用会查找的路径"""
+    return list(dict.fromkeys([input_file] + converter.last_images + converter.last_missing_images))
+
+
+def _describe(changed):
+    names = [os.path.basename(path) for path in changed[:3]]
+    if len(changed) > 3:
+        names.append(f"等 {len(changed)} 个文件")
+    return ', '.join(names)
+
+
+def watch(input_file, output_file=None, title=None, author=None, subtitle=None,
+          interval=DEFAULT_INTERVAL, debounce=DEFAULT_DEBOUNCE, **settings):
+    """持续监视并重建，Ctrl+C 退出"""
+    converter = Converter(**settings)
+    converter.chapter_cache = {}
+
+    def build():
+        start = time.perf_counter()
+        result = converter.convert(input_file, output_file, title, author, subtitle)
+        return result, time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix='md2pdf-watch-') as tmp:
+        if converter.split_chapters:
+            converter.chapter_pdf_dir = tmp
+
+        _, elapsed = build()
+        print(f"⏱️  首次构建耗时 {elapsed:.2f}s")
+        watched = watched_paths(input_file, converter)
+        state = snapshot(watched)
+        missing = converter.last_missing_images
+        print(f"\n👀 监视中: {input_file} 及 {len(converter.last_images)} 个图片"
+              f"{f'，{len(missing)} 个未找到图片的查找路径' if missing else ''}（Ctrl+C 退出）")
+
+        try:
+            while True:
+                time.sleep(interval)
+                current = snapshot(watched)
+                if current == state:
+                    continue
+
+                detected = time.perf_counter()
+                current = wait_until_settled(watched, current, debounce)
+                changed = [path for path in watched if current[path] != state[path]]
+                state = current
+                if current[input_file] is None:
+                    # 编辑器"先删除再写入"式保存的中间状态
+                    print(f"⚠️  文件不存在，等待重新出现: {input_file}")
+                    continue
+
+                print(f"\n🔄 检测到变化: {_describe(changed)}")
+                result, elapsed = build()
+                latency = time.perf_counter() - detected
+                status = '✅' if result else '❌'
+                print(f"⏱️  {status} 重建耗时 {elapsed:.2f}s（自检测到保存 {latency:.2f}s，含防抖）")
+
+                # 新增的图片引用（及新的未找到路径）加入监视；已在监视中的文件保留重建前的状态，重建期间的保存不会丢失
+                watched = watched_paths(input_file, converter)
+                added = [path for path in watched if path not in state]
+                state = {path: state[path] for path in watched if path in state}
+                state.update(snapshot(added))
+        except KeyboardInterrupt:
+            print("\n👋 已停止监视")
+
+    return 0
@@ -12,24 +12,18 @@ Markdown to PDF 完整工作流脚本
   python workflow.py input.md
   python workflow.py input.md -o output.pdf
   python workflow.py input.md --skip-images  # 跳过图片处理
+  python workflow.py input.md --profile      # 输出各步骤耗时报告和 trace
 """
 
 import argparse
+import contextlib
 import sys
 import os
 from pathlib import Path
 import subprocess
 
-# 导入其他脚本的功能
-try:
-    from analyze_images import analyze_images
-    from batch_convert_images import batch_convert
-    from update_markdown_refs import update_markdown_refs
-    from convert import convert_markdown_to_pdf
-except ImportError:
-    print("❌ 无法导入必要的模块")
-    print("请确保所有脚本都在同一目录下")
-    sys.exit(1)
+# 各步骤的脚本在执行到该步骤时才导入（batch_convert_images 会加载 Pillow，convert 会加载 markdown），
+# --help 和 --skip-images 不必为跳过的步骤付出导入时间
 
 def print_section(title):
     """打印章节标题"""
@@ -37,8 +31,27 @@ def print_section(title):
     print(title)
     print("="*60)
 
-def run_workflow(input_file, output_file=None, skip_images=False, title=None, author=None, subtitle=None):
+def run_workflow(input_file, output_file=None, skip_images=False, title=None, author=None, subtitle=None,
+                 profile=False):
     """运行完整工作流"""
+    if not profile:
+        return _run_workflow(input_file, output_file, skip_images, title, author, subtitle, None)
+
+    from profiling import Profiler
+
+    profiler = Profiler(f"workflow: {Path(input_file).name}")
+    with profiler.stage('workflow'):
+        success = _run_workflow(input_file, output_file, skip_images, title, author, subtitle, profiler)
+    profiler.report()
+    base = Path(output_file or input_file).with_suffix('')
+    report_file, trace_file = profiler.write(f"{base}.workflow")
+    print(f"💾 性能报告: {report_file}")
+    print(f"💾 Trace: {trace_file}")
+    return success
+
+def _run_workflow(input_file, output_file, skip_images, title, author, subtitle, profiler):
+    def stage(name):
+        return profiler.stage(name) if profiler else contextlib.nullcontext()
 
     print_section("Markdown to PDF 完整工作流 v2.0")
     print(f"输入文件: {input_file}")
@@ -62,7 +75,9 @@ def run_workflow(input_file, output_file=None, skip_images=False, title=None, au
             original_dir = os.getcwd()
             os.chdir(md_dir)
 
-            analyze_images(str(image_dir))
+            with stage('analyze_images'):
+                from analyze_images import analyze_images
+                analyze_images(str(image_dir))
 
             # 检查是否有需要转换的图片
             plan_file = md_dir / 'conversion_plan.json'
@@ -78,10 +93,15 @@ def run_workflow(input_file, output_file=None, skip_images=False, title=None, au
 
                 if needs_conversion:
                     print_section("步骤 2/4: 转换 WebP 图片")
-                    batch_convert(str(plan_file), str(image_dir))
+                    with stage('batch_convert_images'):
+                        from batch_convert_images import batch_convert
+                        batch_convert(str(plan_file), str(image_dir))
 
                     print_section("步骤 3/4: 更新 Markdown 引用")
-                    update_markdown_refs(input_file)
+                    with stage('update_markdown_refs'):
+                        from update_markdown_refs import update_markdown_refs
+                        # 当前目录已切换到 Markdown 所在目录，只改写指向 image/ 中已转换文件的引用
+                        update_markdown_refs(Path(input_file).name, image_dir='image')
                 else:
                     print("\n✓ 无需转换图片")
 
@@ -99,13 +119,16 @@ def run_workflow(input_file, output_file=None, skip_images=False, title=None, au
     # 步骤 4: 生成 PDF
     print_section("步骤 4/4: 生成 PDF")
     try:
-        result = convert_markdown_to_pdf(
-            input_file,
-            output_file,
-            title,
-            author,
-            subtitle
-        )
+        from convert import convert_markdown_to_pdf
+        with stage('generate_pdf'):
+            result = convert_markdown_to_pdf(
+                input_file,
+                output_file,
+                title,
+                author,
+                subtitle,
+                profiler=profiler
+            )
 
         if result:
             print_section("✅ 工作流完成")
@@ -157,6 +180,9 @@ def main():
 
   # 自定义标题和作者
   python workflow.py document.md --title "技术白皮书" --author "团队"
+
+  # 性能剖析（各步骤耗时、内存峰值，trace 可在 https://ui.perfetto.dev 打开）
+  python workflow.py document.md --profile
         """
     )
 
@@ -166,6 +192,8 @@ def main():
     parser.add_argument('--title', help='自定义文档标题')
     parser.add_argument('--subtitle', help='自定义副标题')
     parser.add_argument('--author', help='自定义作者')
+    parser.add_argument('--profile', action='store_true',
+                        help='记录各步骤耗时和内存峰值，写出 .workflow.profile.json 和 .workflow.trace.json')
 
     args = parser.parse_args()
 
@@ -175,7 +203,8 @@ def main():
         args.skip_images,
         args.title,
         args.author,
-        args.subtitle
+        args.subtitle,
+        args.profile
     )
 
     sys.exit(0 if success else 1)
@@ -0,0 +1,6 @@
+"""scripts/ 下是扁平的脚本模块，测试时直接加入导入路径"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
@@ -0,0 +1,119 @@
+"""analyze_images.sniff_image: 只读文件头识别格式和尺寸"""
+
+import io
+import os
+import struct
+import zlib
+
+import pytest
+
+from analyze_images import HEADER_BYTES, sniff_image
+
+
+def _png(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = b'IHDR' + ihdr
+    return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', len(ihdr)) + chunk
+            + struct.pack('>I', zlib.crc32(chunk)))
+
+
+def _bmp(width, height):
+    dib = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, 0, 2835, 2835, 0, 0)
+    return b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, 14 + len(dib)) + dib
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_png(tmp_path):
+    assert sniff_image(_write(tmp_path, 'a', _png(640, 480))) == ('png', 640, 480)
+
+
+def test_bmp(tmp_path):
+    assert sniff_image(_write(tmp_path, 'a', _bmp(32, -16))) == ('bmp', 32, 16)
+
+
+@pytest.mark.parametrize('text', [
+    b'BMW service notes\n' * 4,
+    b'BM' + b'\x00' * 12 + struct.pack('<I', 40) + struct.pack('<ii', 10 ** 6, 10),
+])
+def test_text_starting_with_bm_is_not_bmp(tmp_path, text):
+    assert sniff_image(_write(tmp_path, 'notes', text))[0] == 'unknown'
+
+
+def test_svg_root_after_long_prolog(tmp_path):
+    prolog = b'<?xml version="1.0"?>\n<!--' + b' ' * (HEADER_BYTES * 2) + b'-->\n'
+    svg = prolog + b'<svg xmlns="http://www.w3.org/2000/svg" width="120" height="40"></svg>'
+    assert sniff_image(_write(tmp_path, 'a.svg', svg)) == ('svg', 120, 40)
+
+
+def test_jpeg_sof_beyond_header(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200)).save(buffer, 'JPEG')
+    data = buffer.getvalue()
+    # SOI 之后插入一个大的 COM 段，把 SOF 推到文件头之外
+    comment = b'x' * (HEADER_BYTES * 4)
+    data = data[:2] + b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment + data[2:]
+    assert sniff_image(_write(tmp_path, 'a', data)) == ('jpeg', 300, 200)
+
+
+def test_unknown_and_missing(tmp_path):
+    assert sniff_image(_write(tmp_path, 'a', b'hello')) == ('unknown', None, None)
+    assert sniff_image(tmp_path / 'missing')[0].startswith('error: ')
+
+
+def _scan(root, cache_dir):
+    """用 ScanIndex 扫描一遍目录并保存，返回 (索引, 结果)"""
+    from analyze_images import ScanIndex, iter_image_files
+
+    index = ScanIndex(root, cache_dir)
+    results = {rel: index.sniff(rel, path, st) for rel, path, st in iter_image_files(root)}
+    index.save()
+    return index, results
+
+
+def test_scan_index_hits_and_invalidation(tmp_path):
+    root = tmp_path / 'image'
+    root.mkdir()
+    cache_dir = tmp_path / 'cache'
+    _write(root, 'a', _png(10, 20))
+    _write(root, 'b', _png(30, 40))
+
+    index, results = _scan(root, cache_dir)
+    assert (index.hits, index.misses) == (0, 2)
+    assert results == {'a': ('png', 10, 20), 'b': ('png', 30, 40)}
+
+    index, results = _scan(root, cache_dir)
+    assert (index.hits, index.misses) == (2, 0)
+    assert results['b'] == ('png', 30, 40)
+
+    # 内容变化（mtime_ns 不同）和文件被替换（inode 不同）都要重新检测
+    _write(root, 'a', _png(11, 21))
+    os.utime(root / 'a', ns=(1, 1))
+    replacement = _write(tmp_path, 'b.new', _bmp(5, 6))
+    os.replace(replacement, root / 'b')
+    index, results = _scan(root, cache_dir)
+    assert (index.hits, index.misses) == (0, 2)
+    assert results == {'a': ('png', 11, 21), 'b': ('bmp', 5, 6)}
+
+    # 删除的文件移出索引
+    (root / 'b').unlink()
+    index, _ = _scan(root, cache_dir)
+    assert (index.hits, index.misses) == (1, 0)
+    assert set(_scan(root, cache_dir)[0].entries) == {'a'}
+
+
+def test_scan_index_ignores_other_versions(tmp_path, monkeypatch):
+    import analyze_images
+
+    root = tmp_path / 'image'
+    root.mkdir()
+    _write(root, 'a', _png(1, 2))
+    _scan(root, tmp_path / 'cache')
+    monkeypatch.setattr(analyze_images, 'SCAN_INDEX_VERSION', analyze_images.SCAN_INDEX_VERSION + 1)
+    index, _ = _scan(root, tmp_path / 'cache')
+    assert (index.hits, index.misses) == (0, 1)
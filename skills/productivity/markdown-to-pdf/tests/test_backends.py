@@ -0,0 +1,68 @@
+"""backends: WeasyPrint 导入失败时视为不可用，Converter 回退到默认后端"""
+
+import builtins
+import pickle
+import sys
+
+import pytest
+
+import backends
+from backends import DEFAULT_BACKEND, WeasyPrintBackend, available_backends, get_backend
+
+
+@pytest.fixture
+def fresh_module_cache():
+    WeasyPrintBackend._module.cache_clear()
+    yield
+    WeasyPrintBackend._module.cache_clear()
+
+
+def _break_import(monkeypatch, error):
+    """让 import weasyprint 抛出指定异常（OSError 对应缺少 pango 的情况）"""
+    real_import = builtins.__import__
+
+    def fake_import(name, *args, **kwargs):
+        if name == 'weasyprint':
+            print('WeasyPrint could not import some external libraries.')
+            raise error
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.delitem(sys.modules, 'weasyprint', raising=False)
+    monkeypatch.setattr(builtins, '__import__', fake_import)
+
+
+@pytest.mark.parametrize('error', [ImportError('No module named weasyprint'), OSError('libpango not found')])
+def test_import_failure_means_unavailable(monkeypatch, fresh_module_cache, capsys, error):
+    _break_import(monkeypatch, error)
+
+    assert not WeasyPrintBackend.is_available()
+    assert 'weasyprint' not in available_backends()
+    # 导入时打印的安装说明被吞掉
+    assert capsys.readouterr().out == ''
+
+
+def test_converter_falls_back_to_default(monkeypatch, fresh_module_cache, capsys):
+    pytest.importorskip('markdown')
+    from convert import Converter
+
+    _break_import(monkeypatch, OSError('libpango not found'))
+    converter = Converter(use_cache=False, backend='weasyprint')
+
+    assert converter.backend.name == DEFAULT_BACKEND
+    assert converter.backend.options == converter.options
+    out = capsys.readouterr().out
+    assert '渲染后端 weasyprint 不可用' in out
+    assert 'pip3 install weasyprint' in out
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match='未知的渲染后端'):
+        get_backend('prince')
+
+
+def test_weasyprint_backend_pickles_without_stylesheet():
+    backend = get_backend('weasyprint', {'page-size': 'A4'})
+    backend._stylesheet = object()
+    clone = pickle.loads(pickle.dumps(backend))
+    assert clone.options == {'page-size': 'A4'} and clone._stylesheet is None
+    assert backends.BACKENDS[clone.name] is WeasyPrintBackend
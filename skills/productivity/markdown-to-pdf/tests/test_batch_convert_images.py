@@ -0,0 +1,86 @@
+"""batch_convert_images: 进程池转换的输出与串行完全相同"""
+
+import hashlib
+import json
+import random
+import shutil
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from analyze_images import analyze_images  # noqa: E402
+from batch_convert_images import batch_convert  # noqa: E402
+
+
+def _screenshot(path):
+    image = Image.new('RGB', (64, 48), (240, 240, 240))
+    image.paste((30, 120, 200), (8, 8, 56, 20))
+    image.save(path, 'WEBP', lossless=True)
+
+
+def _photo(path, seed):
+    rng = random.Random(seed)
+    image = Image.new('RGB', (64, 48))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64 * 48)])
+    image.save(path, 'WEBP', quality=90)
+
+
+@pytest.fixture
+def library(tmp_path):
+    """无扩展名和错误扩展名的 WebP，以及会与输出文件名冲突的已有文件"""
+    image = tmp_path / 'image'
+    image.mkdir()
+    _screenshot(image / 'shot1')
+    _screenshot(image / 'shot2')
+    _photo(image / 'photo1', 1)
+    _photo(image / 'photo2', 2)
+    _photo(image / 'taken', 3)
+    (image / 'taken.png').write_bytes(b'existing')
+    _photo(image / 'clash', 4)
+    (image / 'clash.jpg').write_bytes(b'existing')
+    _photo(image / 'pic.png', 5)
+    _screenshot(image / 'diagram.jpg')
+    _photo(image / 'busy.png', 6)
+    (image / 'busy.png.temp').write_bytes(b'existing')
+    return tmp_path
+
+
+def _run(library, target, workers, profile, monkeypatch):
+    shutil.copytree(library, target)
+    monkeypatch.chdir(target)
+    analyze_images('image', use_cache=False)
+    result = batch_convert('conversion_plan.json', 'image', workers, profile)
+    files = {
+        path.name: hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in sorted((target / 'image').iterdir())
+    }
+    mapping = json.loads((target / 'filename_mapping.json').read_text(encoding='utf-8'))
+    return result, files, mapping
+
+
+@pytest.mark.parametrize('profile', ['fast', 'small'])
+def test_parallel_matches_serial(library, tmp_path, monkeypatch, profile):
+    serial, serial_files, serial_mapping = _run(library, tmp_path / 'serial', 1, profile, monkeypatch)
+    parallel, parallel_files, parallel_mapping = _run(library, tmp_path / 'parallel', 3, profile, monkeypatch)
+
+    assert list(parallel_mapping.items()) == list(serial_mapping.items())
+    assert parallel_files == serial_files
+    assert parallel['errors'] == serial['errors']
+    assert parallel['stats'] == serial['stats']
+
+
+def test_small_profile_names(library, tmp_path, monkeypatch):
+    result, files, mapping = _run(library, tmp_path / 'run', 2, 'small', monkeypatch)
+
+    assert mapping == {
+        'clash': 'clash.png',         # clash.jpg 已存在，只能保存为 PNG
+        'photo1': 'photo1.jpg',
+        'photo2': 'photo2.jpg',
+        'shot1': 'shot1.png',
+        'shot2': 'shot2.png',
+        'pic.png': 'pic.jpg',
+    }
+    assert result['stats']['skipped'] == 2      # taken.png 和 busy.png.temp 已存在
+    assert 'busy.png' in files and 'taken' in files
+    assert [name for name in files if name.endswith('.temp')] == ['busy.png.temp']
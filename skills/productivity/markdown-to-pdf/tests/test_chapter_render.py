@@ -0,0 +1,111 @@
+"""chapter_render: 跨章节链接改写与合并后的书签"""
+
+import pytest
+
+pytest.importorskip('pypdf')
+
+from pypdf import PdfReader, PdfWriter  # noqa: E402
+from pypdf.annotations import Link  # noqa: E402
+from pypdf.generic import Fit, NullObject  # noqa: E402
+
+from chapter_render import (  # noqa: E402
+    CHAPTER_BREAK,
+    LINK_PREFIX,
+    _rewrite_cross_links,
+    merge_chunks,
+    split_chapters,
+)
+
+DOCUMENT = (
+    '<h1 id="intro">Intro</h1>'
+    '<p><a href="#intro">top</a> <a href="#setup">setup</a> <a href="#note">note</a></p>'
+    + CHAPTER_BREAK +
+    '<h1 id="setup">Setup</h1>'
+    '<h2 id="install">Install &amp; <em>run</em></h2>'
+    '<p id="note"><a href="#install">here</a> <a href="#intro">back</a></p>'
+)
+
+
+def test_split_drops_break_and_empty_chunks():
+    assert split_chapters(CHAPTER_BREAK + DOCUMENT + CHAPTER_BREAK) == DOCUMENT.split(CHAPTER_BREAK)
+
+
+def test_rewrite_only_cross_chapter_links():
+    documents, owner = _rewrite_cross_links(split_chapters(DOCUMENT))
+
+    assert owner == {'intro': 0, 'setup': 1, 'install': 1, 'note': 1}
+    first, second = documents
+    assert 'href="#intro"' in first
+    assert f'href="{LINK_PREFIX}setup"' in first
+    assert f'href="{LINK_PREFIX}note"' in first
+    assert 'href="#install"' in second
+    assert f'href="{LINK_PREFIX}intro"' in second
+
+
+def _chunk(path, pages, bookmarks, links):
+    """模拟渲染器输出：书签 (标题, 页, top, 父书签序号)，链接 (页, 锚点)"""
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(612, 792)
+    items = []
+    for title, page, top, parent in bookmarks:
+        parent = items[parent] if parent is not None else None
+        items.append(writer.add_outline_item(title, page, parent=parent, fit=Fit.xyz(top=top)))
+    for page, anchor in links:
+        writer.add_annotation(page, Link(rect=(50, 50, 150, 70), url=LINK_PREFIX + anchor))
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return str(path)
+
+
+def _outline(reader, items, depth=0):
+    result = []
+    for item in items:
+        if isinstance(item, list):
+            result.extend(_outline(reader, item, depth + 1))
+        else:
+            result.append((depth, item.title, reader.get_destination_page_number(item), float(item.top)))
+    return result
+
+
+def test_merge_rebuilds_outline_and_fixes_links(tmp_path):
+    documents, owner = _rewrite_cross_links(split_chapters(DOCUMENT))
+    paths = [
+        _chunk(tmp_path / 'a.pdf', 1, [('Intro', 0, 700, None)], [(0, 'setup'), (0, 'note')]),
+        _chunk(tmp_path / 'b.pdf', 2, [('Setup', 0, 780, None), ('Install & run', 1, 500, 0)], [(1, 'intro')]),
+    ]
+    output = tmp_path / 'merged.pdf'
+
+    assert merge_chunks(paths, documents, owner, str(output)) == 3
+
+    reader = PdfReader(output)
+    assert len(reader.pages) == 3
+    assert _outline(reader, reader.outline) == [
+        (0, 'Intro', 0, 700.0),
+        (0, 'Setup', 1, 780.0),
+        (1, 'Install & run', 2, 500.0),
+    ]
+
+    targets = {}
+    for number, page in enumerate(reader.pages):
+        for annot in page.get('/Annots', []):
+            action = annot.get_object()['/A']
+            assert action['/S'] == '/GoTo'
+            destination = action['/D']
+            top = destination[3]
+            targets.setdefault(number, []).append(
+                (reader.get_page_number(destination[0].get_object()), None if isinstance(top, NullObject) else float(top)))
+    # setup 指向标题位置；note 不是标题，跳到所在分片第一页
+    assert targets == {0: [(1, 780.0), (1, None)], 2: [(0, 700.0)]}
+
+
+def test_merge_without_outline_still_fixes_links(tmp_path):
+    documents, owner = _rewrite_cross_links(split_chapters(DOCUMENT))
+    paths = [
+        _chunk(tmp_path / 'a.pdf', 1, [('Intro', 0, 700, None)], [(0, 'setup')]),
+        _chunk(tmp_path / 'b.pdf', 1, [('Setup', 0, 780, None)], []),
+    ]
+    output = tmp_path / 'merged.pdf'
+
+    assert merge_chunks(paths, documents, owner, str(output), outline=False) == 1
+    assert PdfReader(output).outline == []
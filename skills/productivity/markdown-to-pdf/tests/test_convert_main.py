@@ -0,0 +1,21 @@
+"""convert.main: 单文件模式的退出码与批量模式一致"""
+
+import sys
+
+import convert
+
+
+def _main(monkeypatch, tmp_path, result):
+    source = tmp_path / 'doc.md'
+    source.write_text('# Doc\n', encoding='utf-8')
+    monkeypatch.setattr(convert, 'convert_markdown_to_pdf', lambda *args, **kwargs: result)
+    monkeypatch.setattr(sys, 'argv', ['convert.py', str(source), '--no-cache'])
+    return convert.main()
+
+
+def test_single_file_failure_exits_1(monkeypatch, tmp_path):
+    assert _main(monkeypatch, tmp_path, None) == 1
+
+
+def test_single_file_success_exits_0(monkeypatch, tmp_path):
+    assert _main(monkeypatch, tmp_path, str(tmp_path / 'doc.pdf')) == 0
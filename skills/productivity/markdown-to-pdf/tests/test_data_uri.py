@@ -0,0 +1,58 @@
+"""data_uri.DataUriStage: 只提取图片地址中的 data URI"""
+
+import base64
+
+import pytest
+
+from data_uri import DataUriStage
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(48))
+PAYLOAD = base64.b64encode(PNG).decode('ascii')
+
+
+@pytest.fixture
+def stage(tmp_path):
+    return DataUriStage(cache_dir=tmp_path)
+
+
+def _paths(stage):
+    return set(stage._done.values())
+
+
+def test_markdown_and_html_images(stage):
+    content = (f'![图](data:image/png;base64,{PAYLOAD} "标题")\n'
+               f"<img alt='x' src='data:image/png;base64,{PAYLOAD}' width=\"20\">\n")
+    result = stage.extract(content)
+    (path,) = _paths(stage)
+    assert result == f'![图]({path} "标题")\n<img alt=\'x\' src=\'{path}\' width="20">\n'
+    assert open(path, 'rb').read() == PNG
+    assert stage.stats['images'] == 2 and stage.stats['decoded'] == 1
+
+
+def test_wrapped_payload_and_media_type_parameters(stage):
+    wrapped = '\n    '.join(PAYLOAD[i:i + 16] for i in range(0, len(PAYLOAD), 16))
+    content = f'![a](data:image/png;charset=utf-8;name=a.png;base64,{wrapped})\n'
+    result = stage.extract(content)
+    (path,) = _paths(stage)
+    assert result == f'![a]({path})\n'
+
+
+def test_code_is_left_alone(stage):
+    uri = f'data:image/png;base64,{PAYLOAD}'
+    code = (f'```python\nx = "{uri}"\nimg = "![a]({uri})"\n```\n\n'
+            f'行内 `![a]({uri})` 代码\n\n'
+            f'~~~~\n![a]({uri})\n~~~\n~~~~\n')
+    result = stage.extract(code + f'![a]({uri})\n')
+    (path,) = _paths(stage)
+    assert result == code + f'![a]({path})\n'
+
+
+def test_uris_outside_image_destinations_are_kept(stage):
+    content = f'链接 [x](data:image/png;base64,{PAYLOAD}) 和正文 data:image/png;base64,{PAYLOAD}\n'
+    assert stage.extract(content) == content
+    assert stage.stats['images'] == 0
+
+
+def test_invalid_payload_is_kept(stage):
+    content = '![a](data:image/png;base64,abc)\n'
+    assert stage.extract(content) == content
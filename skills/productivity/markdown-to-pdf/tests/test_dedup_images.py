@@ -0,0 +1,60 @@
+"""dedup_images --apply（rewrite 模式）: 只删除引用已全部改写的副本"""
+
+import os
+
+from dedup_images import dedup_images
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+def _notes(tmp_path, note):
+    image = tmp_path / 'image'
+    image.mkdir()
+    (image / 'a.png').write_bytes(PNG)
+    (image / 'b.png').write_bytes(PNG)
+    (tmp_path / 'note.md').write_text(note, encoding='utf-8')
+    return image
+
+
+def test_rewrites_references_and_deletes_duplicate(tmp_path):
+    # a.png 引用更多，作为规范文件
+    image = _notes(tmp_path, '![a](image/a.png)\n![a](image/a.png)\n![b](image/b.png)\n<img src="image/b.png">\n')
+    report = dedup_images([str(tmp_path)], apply=True, report_file=None)
+
+    assert report['groups'][0]['canonical'] == str(image / 'a.png')
+    assert report['stats']['updated_refs'] == 2
+    assert report['stats']['deleted'] == 1 and report['stats']['failed'] == 0
+    assert not (image / 'b.png').exists()
+    assert (tmp_path / 'note.md').read_text(encoding='utf-8') == (
+        '![a](image/a.png)\n![a](image/a.png)\n![b](image/a.png)\n<img src="image/a.png">\n'
+    )
+
+
+def test_keeps_duplicate_with_unrewritable_references(tmp_path):
+    note = "![a](image/a.png)\n![a](image/a.png)\n<img src='image/b.png'>\n\n[r]: image/b.png\n"
+    image = _notes(tmp_path, note)
+    report = dedup_images([str(tmp_path)], apply=True, report_file=None)
+
+    assert (image / 'b.png').exists()
+    assert report['stats']['deleted'] == 0 and report['stats']['failed'] == 1
+    assert report['errors'][0]['file'] == str(image / 'b.png')
+    assert (tmp_path / 'note.md').read_text(encoding='utf-8') == note
+
+
+def test_keeps_duplicate_named_in_undecodable_markdown(tmp_path):
+    image = _notes(tmp_path, '![a](image/a.png)\n')
+    (tmp_path / 'legacy.md').write_bytes('![b](image/b.png) '.encode('utf-8') + b'\xff\xfe')
+    report = dedup_images([str(tmp_path)], apply=True, report_file=None)
+
+    assert (image / 'b.png').exists()
+    assert report['stats']['failed'] == 1
+
+
+def test_broken_symlink_is_skipped(tmp_path):
+    image = _notes(tmp_path, '![b](image/b.png)\n')
+    os.symlink(tmp_path / 'missing.png', image / 'broken.png')
+    report = dedup_images([str(tmp_path)], report_file=None)
+
+    assert report['stats']['skipped'] == 1
+    assert report['stats']['duplicate_files'] == 1
+    assert not report['applied'] and (image / 'b.png').exists()
@@ -0,0 +1,45 @@
+"""disk_cache.DiskCache: 按访问时间淘汰到容量上限以内"""
+
+import os
+
+from disk_cache import DiskCache
+
+
+def _put(cache, key, size, mtime):
+    path = cache.put_bytes(key, b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_evict_oldest_first(tmp_path):
+    cache = DiskCache('pdf', max_bytes=250, root=tmp_path)
+    old = _put(cache, 'aa01', 100, 1000)
+    middle = _put(cache, 'bb02', 100, 2000)
+    new = _put(cache, 'cc03', 100, 3000)
+
+    assert cache.evict() == 100
+    assert not old.exists()
+    assert middle.exists() and new.exists()
+
+
+def test_get_refreshes_access_time(tmp_path):
+    cache = DiskCache('pdf', max_bytes=250, root=tmp_path)
+    old = _put(cache, 'aa01', 100, 1000)
+    middle = _put(cache, 'bb02', 100, 2000)
+    _put(cache, 'cc03', 100, 3000)
+
+    assert cache.get('aa01') == old
+    cache.evict()
+    assert old.exists()
+    assert not middle.exists()
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_evict_within_limit_and_ignores_temp_files(tmp_path):
+    cache = DiskCache('pdf', max_bytes=250, root=tmp_path)
+    path = _put(cache, 'aa01', 200, 1000)
+    (path.parent / 'partial.tmp').write_bytes(b'x' * 1000)
+
+    assert cache.evict() == 0
+    assert path.exists()
+    assert DiskCache('missing', root=tmp_path).evict() == 0
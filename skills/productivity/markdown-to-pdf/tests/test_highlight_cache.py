@@ -0,0 +1,76 @@
+"""highlight_cache: 输出与 codehilite 一致，跨实例命中磁盘缓存"""
+
+import pytest
+
+markdown = pytest.importorskip('markdown')
+pytest.importorskip('pygments')
+
+from highlight_cache import HighlightCache, HighlightCacheExtension  # noqa: E402
+
+EXTENSIONS = ['extra', 'codehilite', 'toc', 'fenced_code']
+
+DOCUMENT = '''# Code
+
+```python
+def add(a, b):
+    return a + b
+```
+
+~~~ {.shell #install}
+pip3 install markdown
+~~~
+
+```python hl_lines="2"
+x = 1
+y = 2
+```
+
+```
+plain text without a language
+```
+'''
+
+
+def _convert(text, cache=None):
+    extensions = list(EXTENSIONS)
+    if cache is not None:
+        extensions.insert(0, HighlightCacheExtension(cache))
+    return markdown.Markdown(extensions=extensions).convert(text)
+
+
+def test_output_matches_codehilite(tmp_path):
+    cache = HighlightCache(tmp_path)
+    assert _convert(DOCUMENT, cache) == _convert(DOCUMENT)
+    # {attrs} 代码块交给 fenced_code，不经过缓存
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_hits_memory_then_disk(tmp_path):
+    first = HighlightCache(tmp_path)
+    expected = _convert(DOCUMENT, first)
+    assert _convert(DOCUMENT, first) == expected
+    assert (first.hits, first.misses) == (3, 3)
+
+    # 新进程（新的缓存对象）从磁盘读取
+    second = HighlightCache(tmp_path)
+    assert _convert(DOCUMENT, second) == expected
+    assert (second.hits, second.misses) == (3, 0)
+
+
+def test_key_includes_language_and_hl_lines(tmp_path):
+    cache = HighlightCache(tmp_path)
+    _convert('```python\nx = 1\n```\n', cache)
+    _convert('```ruby\nx = 1\n```\n', cache)
+    _convert('```python hl_lines="1"\nx = 1\n```\n', cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_evict_only_after_writes(tmp_path):
+    cache = HighlightCache(tmp_path, max_bytes=0)
+    assert cache.evict() == 0
+    _convert('```python\nx = 1\n```\n', cache)
+    assert cache.evict() > 0
+    assert cache.evict() == 0
+    # 内存中的结果不受磁盘清理影响
+    _convert('```python\nx = 1\n```\n', cache)
+    assert cache.hits == 1
@@ -0,0 +1,88 @@
+"""image_derivatives: 衍生件尺寸与「使用原图」标记"""
+
+import random
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+import image_derivatives  # noqa: E402
+from image_derivatives import ORIGINAL_MARKER, DerivativeStage, target_size  # noqa: E402
+
+DPI = 30   # 正文区域约 213x315 像素，测试图片可以很小
+
+
+def _noise(path, size, fmt):
+    rng = random.Random(size[0])
+    img = Image.new('RGB', size)
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                 for _ in range(size[0] * size[1])])
+    img.save(path, fmt)
+    return path
+
+
+def _stage(tmp_path):
+    return DerivativeStage(dpi=DPI, cache_dir=tmp_path / 'cache')
+
+
+def test_target_size_follows_dpi():
+    assert target_size(DPI) == (213, 315)
+    assert target_size(150) == (1063, 1577)
+
+
+def test_small_image_is_used_as_is(tmp_path):
+    path = _noise(tmp_path / 'small.bmp', (100, 80), 'BMP')
+    stage = _stage(tmp_path)
+
+    assert stage.derive(path) == str(path)
+    assert stage.stats['resized'] == 0 and stage.stats['kept_original'] == 0
+
+
+def test_large_photo_is_resized_into_content_area(tmp_path):
+    path = _noise(tmp_path / 'photo.bmp', (640, 480), 'BMP')
+    stage = _stage(tmp_path)
+
+    derived = stage.derive(path)
+
+    assert derived.endswith('.jpg')
+    with Image.open(derived) as img:
+        assert img.size == (213, 160)
+    assert stage.stats['resized'] == 1
+    assert stage.stats['bytes_after'] < stage.stats['bytes_before']
+
+    # 新的阶段实例（下一次转换）直接命中磁盘缓存
+    again = _stage(tmp_path)
+    assert again.derive(path) == derived
+    assert again.stats['resized'] == 1
+
+
+def test_large_screenshot_stays_png(tmp_path):
+    path = tmp_path / 'shot.bmp'
+    img = Image.new('RGB', (300, 900), (250, 250, 250))
+    img.paste((20, 90, 180), (0, 0, 300, 100))
+    img.save(path, 'BMP')
+
+    derived = _stage(tmp_path).derive(path)
+
+    assert derived.endswith('.png')
+    with Image.open(derived) as out:
+        assert out.size == (105, 315)
+
+
+def test_animation_is_marked_and_not_decoded_again(tmp_path, monkeypatch):
+    path = tmp_path / 'anim.gif'
+    frames = [Image.new('RGB', (400, 400), color) for color in ((255, 0, 0), (0, 0, 255))]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    stage = _stage(tmp_path)
+
+    assert stage.derive(path) == str(path)
+    assert stage.stats['kept_original'] == 1
+    assert list((tmp_path / 'cache' / 'derivatives').rglob('*' + ORIGINAL_MARKER))
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('标记存在时不应再解码图片')
+
+    monkeypatch.setattr(image_derivatives.Image, 'open', refuse)
+    again = _stage(tmp_path)
+    assert again.derive(path) == str(path)
+    assert again.stats['kept_original'] == 1 and again.stats['resized'] == 0
@@ -0,0 +1,78 @@
+"""batch_convert_images: 编码档位的输出格式"""
+
+import random
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from batch_convert_images import IMAGE_PROFILES, convert_image  # noqa: E402
+
+
+def _webp(path, kind):
+    rng = random.Random(7)
+    if kind == 'screenshot':
+        img = Image.new('RGB', (120, 90), (245, 245, 245))
+        for y in range(0, 90, 6):
+            img.paste((40, 40, 40), (10, y, 110, y + 2))
+    else:
+        mode = 'RGBA' if kind == 'transparent-photo' else 'RGB'
+        img = Image.new(mode, (120, 90))
+        channels = len(mode)
+        img.putdata([tuple(rng.randrange(256) for _ in range(channels)) for _ in range(120 * 90)])
+    img.save(path, 'WEBP', lossless=True)
+    return path
+
+
+def _format(path):
+    with Image.open(path) as img:
+        return img.format
+
+
+@pytest.mark.parametrize('kind, expected', [
+    ('screenshot', 'PNG'),
+    ('photo', 'JPEG'),
+    ('transparent-photo', 'PNG'),
+])
+def test_small_profile_picks_format_by_content(tmp_path, kind, expected):
+    source = _webp(tmp_path / 'source', kind)
+
+    ok, error, output = convert_image(source, tmp_path / 'out.png', 'small')
+
+    assert ok, error
+    assert output.name == ('out.jpg' if expected == 'JPEG' else 'out.png')
+    assert _format(output) == expected
+
+
+def test_small_profile_respects_jpeg_path_and_opt_out(tmp_path):
+    source = _webp(tmp_path / 'source', 'photo')
+
+    _, _, output = convert_image(source, tmp_path / 'a.png', 'small', jpeg_path=tmp_path / 'a.jpg.temp')
+    assert output == tmp_path / 'a.jpg.temp' and _format(output) == 'JPEG'
+
+    _, _, output = convert_image(source, tmp_path / 'b.png', 'small', allow_jpeg=False)
+    assert output == tmp_path / 'b.png' and _format(output) == 'PNG'
+
+
+@pytest.mark.parametrize('profile', ['fast', 'balanced'])
+def test_png_profiles_never_write_jpeg(tmp_path, profile):
+    assert not IMAGE_PROFILES[profile]['photo_jpeg']
+    source = _webp(tmp_path / 'source', 'photo')
+    ok, _, output = convert_image(source, tmp_path / 'out.png', profile)
+    assert ok and output == tmp_path / 'out.png' and _format(output) == 'PNG'
+
+
+def test_fast_trades_size_for_speed(tmp_path):
+    source = _webp(tmp_path / 'source', 'screenshot')
+    sizes = {}
+    for profile in ('fast', 'balanced'):
+        _, _, output = convert_image(source, tmp_path / f'{profile}.png', profile)
+        sizes[profile] = output.stat().st_size
+    assert sizes['fast'] > sizes['balanced']
+
+
+def test_unreadable_source_reports_error(tmp_path):
+    source = tmp_path / 'broken'
+    source.write_bytes(b'RIFF\0\0\0\0WEBPnot really')
+    ok, error, output = convert_image(source, tmp_path / 'out.png', 'small')
+    assert not ok and error and output is None
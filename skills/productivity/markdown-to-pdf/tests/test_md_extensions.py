@@ -0,0 +1,54 @@
+"""md_extensions: 按章节拆分 Markdown 源文本（--low-memory 按章节转换）"""
+
+from md_extensions import iter_markdown_chapters, split_markdown_chapters
+
+DOC = """# 标题
+
+前言
+
+## 1. 第一章
+
+```markdown
+## 代码块里的标题不拆分
+```
+
+## 2. 第二章
+正文
+"""
+
+
+def test_iter_markdown_chapters():
+    chunks = list(iter_markdown_chapters(DOC))
+    assert ''.join(chunks) == DOC
+    assert chunks[0] == '# 标题\n\n前言\n\n'
+    assert [chunk.splitlines()[0] for chunk in chunks[1:]] == ['## 1. 第一章', '## 2. 第二章']
+
+
+def test_longer_fence_is_not_closed_by_shorter_one():
+    doc = '````\n```\n## 不拆分\n````\n## 章节\n'
+    assert list(iter_markdown_chapters(doc)) == ['````\n```\n## 不拆分\n````\n', '## 章节\n']
+
+
+def test_document_without_h2():
+    assert list(iter_markdown_chapters('正文\n')) == ['正文\n']
+    assert list(iter_markdown_chapters('')) == ['']
+
+
+def test_cross_references_are_not_split():
+    assert split_markdown_chapters(DOC + '\n[^1]: 脚注\n') is None
+
+
+def test_chapter_wise_html_matches_whole_document(tmp_path):
+    import io
+    import re
+
+    from convert import Converter
+
+    md_file = tmp_path / 'doc.md'
+    md_file.write_text(DOC, encoding='utf-8')
+    converter = Converter(use_cache=False)
+    html, toc = converter.render_html(DOC, md_file)
+    out = io.StringIO()
+    assert converter.render_html_to(DOC, md_file, out) == toc
+    # 块元素之间的空行可能不同
+    assert re.sub(r'\n+', '\n', out.getvalue()) == re.sub(r'\n+', '\n', html)
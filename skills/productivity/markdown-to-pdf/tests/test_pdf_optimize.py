@@ -0,0 +1,37 @@
+"""pdf_optimize: 线性化为可选步骤，跳过时不算失败"""
+
+import sys
+
+import pytest
+
+pypdf = pytest.importorskip('pypdf')
+
+import pdf_optimize  # noqa: E402
+
+
+@pytest.fixture
+def blank_pdf(tmp_path):
+    writer = pypdf.PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=595, height=842)
+    path = tmp_path / 'blank.pdf'
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return path
+
+
+def test_linearize_is_opt_in(blank_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_optimize, '_pikepdf', lambda: pytest.fail('默认不应线性化'))
+    stats = pdf_optimize.optimize_pdf(str(blank_pdf), profile='lossless')
+    assert stats['linearized'] is False and stats['linearize_skipped'] is None
+    assert len(pypdf.PdfReader(blank_pdf).pages) == 3
+
+
+def test_skipped_linearization_exits_zero(blank_pdf, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(pdf_optimize, '_pikepdf', lambda: None)
+    output = tmp_path / 'out.pdf'
+    monkeypatch.setattr(sys, 'argv', ['pdf_optimize.py', str(blank_pdf), '-o', str(output), '--linearize'])
+    assert pdf_optimize.main() == 0
+    assert output.exists()
+    assert '未线性化' in capsys.readouterr().out
+    assert not list(tmp_path.glob('*.optimizing.pdf'))
@@ -0,0 +1,72 @@
+"""profiling: 报告和 trace 文件的结构"""
+
+import json
+import tracemalloc
+
+from profiling import Profiler
+
+STAGE_KEYS = {'name', 'depth', 'start', 'seconds', 'peak_memory_bytes', 'child_cpu_seconds', 'args'}
+
+
+def _profile():
+    profiler = Profiler('doc.md')
+    with profiler.stage('convert', file='doc.md'):
+        with profiler.stage('markdown'):
+            data = [bytes(1024) for _ in range(256)]
+        del data
+        with profiler.stage('render'):
+            pass
+    profiler.set('pdf_bytes', 1234)
+    return profiler
+
+
+def test_report_keys_and_nesting():
+    profiler = _profile()
+    report = profiler.to_dict()
+    profiler.finish()
+
+    assert set(report) == {'name', 'total_seconds', 'peak_memory_bytes', 'metrics', 'stages'}
+    assert report['metrics'] == {'pdf_bytes': 1234}
+    # 按开始时间排序，外层阶段在前
+    assert [(s['name'], s['depth']) for s in report['stages']] == [('convert', 0), ('markdown', 1), ('render', 1)]
+    for stage in report['stages']:
+        assert set(stage) == STAGE_KEYS
+    convert, markdown, render = report['stages']
+    assert convert['args'] == {'file': 'doc.md'}
+    assert markdown['peak_memory_bytes'] >= 256 * 1024
+    # 子阶段的峰值计入外层阶段
+    assert convert['peak_memory_bytes'] >= markdown['peak_memory_bytes']
+    assert report['peak_memory_bytes'] == convert['peak_memory_bytes']
+
+
+def test_write_report_and_trace(tmp_path):
+    report_file, trace_file = _profile().write(tmp_path / 'doc')
+
+    assert report_file == str(tmp_path / 'doc.profile.json')
+    assert trace_file == str(tmp_path / 'doc.trace.json')
+    with open(report_file, encoding='utf-8') as f:
+        assert [s['name'] for s in json.load(f)['stages']] == ['convert', 'markdown', 'render']
+
+    with open(trace_file, encoding='utf-8') as f:
+        trace = json.load(f)
+    assert set(trace) == {'traceEvents', 'displayTimeUnit', 'otherData'}
+    assert trace['otherData'] == {'pdf_bytes': 1234}
+    meta, *events = trace['traceEvents']
+    assert meta['ph'] == 'M' and meta['args'] == {'name': 'doc.md'}
+    assert [e['name'] for e in events] == ['convert', 'markdown', 'render']
+    for event in events:
+        assert event['ph'] == 'X' and event['cat'] == 'stage'
+        assert {'ts', 'dur', 'pid', 'tid'} <= set(event)
+        assert {'peak_memory_bytes', 'child_cpu_seconds'} <= set(event['args'])
+    assert events[0]['args']['file'] == 'doc.md'
+    assert not tracemalloc.is_tracing()
+
+
+def test_leaves_callers_tracemalloc_running():
+    tracemalloc.start()
+    try:
+        profiler = _profile()
+        profiler.finish()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,153 @@
+"""server: 排队已满时返回 503，请求设置按变体复用 Converter
+
+Converter 换成只记录参数的替身，测试只关心服务本身的调度。
+"""
+
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('markdown')
+
+import server  # noqa: E402
+
+
+class RecordingConverter:
+    instances = []
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.force = settings.get('force', False)
+        self.calls = []
+        RecordingConverter.instances.append(self)
+
+    def convert(self, input_file, output_file=None, title=None, author=None, subtitle=None):
+        self.calls.append((input_file, self.force))
+        print(f"converted {input_file}")
+        output_file = output_file or input_file + '.pdf'
+        with open(output_file, 'wb') as f:
+            f.write(b'%PDF-1.4 fake')
+        return output_file
+
+
+@pytest.fixture
+def start(monkeypatch):
+    RecordingConverter.instances = []
+    monkeypatch.setattr(server, 'Converter', RecordingConverter)
+    servers = []
+
+    def start(jobs=1, max_queue=4, **settings):
+        # 与 serve() 相同：print 经过 ThreadLogs，每个请求的输出单独捕获
+        # （在测试函数内替换：pytest 在各阶段之间会重设 sys.stdout）
+        logs = server.ThreadLogs(sys.stdout)
+        monkeypatch.setattr(sys, 'stdout', logs)
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), server.ConversionHandler)
+        httpd.service = server.ConversionService(jobs, max_queue, logs, **settings)
+        threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_address[1]}", httpd.service
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url + '/convert', json.dumps(payload).encode('utf-8'),
+                                     {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+@pytest.fixture
+def doc(tmp_path):
+    path = tmp_path / 'doc.md'
+    path.write_text('# Doc\n', encoding='utf-8')
+    return str(path)
+
+
+def test_queue_full_returns_503(start, doc):
+    url, service = start(max_queue=0)
+
+    status, body = _post(url, {'input': doc})
+
+    assert status == 503
+    payload = json.loads(body)
+    assert payload['max_queue'] == 0 and payload['waiting'] == 0
+    assert service.completed == service.failed == 0
+    assert RecordingConverter.instances[0].calls == []
+
+
+def test_waiting_requests_count_against_max_queue(start, doc):
+    """一个请求在运行、一个在排队时，第三个请求被拒绝"""
+    url, service = start(jobs=1, max_queue=1)
+    release = threading.Event()
+    entered = threading.Event()
+    slot = RecordingConverter.instances[0]
+
+    def blocking_convert(input_file, *args):
+        entered.set()
+        release.wait(5)
+        return input_file + '.pdf'
+
+    slot.convert = blocking_convert
+    threads = [threading.Thread(target=_post, args=(url, {'input': doc})) for _ in range(2)]
+    threads[0].start()
+    assert entered.wait(5)
+    threads[1].start()
+    for _ in range(500):
+        if service.queue_status()['waiting'] == 1:
+            break
+        time.sleep(0.01)
+
+    status, _ = _post(url, {'input': doc})
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert status == 503
+    assert service.completed == 2
+
+
+def test_settings_variants_are_grouped_and_reused(start, doc):
+    url, service = start(jobs=1, use_cache=False)
+    slot = RecordingConverter.instances[0]
+
+    # 与服务端设置相同：使用预热的实例；force 只作用于单次调用
+    assert _post(url, {'input': doc, 'settings': {'use_cache': False, 'force': True}})[0] == 200
+    assert slot.calls == [(doc, True)] and slot.force is False
+
+    status, body = _post(url, {'input': doc, 'settings': {'draft': True}})
+    assert status == 200
+    result = json.loads(body)
+    assert result['ok'] and f"converted {doc}" in result['log']
+    assert _post(url, {'input': doc, 'settings': {'draft': True}})[0] == 200
+
+    variants = RecordingConverter.instances[1:]
+    assert len(variants) == 1
+    assert variants[0].settings == {'use_cache': False, 'draft': True}
+    assert len(variants[0].calls) == 2
+    assert list(service.variants) == [(('draft', True), ('use_cache', False))]
+
+
+def test_unknown_settings_rejected(start, doc):
+    url, _ = start()
+    status, body = _post(url, {'input': doc, 'settings': {'cache_dir': '/tmp'}})
+    assert status == 400
+    assert 'cache_dir' in json.loads(body)['error']
+
+
+def test_return_bytes(start, doc):
+    url, _ = start()
+    status, body = _post(url, {'input': doc, 'return': 'bytes'})
+    assert status == 200 and body == b'%PDF-1.4 fake'
@@ -0,0 +1,54 @@
+"""md_extensions.SplitBlocksPreprocessor: 超长表格和代码块按阈值拆分"""
+
+import markdown
+
+from md_extensions import SplitBlocksPreprocessor
+
+
+def _run(lines, max_table_rows=0, max_code_lines=0):
+    processor = SplitBlocksPreprocessor(markdown.Markdown(), max_table_rows, max_code_lines)
+    return processor.run(lines), processor
+
+
+def test_table_repeats_header():
+    rows = [f'| {i} | x |' for i in range(5)]
+    result, processor = _run(['| a | b |', '|---|---|', *rows, '', '后文'], max_table_rows=2)
+    assert result == [
+        '| a | b |', '|---|---|', rows[0], rows[1], '',
+        '| a | b |', '|---|---|', rows[2], rows[3], '',
+        '| a | b |', '|---|---|', rows[4],
+        '', '后文',
+    ]
+    assert processor.tables_split == 1
+
+
+def test_short_table_unchanged():
+    lines = ['| a |', '|---|', '| 1 |']
+    assert _run(lines, max_table_rows=2)[0] == lines
+
+
+def test_code_block_split():
+    body = [f'line {i}' for i in range(5)]
+    result, processor = _run(['```python', *body, '```'], max_code_lines=3)
+    assert result == ['```python', *body[:3], '```', '', '```python', *body[3:], '```']
+    assert processor.code_blocks_split == 1
+
+
+def test_code_block_with_attributes_unchanged():
+    lines = ['```python hl_lines="1"', *['x'] * 5, '```']
+    assert _run(lines, max_code_lines=2)[0] == lines
+
+
+def test_table_inside_code_block_unchanged():
+    lines = ['~~~', '| a |', '|---|', '| 1 |', '| 2 |', '| 3 |', '~~~']
+    assert _run(lines, max_table_rows=1)[0] == lines
+
+
+def test_unclosed_fence_unchanged():
+    lines = ['```', *['x'] * 5]
+    assert _run(lines, max_code_lines=2)[0] == lines
+
+
+def test_zero_thresholds_disable_splitting():
+    lines = ['| a |', '|---|', *['| 1 |'] * 5]
+    assert _run(lines)[0] == lines
@@ -0,0 +1,53 @@
+"""update_markdown_refs.rewrite_refs: 按解析后的路径或路径末尾改写图片引用"""
+
+from update_markdown_refs import _lookup_tail, rewrite_refs
+
+
+def test_lookup_tail():
+    mapping = {'abc': 'abc.png', 'sub/def': 'sub/def.png'}
+    assert _lookup_tail('abc', mapping) == ('abc.png', 'abc')
+    assert _lookup_tail('../../image/abc', mapping) == ('../../image/abc.png', 'abc')
+    assert _lookup_tail('x/sub/def', mapping) == ('x/sub/def.png', 'sub/def')
+    assert _lookup_tail('image/abcd', mapping) is None
+
+
+def test_rewrites_only_refs_into_image_dir(tmp_path):
+    content = (
+        '![a](image/abc)\n'
+        '<img src="./image/abc" width="300">\n'
+        '![other](other/abc)\n'
+        '![remote](https://example.com/image/abc)\n'
+    )
+    new, stats, _ = rewrite_refs(content, {'abc': 'abc.png'}, md_dir=tmp_path, image_dir=tmp_path / 'image')
+    assert new == (
+        '![a](image/abc.png)\n'
+        '<img src="./image/abc.png" width="300">\n'
+        '![other](other/abc)\n'
+        '![remote](https://example.com/image/abc)\n'
+    )
+    assert stats == {'total_refs': 4, 'updated_refs': 2, 'skipped_refs': 2}
+
+
+def test_resolves_relative_to_markdown_dir(tmp_path):
+    md_dir = tmp_path / 'notes' / 'deep'
+    content = '![a](../../image/sub/abc "标题")\n![b](image/sub/abc)\n'
+    new, _, _ = rewrite_refs(content, {'sub/abc': 'sub/abc.jpg'}, md_dir=md_dir, image_dir=tmp_path / 'image')
+    assert new == '![a](../../image/sub/abc.jpg "标题")\n![b](image/sub/abc)\n'
+
+
+def test_absolute_keys_from_multiple_roots(tmp_path):
+    mapping = {(tmp_path / 'a' / 'abc').as_posix(): (tmp_path / 'a' / 'abc.png').as_posix()}
+    new, _, _ = rewrite_refs('![a](a/abc)\n![b](b/abc)\n', mapping, md_dir=tmp_path, image_dir=tmp_path / 'image')
+    assert new == '![a](a/abc.png)\n![b](b/abc)\n'
+
+
+def test_match_tail_ignores_directories(tmp_path):
+    new, _, _ = rewrite_refs('![a](other/abc)\n', {'abc': 'abc.png'}, md_dir=tmp_path, match_tail=True)
+    assert new == '![a](other/abc.png)\n'
+
+
+def test_prefix_matches_exact_refs():
+    new, stats, _ = rewrite_refs('![a](../image/abc)\n![b](image/abc)\n', {'abc': 'abc.png'},
+                                 image_prefix='../image/')
+    assert new == '![a](../image/abc.png)\n![b](image/abc)\n'
+    assert stats['updated_refs'] == 1
@@ -0,0 +1,98 @@
+"""watch: 防抖等待与常驻 Converter 的章节 HTML 复用"""
+
+import os
+
+import pytest
+
+import watch
+
+pytest.importorskip('markdown')
+
+from convert import Converter  # noqa: E402
+
+DOCUMENT = """# Guide
+
+Intro.
+
+## Install
+
+Run the installer.
+
+## Usage
+
+![diagram](diagram.png)
+
+## FAQ
+
+Nothing yet.
+"""
+
+
+def test_wait_until_settled_waits_out_repeated_saves(tmp_path, monkeypatch):
+    path = str(tmp_path / 'doc.md')
+    with open(path, 'w') as f:
+        f.write('v1')
+    current = watch.snapshot([path])
+
+    # 每次 sleep 期间编辑器又保存了一次，直到第三次间隔内不再变化
+    saves = ['v22', 'v333']
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if saves:
+            with open(path, 'w') as f:
+                f.write(saves.pop(0))
+
+    monkeypatch.setattr(watch.time, 'sleep', fake_sleep)
+    settled = watch.wait_until_settled([path], current, 0.3)
+
+    assert sleeps == [0.3, 0.3, 0.3]
+    assert settled == watch.snapshot([path])
+    assert settled[path][1] == 4
+
+
+def test_snapshot_marks_missing_files(tmp_path):
+    missing = str(tmp_path / 'gone.png')
+    assert watch.snapshot([missing]) == {missing: None}
+
+
+class TestChapterReuse:
+
+    @pytest.fixture
+    def converter(self):
+        converter = Converter(use_cache=False)
+        converter.chapter_cache = {}
+        return converter
+
+    @staticmethod
+    def _reused(capsys):
+        return [line.split('复用 ')[1] for line in capsys.readouterr().out.splitlines() if '章节 HTML' in line]
+
+    def test_matches_full_render(self, converter, tmp_path):
+        source = str(tmp_path / 'doc.md')
+        full = Converter(use_cache=False).render_html(DOCUMENT, source)
+        assert converter.render_html(DOCUMENT, source) == full
+        assert converter.render_html(DOCUMENT, source) == full
+
+    def test_only_edited_chapter_is_converted(self, converter, tmp_path, capsys):
+        source = str(tmp_path / 'doc.md')
+        converter.render_html(DOCUMENT, source)
+        converter.render_html(DOCUMENT, source)
+        html, _ = converter.render_html(DOCUMENT.replace('Run the installer.', 'Run setup.'), source)
+
+        assert 'Run setup.' in html
+        assert self._reused(capsys) == ['0/4 个', '4/4 个', '3/4 个']
+        assert len(converter.chapter_cache) == 4
+
+    def test_image_change_invalidates_its_chapter(self, converter, tmp_path, capsys):
+        source = str(tmp_path / 'doc.md')
+        image = tmp_path / 'diagram.png'
+        image.write_bytes(b'v1')
+        converter.render_html(DOCUMENT, source)
+
+        image.write_bytes(b'version 2')
+        os.utime(image, ns=(0, 10 ** 9))
+        converter.render_html(DOCUMENT, source)
+
+        assert self._reused(capsys) == ['0/4 个', '3/4 个']